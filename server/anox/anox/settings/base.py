@@ -37,7 +37,9 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
+    "django_filters",
 ]
 
 MIDDLEWARE = [
@@ -49,7 +51,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "djangorestframework_camel_case.middleware.CamelCaseMiddleWare",
+    "timetracker.camel_case.CamelCaseMiddleware",
 ]
 
 ROOT_URLCONF = "anox.urls"
@@ -104,6 +106,23 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The local memory cache evicts the least recently used entries once full.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "anox",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+# Seconds tag totals and time reports are cached for. Cached values are
+# versioned, so this only bounds how long unused values are kept around.
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
@@ -118,15 +137,15 @@ REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
     "DEFAULT_RENDERER_CLASSES": (
-        "djangorestframework_camel_case.render.CamelCaseJSONRenderer",
-        "djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer",
+        "timetracker.camel_case.CamelCaseJSONRenderer",
+        "timetracker.camel_case.CamelCaseBrowsableAPIRenderer",
     ),
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
     "DEFAULT_PARSER_CLASSES": [
-        "djangorestframework_camel_case.parser.CamelCaseJSONParser",
+        "timetracker.camel_case.CamelCaseJSONParser",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
@@ -135,3 +154,7 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {"ACCESS_TOKEN_LIFETIME": timedelta(days=365)}
 
 DEFAULT_TAG_COLOR = "FF000000"
+
+# Reject time entry writes that would overlap another entry of the user, see
+# timetracker.overlaps. Overlaps are otherwise allowed and can be listed.
+REJECT_OVERLAPPING_TIME_ENTRIES = False
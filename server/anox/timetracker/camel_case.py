@@ -0,0 +1,255 @@
+"""
+camelCase JSON renderers, parser and middleware for the API.
+
+They behave exactly like the djangorestframework_camel_case ones, but memoize
+key translations, which are otherwise worked out with regular expressions for
+every key of every object, and render with orjson when it is installed.
+"""
+
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files import File
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from djangorestframework_camel_case.settings import api_settings
+from djangorestframework_camel_case.util import (
+    camel_to_underscore,
+    camelize_re,
+    underscore_to_camel,
+)
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Keys are field and query parameter names, so a few thousand is plenty.
+KEY_CACHE_SIZE = 4096
+
+# Types that are never iterated into, checked before anything slower.
+SCALAR_TYPES = (str, int, float, bool, type(None))
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def camelize_key(key: str) -> str:
+    return camelize_re.sub(underscore_to_camel, key)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def underscoreize_key(key: str, no_underscore_before_number: bool = False) -> str:
+    return camel_to_underscore(
+        key, no_underscore_before_number=no_underscore_before_number
+    )
+
+
+def is_orjson_float(value: float) -> bool:
+    """
+    Whether orjson writes `value` exactly like the json module. They only
+    disagree on exponent notation, and orjson writes nan and infinity as null
+    where the json module, used strictly, refuses them.
+    """
+    return value == 0.0 or 1e-4 <= abs(value) < 1e16
+
+
+class CamelizeState:
+    def __init__(self) -> None:
+        # Cleared on finding anything orjson would render differently.
+        self.orjson_safe = True
+
+
+def camelize(data, state: CamelizeState = None, **options):
+    """
+    Same as djangorestframework_camel_case.util.camelize. When given a `state`,
+    also records whether the result can be rendered with orjson.
+    """
+    if state is None:
+        state = CamelizeState()
+
+    if isinstance(data, SCALAR_TYPES):
+        if type(data) is float and not is_orjson_float(data):
+            state.orjson_safe = False
+        return data
+
+    ignore_fields = options.get("ignore_fields") or ()
+    ignore_keys = options.get("ignore_keys") or ()
+    if isinstance(data, Promise):
+        data = force_str(data)
+    if isinstance(data, dict):
+        if isinstance(data, ReturnDict):
+            new_dict = ReturnDict(serializer=data.serializer)
+        else:
+            new_dict = {}
+        for key, value in data.items():
+            if isinstance(key, Promise):
+                key = force_str(key)
+            if isinstance(key, str) and "_" in key:
+                new_key = camelize_key(key)
+            else:
+                new_key = key
+
+            if key not in ignore_fields and new_key not in ignore_fields:
+                result = camelize(value, state, **options)
+            else:
+                # Not walked, so not checked either
+                state.orjson_safe = False
+                result = value
+            if key in ignore_keys or new_key in ignore_keys:
+                new_dict[key] = result
+            else:
+                new_dict[new_key] = result
+        return new_dict
+    if is_iterable(data) and not isinstance(data, str):
+        return [camelize(item, state, **options) for item in data]
+    return data
+
+
+def underscoreize(data, **options):
+    """
+    Same as djangorestframework_camel_case.util.underscoreize.
+    """
+    if isinstance(data, SCALAR_TYPES):
+        return data
+
+    no_underscore_before_number = bool(options.get("no_underscore_before_number"))
+    ignore_fields = options.get("ignore_fields") or ()
+    ignore_keys = options.get("ignore_keys") or ()
+    if isinstance(data, dict):
+        new_dict = {}
+        if type(data) is MultiValueDict:
+            new_data = MultiValueDict()
+            for key, value in data.items():
+                new_data.setlist(
+                    underscoreize_key(key, no_underscore_before_number),
+                    data.getlist(key),
+                )
+            return new_data
+        items = data.lists() if isinstance(data, QueryDict) else data.items()
+        for key, value in items:
+            if isinstance(key, str):
+                new_key = underscoreize_key(key, no_underscore_before_number)
+            else:
+                new_key = key
+
+            if key not in ignore_fields and new_key not in ignore_fields:
+                result = underscoreize(value, **options)
+            else:
+                result = value
+            if key in ignore_keys or new_key in ignore_keys:
+                new_dict[key] = result
+            else:
+                new_dict[new_key] = result
+
+        if isinstance(data, QueryDict):
+            new_query = QueryDict(mutable=True)
+            for key, value in new_dict.items():
+                new_query.setlist(key, value)
+            return new_query
+        return new_dict
+    if is_iterable(data) and not isinstance(data, (str, File)):
+        return [underscoreize(item, **options) for item in data]
+
+    return data
+
+
+def is_iterable(obj) -> bool:
+    try:
+        iter(obj)
+    except TypeError:
+        return False
+    else:
+        return True
+
+
+class CamelCaseJSONRenderer(JSONRenderer):
+    """
+    Renders byte for byte what the JSONRenderer of djangorestframework_camel_case
+    does, with orjson whenever it would give the same result.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        state = CamelizeState()
+        data = camelize(data, state, **api_settings.JSON_UNDERSCOREIZE)
+
+        if (
+            orjson is None
+            or not state.orjson_safe
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            rendered = orjson.dumps(
+                data,
+                default=self.orjson_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME
+                | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except orjson.JSONEncodeError:
+            # E.g. integers over 64 bits, or keys that are not strings
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer, for JavaScript.
+        return rendered.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+    def orjson_default(self, obj):
+        value = self.encoder_class().default(obj)
+        if type(value) is float and not is_orjson_float(value):
+            raise TypeError("Float rendered differently by orjson")
+
+        return value
+
+
+class CamelCaseBrowsableAPIRenderer(BrowsableAPIRenderer):
+    def render(self, data, *args, **kwargs):
+        return super().render(
+            camelize(data, **api_settings.JSON_UNDERSCOREIZE), *args, **kwargs
+        )
+
+
+class CamelCaseJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        try:
+            data = stream.read().decode(encoding)
+            return underscoreize(self.loads(data), **api_settings.JSON_UNDERSCOREIZE)
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
+
+    @staticmethod
+    def loads(data: str):
+        if orjson is not None:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # The json module accepts a little more, like NaN or integers
+                # over 64 bits, and reports the errors.
+                pass
+
+        return json.loads(data)
+
+
+class CamelCaseMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.GET = underscoreize(request.GET, **api_settings.JSON_UNDERSCOREIZE)
+
+        return self.get_response(request)
@@ -0,0 +1,85 @@
+"""
+Conditional GET requests, answered with 304 Not Modified when nothing the
+user can see changed since the client's copy.
+
+Every response of these views is built from the requesting user's data
+only, so the user's change version, see UserChangeVersion, makes a validator
+for all of them. Reading it is a primary key lookup, done before the view
+runs its own queries or serializers.
+
+Last-Modified only has a precision of seconds, so a change within the same
+second as the client's copy can go unnoticed. Clients should prefer ETags,
+which win when a request has both.
+"""
+
+from datetime import datetime
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.request import Request
+
+from .models import UserChangeVersion
+
+
+def get_change_version(user_id) -> Tuple[int, Optional[datetime]]:
+    """
+    The change version of a user and when it last changed. Users whose data
+    never changed since versions were introduced are at version 0.
+    """
+    row = (
+        UserChangeVersion.objects.filter(user_id=user_id)
+        .values_list("version", "changed_at")
+        .first()
+    )
+
+    return row or (0, None)
+
+
+def get_etag(request: Request, version: int) -> str:
+    # Each renderer renders the same data differently
+    return f'"{request.user.id}-{version}-{request.accepted_renderer.format}"'
+
+
+def conditional_get(view):
+    """
+    Decorates a view, under @api_view, or a viewset's method, to validate GET
+    and HEAD requests against the user's change version.
+    """
+
+    @wraps(view)
+    def wrapper(request: Request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        version, changed_at = get_change_version(request.user.id)
+        etag = get_etag(request, version)
+        last_modified = None if changed_at is None else int(changed_at.timestamp())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+
+        return response
+
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """
+    Validates the list and retrieve requests of a viewset, see conditional_get.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return conditional_get(super().list)(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_get(super().retrieve)(request, *args, **kwargs)
@@ -1,5 +1,11 @@
+import django_filters
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+from django.db.models import F, Q
 from rest_framework import filters
 
+from .models import SEARCH_CONFIG, TimeEntry, TsTzRange
+
 
 class IsAssignedToFilterBackend(filters.BaseFilterBackend):
     """
@@ -8,3 +14,74 @@ class IsAssignedToFilterBackend(filters.BaseFilterBackend):
 
     def filter_queryset(self, request, queryset, view):
         return queryset.filter(assigned_to=request.user)
+
+
+class NoteSearchFilter(filters.BaseFilterBackend):
+    """
+    Full text search of notes with the `search` query parameter, in the
+    syntax of web search engines. Matches are ranked, title matches first,
+    unless an `ordering` is given, and carry a `headline` of the content
+    with the matching words highlighted.
+
+    Goes after the OrderingFilter, so its ranking is not ordered away.
+    """
+
+    search_param = filters.SearchFilter.search_param
+    ordering_param = filters.OrderingFilter.ordering_param
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, "").strip()
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type="websearch", config=SEARCH_CONFIG)
+
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F("search_vector"), query),
+            headline=SearchHeadline(
+                "content",
+                query,
+                config=SEARCH_CONFIG,
+                start_sel="<mark>",
+                stop_sel="</mark>",
+            ),
+        )
+
+        if self.ordering_param not in request.query_params:
+            queryset = queryset.order_by("-rank", *queryset.query.order_by)
+
+        return queryset
+
+
+class TimeEntryFilter(django_filters.FilterSet):
+    """
+    Time entries started in a range, with `started_after` and
+    `started_before`, or overlapping a range, with `overlaps_after` and
+    `overlaps_before`, where running entries overlap everything after their
+    start. Either end of a range can be left out.
+
+    Per user, the started range is an index range scan of
+    time_entries_user_started_idx. An entry started before the range can end
+    in it, so started_at doesn't bound the overlapping ones, which are a
+    lookup of the span of the entries in time_entries_span_idx instead. Like
+    in timetracker.overlaps, empty and backwards entries overlap nothing.
+    """
+
+    started = django_filters.IsoDateTimeFromToRangeFilter(field_name="started_at")
+    overlaps = django_filters.IsoDateTimeFromToRangeFilter(method="filter_overlaps")
+
+    class Meta:
+        model = TimeEntry
+        fields = []
+
+    def filter_overlaps(self, queryset, name, value):
+        if value.start is None and value.stop is None:
+            return queryset
+
+        # The condition of time_entries_span_idx, outside which the span isn't
+        # a valid range
+        return (
+            queryset.filter(Q(ended_at__isnull=True) | Q(ended_at__gte=F("started_at")))
+            .alias(span=TsTzRange("started_at", "ended_at"))
+            .filter(span__overlap=DateTimeTZRange(value.start, value.stop))
+        )
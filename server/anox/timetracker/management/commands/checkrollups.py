@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from timetracker.rollups import CHECK_TOLERANCE, check_rollups
+
+
+class Command(BaseCommand):
+    help = "Checks the daily tag time rollups against the time entries"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=CHECK_TOLERANCE,
+            help="Allowed difference in seconds for a day",
+        )
+
+    def handle(self, *args, **options):
+        mismatches = check_rollups(tolerance=options["tolerance"])
+
+        for tag_id, day, expected, actual, expected_count, actual_count in mismatches:
+            self.stdout.write(
+                f"Tag '{tag_id}' on {day}: expected {expected} seconds over "
+                f"{expected_count} entries, found {actual} seconds over "
+                f"{actual_count} entries"
+            )
+
+        if mismatches:
+            raise CommandError(
+                f"{len(mismatches)} rollups do not match, "
+                "run 'rebuildrollups' to fix them"
+            )
+
+        self.stdout.write(self.style.SUCCESS("All tag rollups are consistent"))
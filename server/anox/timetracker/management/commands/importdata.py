@@ -18,6 +18,7 @@ from timetracker.models import (
     TimeEntry,
     Timestamp,
 )
+from timetracker.rollups import rebuild_rollups, recount_references
 from timetracker.utils import to_canonical_name
 
 CHUNK_SIZE = 500
@@ -652,6 +653,12 @@ class Command(BaseCommand):
             else:
                 raise CommandError(f'Unknown file type f"{file_type}"')
 
+        # Everything above is written in bulk, which skips the incremental
+        # rollup updates and reference counts.
+        self.stdout.write("Rebuilding tag rollups")
+        rebuild_rollups()
+        recount_references()
+
         end = datetime.now()
         elapsed = (end - start).total_seconds()
 
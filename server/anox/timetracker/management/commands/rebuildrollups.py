@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from timetracker.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily tag time rollups from the time entries"
+
+    def handle(self, *args, **options):
+        start = datetime.now()
+
+        rebuild_rollups()
+
+        elapsed = (datetime.now() - start).total_seconds()
+
+        self.stdout.write(f"Took {elapsed} seconds")
+        self.stdout.write(self.style.SUCCESS("Successfully rebuilt tag rollups"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from timetracker.rollups import recount_references
+
+
+class Command(BaseCommand):
+    help = "Recounts how many tag links reference each tag"
+
+    def handle(self, *args, **options):
+        repaired = recount_references()
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} tag(s)"))
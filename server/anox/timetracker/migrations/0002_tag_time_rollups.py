@@ -0,0 +1,96 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagTimeRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("seconds", models.FloatField()),
+                ("entry_count", models.IntegerField()),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="time_rollups",
+                        to="timetracker.tag",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "tag_time_rollups",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="tagtimerollup",
+            constraint=models.UniqueConstraint(
+                fields=("tag", "day"), name="tag_time_rollups_tag_day_unique"
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+            INSERT INTO tag_time_rollups (user_id, tag_id, day, seconds, entry_count)
+            SELECT
+                tags.assigned_to_id,
+                buckets.tag_id,
+                buckets.day,
+                EXTRACT(EPOCH FROM SUM(buckets.duration))::double precision,
+                COUNT(*)
+            FROM (
+                SELECT
+                    tag_links.tag_id,
+                    series.day::date AS day,
+                    LEAST(
+                        time_entries.ended_at AT TIME ZONE 'UTC',
+                        series.day + INTERVAL '1 day'
+                    ) - GREATEST(
+                        time_entries.started_at AT TIME ZONE 'UTC',
+                        series.day
+                    ) AS duration
+                FROM tag_links
+                INNER JOIN time_entries ON time_entries.id = tag_links.time_entry_id
+                CROSS JOIN LATERAL generate_series(
+                    date_trunc('day', time_entries.started_at AT TIME ZONE 'UTC'),
+                    GREATEST(
+                        time_entries.started_at,
+                        time_entries.ended_at - INTERVAL '1 microsecond'
+                    ) AT TIME ZONE 'UTC',
+                    INTERVAL '1 day'
+                ) AS series(day)
+                WHERE tag_links.deleted_at IS NULL
+                    AND time_entries.deleted_at IS NULL
+                    AND time_entries.ended_at >= time_entries.started_at
+            ) AS buckets
+            INNER JOIN tags ON tags.id = buckets.tag_id
+            GROUP BY tags.assigned_to_id, buckets.tag_id, buckets.day
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
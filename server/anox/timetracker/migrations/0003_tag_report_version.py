@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0002_tag_time_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="report_version",
+            field=models.IntegerField(default=0),
+        ),
+    ]
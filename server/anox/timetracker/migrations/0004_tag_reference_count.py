@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0003_tag_report_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tag",
+            name="reference_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql="""
+            UPDATE tags SET reference_count = counts.count
+            FROM (
+                SELECT tag_id, COUNT(*) AS count
+                FROM tag_links
+                WHERE deleted_at IS NULL
+                GROUP BY tag_id
+            ) AS counts
+            WHERE tags.id = counts.tag_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
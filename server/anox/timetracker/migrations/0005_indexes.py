@@ -0,0 +1,66 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0004_tag_reference_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="taglink",
+            name="tag",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tag_links",
+                to="timetracker.tag",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["assigned_to", "-created_at"],
+                name="notes_user_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["assigned_to", "-created_at"],
+                name="tags_user_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taglink",
+            index=models.Index(
+                fields=["tag", "time_entry"], name="tag_links_tag_entry_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timeentry",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["assigned_to", "-started_at"],
+                name="time_entries_user_started_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timestamp",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["assigned_to", "-created_at"],
+                name="timestamps_user_created_idx",
+            ),
+        ),
+    ]
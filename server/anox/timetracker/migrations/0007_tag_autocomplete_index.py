@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0006_note_search_vector"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["assigned_to", "canonical_name"],
+                name="tags_user_name_prefix_idx",
+                opclasses=["int4_ops", "text_pattern_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+# Query of the user ids of the rows in a transition table, formatted in by
+# the trigger function, for each table that changes what a user sees.
+USER_IDS_QUERIES = {
+    "profile": "SELECT user_id FROM %I",
+    "tags": "SELECT assigned_to_id FROM %I",
+    "notes": "SELECT assigned_to_id FROM %I",
+    "time_entries": "SELECT assigned_to_id FROM %I",
+    "timestamps": "SELECT assigned_to_id FROM %I",
+    "tag_links": (
+        "SELECT tags.assigned_to_id FROM %I AS links "
+        "INNER JOIN tags ON tags.id = links.tag_id"
+    ),
+}
+
+CREATE_FUNCTION_SQL = """
+CREATE SEQUENCE user_change_versions_seq;
+
+CREATE FUNCTION bump_user_change_versions() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    user_ids text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        user_ids := format(TG_ARGV[0], 'new_rows');
+    ELSIF TG_OP = 'DELETE' THEN
+        user_ids := format(TG_ARGV[0], 'old_rows');
+    ELSE
+        user_ids := format(TG_ARGV[0], 'old_rows')
+            || ' UNION ' || format(TG_ARGV[0], 'new_rows');
+    END IF;
+
+    -- Ordered, so concurrent statements lock the rows in the same order
+    EXECUTE format(
+        'INSERT INTO user_change_versions (user_id, version, changed_at)
+        SELECT user_id, nextval(''user_change_versions_seq''), clock_timestamp()
+        FROM (SELECT DISTINCT * FROM (%s) AS changed) AS changed (user_id)
+        WHERE user_id IS NOT NULL
+        ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET version = EXCLUDED.version, changed_at = EXCLUDED.changed_at',
+        user_ids
+    );
+
+    RETURN NULL;
+END
+$$;
+"""
+
+DROP_FUNCTION_SQL = """
+DROP FUNCTION bump_user_change_versions();
+DROP SEQUENCE user_change_versions_seq;
+"""
+
+
+def create_triggers_sql(table: str, user_ids: str) -> str:
+    # Transition tables are only allowed on triggers of a single event.
+    return f"""
+    CREATE TRIGGER {table}_insert_change_version
+    AFTER INSERT ON {table} REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_user_change_versions('{user_ids}');
+
+    CREATE TRIGGER {table}_update_change_version
+    AFTER UPDATE ON {table} REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_user_change_versions('{user_ids}');
+
+    CREATE TRIGGER {table}_delete_change_version
+    AFTER DELETE ON {table} REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_user_change_versions('{user_ids}');
+    """
+
+
+def drop_triggers_sql(table: str) -> str:
+    return "".join(
+        f"DROP TRIGGER {table}_{event}_change_version ON {table};"
+        for event in ("insert", "update", "delete")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0007_tag_autocomplete_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserChangeVersion",
+            fields=[
+                ("user_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("version", models.BigIntegerField()),
+                ("changed_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "user_change_versions",
+            },
+        ),
+        migrations.RunSQL(sql=CREATE_FUNCTION_SQL, reverse_sql=DROP_FUNCTION_SQL),
+        *(
+            migrations.RunSQL(
+                sql=create_triggers_sql(table, user_ids),
+                reverse_sql=drop_triggers_sql(table),
+            )
+            for table, user_ids in USER_IDS_QUERIES.items()
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:47
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0008_user_change_versions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="taglink",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="timestamp",
+            name="updated_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        # The new columns were filled with the time of the migration, and
+        # updated_at was not kept up to date on soft deletes before.
+        migrations.RunSQL(
+            sql="""
+            UPDATE tag_links SET updated_at = COALESCE(deleted_at, created_at);
+            UPDATE timestamps SET updated_at = COALESCE(deleted_at, created_at);
+            UPDATE time_entries SET updated_at = deleted_at
+            WHERE deleted_at > updated_at;
+            UPDATE notes SET updated_at = deleted_at WHERE deleted_at > updated_at;
+            UPDATE tags SET updated_at = deleted_at WHERE deleted_at > updated_at;
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["assigned_to", "updated_at", "id"],
+                name="notes_user_updated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["assigned_to", "updated_at", "id"], name="tags_user_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taglink",
+            index=models.Index(
+                fields=["updated_at", "id"], name="tag_links_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timeentry",
+            index=models.Index(
+                fields=["assigned_to", "updated_at", "id"],
+                name="time_entries_user_updated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timestamp",
+            index=models.Index(
+                fields=["assigned_to", "updated_at", "id"],
+                name="timestamps_user_updated_idx",
+            ),
+        ),
+    ]
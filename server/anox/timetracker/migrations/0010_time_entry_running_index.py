@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0009_updated_at_changes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="timeentry",
+            index=models.Index(
+                condition=models.Q(
+                    ("deleted_at__isnull", True), ("ended_at__isnull", True)
+                ),
+                fields=["assigned_to"],
+                name="time_entries_running_idx",
+            ),
+        ),
+    ]
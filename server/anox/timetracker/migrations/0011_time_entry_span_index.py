@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-17 19:55
+
+import django.contrib.postgres.indexes
+import timetracker.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0010_time_entry_running_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="timeentry",
+            index=django.contrib.postgres.indexes.GistIndex(
+                timetracker.models.TsTzRange("started_at", "ended_at"),
+                condition=models.Q(
+                    ("deleted_at__isnull", True),
+                    ("ended_at__gte", models.F("started_at")),
+                ),
+                name="time_entries_span_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:05
+
+from django.db import migrations
+
+# Task time trees are answered from the user's change version too, see
+# 0008_user_change_versions.
+CREATE_TRIGGERS_SQL = """
+CREATE TRIGGER tasks_insert_change_version
+AFTER INSERT ON tasks REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION
+bump_user_change_versions('SELECT assigned_to_id FROM %I');
+
+CREATE TRIGGER tasks_update_change_version
+AFTER UPDATE ON tasks REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION
+bump_user_change_versions('SELECT assigned_to_id FROM %I');
+
+CREATE TRIGGER tasks_delete_change_version
+AFTER DELETE ON tasks REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION
+bump_user_change_versions('SELECT assigned_to_id FROM %I');
+"""
+
+DROP_TRIGGERS_SQL = """
+DROP TRIGGER tasks_insert_change_version ON tasks;
+DROP TRIGGER tasks_update_change_version ON tasks;
+DROP TRIGGER tasks_delete_change_version ON tasks;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0011_time_entry_span_index"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=CREATE_TRIGGERS_SQL, reverse_sql=DROP_TRIGGERS_SQL),
+    ]
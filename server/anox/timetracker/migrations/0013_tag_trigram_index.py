@@ -0,0 +1,50 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:18
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+# pg_trgm ships with PostgreSQL's contrib modules, which some installs leave
+# out. Without it there is no index, and autocomplete only matches prefixes.
+CREATE_INDEX_SQL = """
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX tags_name_trgm_idx ON tags
+            USING gin (canonical_name gin_trgm_ops)
+            WHERE deleted_at IS NULL;
+    END IF;
+END
+$$;
+"""
+
+DROP_INDEX_SQL = "DROP INDEX IF EXISTS tags_name_trgm_idx;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0012_task_change_versions"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(sql=CREATE_INDEX_SQL, reverse_sql=DROP_INDEX_SQL),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="tag",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.indexes.OpClass(
+                            "canonical_name", name="gin_trgm_ops"
+                        ),
+                        condition=models.Q(("deleted_at__isnull", True)),
+                        name="tags_name_trgm_idx",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+SYNCED_TABLES = ["tags", "notes", "time_entries", "timestamps", "tag_links"]
+
+# The top level transaction id, as a 64 bit xid8 with its epoch, so it never
+# wraps around.
+CREATE_FUNCTION_SQL = """
+CREATE FUNCTION set_change_xid() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.change_xid := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END
+$$;
+"""
+
+DROP_FUNCTION_SQL = "DROP FUNCTION set_change_xid();"
+
+
+def create_triggers_sql(table: str) -> str:
+    # Only updates the changes feed sends, which touch updated_at, count.
+    # Reference counts and report versions of tags are left out.
+    return f"""
+    CREATE TRIGGER {table}_insert_change_xid
+    BEFORE INSERT ON {table}
+    FOR EACH ROW EXECUTE FUNCTION set_change_xid();
+
+    CREATE TRIGGER {table}_update_change_xid
+    BEFORE UPDATE ON {table}
+    FOR EACH ROW WHEN (NEW.updated_at IS DISTINCT FROM OLD.updated_at)
+    EXECUTE FUNCTION set_change_xid();
+    """
+
+
+def drop_triggers_sql(table: str) -> str:
+    return "".join(
+        f"DROP TRIGGER {table}_{event}_change_xid ON {table};"
+        for event in ("insert", "update")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0013_tag_trigram_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="note",
+            name="notes_user_updated_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="tag",
+            name="tags_user_updated_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="taglink",
+            name="tag_links_updated_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="timeentry",
+            name="time_entries_user_updated_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="timestamp",
+            name="timestamps_user_updated_idx",
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="change_xid",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="change_xid",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="taglink",
+            name="change_xid",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="timeentry",
+            name="change_xid",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="timestamp",
+            name="change_xid",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(sql=CREATE_FUNCTION_SQL, reverse_sql=DROP_FUNCTION_SQL),
+        *(
+            migrations.RunSQL(
+                sql=create_triggers_sql(table), reverse_sql=drop_triggers_sql(table)
+            )
+            for table in SYNCED_TABLES
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["assigned_to", "change_xid", "id"], name="notes_user_change_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tag",
+            index=models.Index(
+                fields=["assigned_to", "change_xid", "id"], name="tags_user_change_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="taglink",
+            index=models.Index(
+                fields=["tag", "change_xid", "id"], name="tag_links_tag_change_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timeentry",
+            index=models.Index(
+                fields=["assigned_to", "change_xid", "id"],
+                name="time_entries_user_change_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timestamp",
+            index=models.Index(
+                fields=["assigned_to", "change_xid", "id"],
+                name="timestamps_user_change_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-17 20:26
+
+import django.contrib.postgres.indexes
+import timetracker.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("timetracker", "0014_sync_change_xid"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="timeentry",
+            name="time_entries_span_idx",
+        ),
+        migrations.AddIndex(
+            model_name="timeentry",
+            index=django.contrib.postgres.indexes.GistIndex(
+                timetracker.models.TsTzRange("started_at", "ended_at"),
+                condition=models.Q(
+                    ("deleted_at__isnull", True),
+                    models.Q(
+                        ("ended_at__isnull", True),
+                        ("ended_at__gte", models.F("started_at")),
+                        _connector="OR",
+                    ),
+                ),
+                name="time_entries_span_idx",
+            ),
+        ),
+    ]
@@ -3,17 +3,26 @@ from datetime import date, timedelta
 from typing import Dict, Sequence
 
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models, transaction
-from django.db.models import F, Sum
+from django.db.models import F, Q, Sum
 from django.utils import timezone
 
 from timetracker.utils import to_canonical_name
 
 from .managers import SoftDeleteManager
-from .utils import split_datetimes_across_days
+from .reports import get_tag_time_report
+from .rollups import RollupScope
 
-# TODO add indexes
+# Text search configuration of the notes search
+SEARCH_CONFIG = "english"
+
+
+class TsTzRange(models.Func):
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
 
 
 # TODO add search by tags
@@ -63,11 +72,12 @@ class Task(models.Model):
 
     def save(self, *args, **kwargs) -> None:
         self.canonical_name = to_canonical_name(self.name)
+        touch(self, kwargs)
         return super().save(*args, **kwargs)
 
     def delete(self, using=None, keep_parents=False, hard: bool = False):
         if hard:
-            return super().delete(using=using, keep_parents=keep_parents)
+            return hard_delete(self, using=using, keep_parents=keep_parents)
 
         with transaction.atomic():
             self.deleted_at = timezone.now()
@@ -86,6 +96,18 @@ class Task(models.Model):
 class Timestamp(models.Model):
     class Meta:
         db_table = "timestamps"
+        indexes = [
+            models.Index(
+                fields=["assigned_to", "-created_at"],
+                name="timestamps_user_created_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            # For the changes feed, which includes deleted rows
+            models.Index(
+                fields=["assigned_to", "change_xid", "id"],
+                name="timestamps_user_change_idx",
+            ),
+        ]
 
     objects = SoftDeleteManager()
     objects_deleted = SoftDeleteManager(only_deleted=True)
@@ -93,6 +115,10 @@ class Timestamp(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+    # Transaction that last updated the row, set by a trigger, for the changes
+    # feed, see timetracker.sync
+    change_xid = models.BigIntegerField(default=0, editable=False)
     deleted_at = models.DateTimeField(null=True)
 
     # Any content you wish to add to a timestamp,
@@ -101,9 +127,13 @@ class Timestamp(models.Model):
 
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    def save(self, *args, **kwargs) -> None:
+        touch(self, kwargs)
+        return super().save(*args, **kwargs)
+
     def delete(self, using=None, keep_parents=False, hard: bool = False):
         if hard:
-            return super().delete(using=using, keep_parents=keep_parents)
+            return hard_delete(self, using=using, keep_parents=keep_parents)
 
         self.deleted_at = timezone.now()
         return self.save()
@@ -118,6 +148,31 @@ class TimeEntry(models.Model):
         db_table = "time_entries"
         verbose_name = "time entry"
         verbose_name_plural = "time entries"
+        indexes = [
+            models.Index(
+                fields=["assigned_to", "-started_at"],
+                name="time_entries_user_started_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=["assigned_to", "change_xid", "id"],
+                name="time_entries_user_change_idx",
+            ),
+            # The running timer, see TimeEntryViewSet.running
+            models.Index(
+                fields=["assigned_to"],
+                name="time_entries_running_idx",
+                condition=Q(ended_at__isnull=True, deleted_at__isnull=True),
+            ),
+            # Overlapping entries, see timetracker.overlaps. Running entries
+            # are unbounded ranges, and backwards ones not valid ranges.
+            GistIndex(
+                TsTzRange("started_at", "ended_at"),
+                name="time_entries_span_idx",
+                condition=Q(deleted_at__isnull=True)
+                & (Q(ended_at__isnull=True) | Q(ended_at__gte=F("started_at"))),
+            ),
+        ]
 
     objects = SoftDeleteManager()
     objects_deleted = SoftDeleteManager(only_deleted=True)
@@ -126,6 +181,9 @@ class TimeEntry(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
+    # Transaction that last updated the row, set by a trigger, for the changes
+    # feed, see timetracker.sync
+    change_xid = models.BigIntegerField(default=0, editable=False)
     deleted_at = models.DateTimeField(null=True)
 
     started_at = models.DateTimeField()
@@ -135,9 +193,27 @@ class TimeEntry(models.Model):
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE)
     task = models.ForeignKey(Task, null=True, blank=True, on_delete=models.SET_NULL)
 
+    def save(self, *args, **kwargs) -> None:
+        touch(self, kwargs)
+
+        # A new time entry has no tag links yet, so there is nothing to roll up.
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            scope = RollupScope()
+            scope.add_time_entries(TimeEntry.objects_with_deleted.filter(pk=self.pk))
+
+            result = super().save(*args, **kwargs)
+
+            scope.add_span(self.started_at, self.ended_at)
+            scope.refresh()
+
+            return result
+
     def delete(self, using=None, keep_parents=False, hard: bool = False):
         if hard:
-            return super().delete(using=using, keep_parents=keep_parents)
+            return hard_delete(self, using=using, keep_parents=keep_parents)
 
         self.deleted_at = timezone.now()
         return self.save()
@@ -150,6 +226,31 @@ class TimeEntry(models.Model):
 class Tag(models.Model):
     class Meta:
         db_table = "tags"
+        indexes = [
+            models.Index(
+                fields=["assigned_to", "-created_at"],
+                name="tags_user_created_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            # For autocompleting by prefix, with LIKE
+            models.Index(
+                fields=["assigned_to", "canonical_name"],
+                opclasses=["int4_ops", "text_pattern_ops"],
+                name="tags_user_name_prefix_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            # For autocompleting by similarity, with pg_trgm. Only created where
+            # the extension is available, see migration 0013.
+            GinIndex(
+                OpClass("canonical_name", name="gin_trgm_ops"),
+                name="tags_name_trgm_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=["assigned_to", "change_xid", "id"],
+                name="tags_user_change_idx",
+            ),
+        ]
 
     objects = SoftDeleteManager()
     objects_deleted = SoftDeleteManager(only_deleted=True)
@@ -158,6 +259,9 @@ class Tag(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
+    # Transaction that last updated the row, set by a trigger, for the changes
+    # feed, see timetracker.sync
+    change_xid = models.BigIntegerField(default=0, editable=False)
     deleted_at = models.DateTimeField(null=True)
 
     name = models.CharField(max_length=255)
@@ -166,10 +270,31 @@ class Tag(models.Model):
     # Hex color string RGBA. No leading #. E.g. #FF000000
     color = models.CharField(max_length=8)
 
+    # Bumped whenever the time entries or links of the tag change, so cached
+    # totals and reports of older versions are never read again.
+    report_version = models.IntegerField(default=0)
+
+    # How many live tag links point to the tag.
+    reference_count = models.IntegerField(default=0)
+
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    # Maintained in the database, saving an instance must never overwrite them
+    # with a stale in-memory value.
+    database_maintained_fields = ("report_version", "reference_count")
+
     def save(self, *args, **kwargs) -> None:
         self.canonical_name = to_canonical_name(self.name)
+        touch(self, kwargs)
+
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.database_maintained_fields
+            ]
+
         return super().save(*args, **kwargs)
 
     def delete(self, using=None, keep_parents=False, hard: bool = False):
@@ -183,61 +308,20 @@ class Tag(models.Model):
         self.deleted_at = None
         self.save()
 
-    def get_total_references(self):
-        return TagLink.objects.filter(tag=self).count()
-
-    def get_total_time(self, chunk_size=500) -> timedelta:
-        total_time = timedelta(0)
+    def get_total_references(self) -> int:
+        return self.reference_count
 
-        links = (
-            TagLink.objects.filter(tag=self)
-            .exclude(time_entry_id__isnull=True)
-            .order_by("created_at")
-        )
-
-        for page in Paginator(links, per_page=chunk_size):
-            aggregate = (
-                TimeEntry.objects.exclude(ended_at__isnull=True)
-                .filter(tag_links__in=page.object_list)
-                .aggregate(total_time=Sum(F("ended_at") - F("started_at")))
-            )
-
-            if (delta := aggregate["total_time"]) is not None:
-                total_time += delta
-
-        return total_time
-
-    def get_time_report(self, chunk_size=500) -> Dict[date, timedelta]:
-        results = {}
-
-        links = (
-            TagLink.objects.filter(tag=self)
-            .exclude(time_entry_id__isnull=True)
-            .order_by("created_at")
-        )
-
-        for page in Paginator(links, per_page=chunk_size):
-            time_entries = TimeEntry.objects.exclude(ended_at__isnull=True).filter(
-                tag_links__in=page.object_list
-            )
-
-            for time_entry in time_entries:
-                # TODO log the error
-                try:
-                    parts = split_datetimes_across_days(
-                        time_entry.started_at, time_entry.ended_at
-                    )
-                except ValueError:
-                    continue
-
-                for i in range(0, len(parts), 2):
-                    key = parts[i].date()
-                    if key not in results:
-                        results[key] = timedelta(0)
+    def get_total_time(self) -> timedelta:
+        aggregate = TimeEntry.objects.filter(
+            tag_links__tag=self,
+            tag_links__deleted_at__isnull=True,
+            ended_at__isnull=False,
+        ).aggregate(total_time=Sum(F("ended_at") - F("started_at")))
 
-                    results[key] += parts[i + 1] - parts[i]
+        return aggregate["total_time"] or timedelta(0)
 
-        return results
+    def get_time_report(self) -> Dict[date, timedelta]:
+        return get_tag_time_report(self.id)
 
     def __str__(self):
         return self.name
@@ -246,6 +330,18 @@ class Tag(models.Model):
 class Note(models.Model):
     class Meta:
         db_table = "notes"
+        indexes = [
+            models.Index(
+                fields=["assigned_to", "-created_at"],
+                name="notes_user_created_idx",
+                condition=Q(deleted_at__isnull=True),
+            ),
+            models.Index(
+                fields=["assigned_to", "change_xid", "id"],
+                name="notes_user_change_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="notes_search_vector_idx"),
+        ]
 
     objects = SoftDeleteManager()
     objects_deleted = SoftDeleteManager(only_deleted=True)
@@ -254,6 +350,9 @@ class Note(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
+    # Transaction that last updated the row, set by a trigger, for the changes
+    # feed, see timetracker.sync
+    change_xid = models.BigIntegerField(default=0, editable=False)
     deleted_at = models.DateTimeField(null=True)
 
     """
@@ -266,11 +365,23 @@ class Note(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField(blank=True)
 
+    # Maintained by the database from the title and content.
+    search_vector = models.GeneratedField(
+        expression=SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("content", weight="B", config=SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    def save(self, *args, **kwargs) -> None:
+        touch(self, kwargs)
+        return super().save(*args, **kwargs)
+
     def delete(self, using=None, keep_parents=False, hard: bool = False):
         if hard:
-            return super().delete(using=using, keep_parents=keep_parents)
+            return hard_delete(self, using=using, keep_parents=keep_parents)
 
         self.deleted_at = timezone.now()
         return self.save()
@@ -309,11 +420,12 @@ class Statistic(models.Model):
 
     def save(self, *args, **kwargs) -> None:
         self.canonical_name = to_canonical_name(self.name)
+        touch(self, kwargs)
         return super().save(*args, **kwargs)
 
     def delete(self, using=None, keep_parents=False, hard: bool = False):
         if hard:
-            return super().delete(using=using, keep_parents=keep_parents)
+            return hard_delete(self, using=using, keep_parents=keep_parents)
 
         self.deleted_at = timezone.now()
         return self.save()
@@ -364,12 +476,25 @@ class StatisticValue(models.Model):
 class TagLink(models.Model):
     class Meta:
         db_table = "tag_links"
+        indexes = [
+            # Also serves lookups by tag alone, so the tag column has no index
+            # of its own.
+            models.Index(fields=["tag", "time_entry"], name="tag_links_tag_entry_idx"),
+            # For the changes feed, by the user's tags
+            models.Index(
+                fields=["tag", "change_xid", "id"], name="tag_links_tag_change_idx"
+            ),
+        ]
 
     objects = SoftDeleteManager()
     objects_deleted = SoftDeleteManager(only_deleted=True)
     objects_with_deleted = SoftDeleteManager(with_deleted=True)
 
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(default=timezone.now)
+    # Transaction that last updated the row, set by a trigger, for the changes
+    # feed, see timetracker.sync
+    change_xid = models.BigIntegerField(default=0, editable=False)
     deleted_at = models.DateTimeField(null=True)
 
     time_entry = models.ForeignKey(
@@ -393,7 +518,12 @@ class TagLink(models.Model):
         Note, related_name="tag_links", on_delete=models.CASCADE, null=True, blank=True
     )
     tag = models.ForeignKey(
-        Tag, related_name="tag_links", on_delete=models.CASCADE, null=True, blank=True
+        Tag,
+        related_name="tag_links",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
     )
     statistic = models.ForeignKey(
         Statistic,
@@ -403,6 +533,115 @@ class TagLink(models.Model):
         blank=True,
     )
 
+    def save(self, *args, **kwargs) -> None:
+        touch(self, kwargs)
+
+        with transaction.atomic():
+            scope = RollupScope()
+            if not self._state.adding:
+                old_link = TagLink.objects_with_deleted.filter(pk=self.pk)
+                scope.add_tag_links(old_link)
+                scope.add_reference_deltas(
+                    old_link.filter(deleted_at__isnull=True), sign=-1
+                )
+
+            result = super().save(*args, **kwargs)
+
+            new_link = TagLink.objects_with_deleted.filter(pk=self.pk)
+            scope.add_tag_links(new_link)
+            scope.add_reference_deltas(new_link.filter(deleted_at__isnull=True))
+
+            scope.refresh()
+
+            return result
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            link = TagLink.objects_with_deleted.filter(pk=self.pk)
+
+            scope = RollupScope()
+            scope.add_tag_links(link)
+            scope.add_reference_deltas(link.filter(deleted_at__isnull=True), sign=-1)
+
+            result = super().delete(*args, **kwargs)
+
+            scope.refresh()
+
+            return result
+
+
+class TagTimeRollup(models.Model):
+    """
+    Seconds tracked for a tag on a UTC day, and how many time entries
+    contributed to it. Kept up to date by timetracker.rollups.
+    """
+
+    class Meta:
+        db_table = "tag_time_rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tag", "day"], name="tag_time_rollups_tag_day_unique"
+            )
+        ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, related_name="time_rollups", on_delete=models.CASCADE)
+    day = models.DateField()
+    seconds = models.FloatField()
+    entry_count = models.IntegerField()
+
+
+def touch(obj, kwargs: dict) -> None:
+    """
+    Marks an existing object being saved as updated now, for the changes
+    feed, even when only some of its fields are saved. `kwargs` are the
+    keyword arguments of save().
+    """
+    if obj._state.adding:
+        return
+
+    obj.updated_at = timezone.now()
+
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "updated_at" not in update_fields:
+        kwargs["update_fields"] = [*update_fields, "updated_at"]
+
+
+class UserChangeVersion(models.Model):
+    """
+    Moves on whenever any data the API shows a user changes, to answer
+    conditional requests, see timetracker.conditional.
+
+    Bumped by statement level triggers on the user's tables, created in
+    migration 0008, so bulk writes and raw SQL bump it too. Versions are
+    drawn from a sequence and never repeat, even across users.
+    """
+
+    class Meta:
+        db_table = "user_change_versions"
+
+    # Not a foreign key, as deleting a user deletes their data first, which
+    # bumps the version again.
+    user_id = models.IntegerField(primary_key=True)
+    version = models.BigIntegerField()
+    changed_at = models.DateTimeField()
+
+
+def hard_delete(obj, using=None, keep_parents=False):
+    """Deletes obj from the database, along with its tag links.
+    The reference counts and rollups of the tags it was linked to are updated.
+    """
+    with transaction.atomic():
+        scope = RollupScope.for_queryset(
+            type(obj).objects_with_deleted.filter(pk=obj.pk), RollupScope.HARD_DELETE
+        )
+
+        result = models.Model.delete(obj, using=using, keep_parents=keep_parents)
+
+        scope.refresh()
+
+        return result
+
 
 def object_to_query_class_name(obj) -> str:
     class_name = type(obj).__name__
@@ -445,6 +684,14 @@ def tag_object(obj, tags: Sequence[Tag]) -> int:
         if tag.id not in existing_links_map
     ]
 
-    TagLink.objects.bulk_create(new_links)
+    with transaction.atomic():
+        TagLink.objects.bulk_create(new_links)
+
+        scope = RollupScope()
+        for link in new_links:
+            scope.add_reference_delta(link.tag_id, 1)
+        if class_name == "time_entry":
+            scope.add_span(obj.started_at, obj.ended_at)
+        scope.refresh()
 
     return len(new_links)
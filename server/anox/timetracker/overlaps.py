@@ -0,0 +1,158 @@
+"""
+Overlapping time entries, which are counted twice by tag totals and reports.
+
+Two entries overlap when they share some time, so an entry ending exactly when
+another starts doesn't overlap it. Entries ending before they start share no
+time with any other. Reports only count closed entries, with ended_at >=
+started_at, so find_overlaps only reports those. check_overlaps also treats
+running entries as unbounded on the right, as they will end at some point
+after now: a timer can't start inside another entry, nor an entry be written
+across a running timer, or stopping the timer would fail.
+
+Finding the entries overlapping one is a lookup of time_entries_span_idx, a
+GiST index on the tstzrange of the entries, which covers running entries as
+unbounded ranges, rather than a scan of the user's history, so neither query
+below compares every pair of entries.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connection
+
+# Every pair of overlapping entries of a user, once, as (earlier id, later id,
+# start of the overlap, end of the overlap), the earlier one being the first
+# by (started_at, id). Only pairs overlapping in the [start, end) range are
+# returned, either end of which can be NULL.
+#
+# A sweep over the user's entries by start keeps the latest end of the
+# entries before each one, so only the entries starting before it overlap
+# anything, and only their partners are looked up, by time_entries_span_idx.
+TIME_ENTRY_OVERLAPS_SQL = """
+WITH swept AS (
+    SELECT
+        id,
+        started_at,
+        ended_at,
+        MAX(ended_at) OVER (
+            ORDER BY started_at, id
+            ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+        ) AS previous_ended_at
+    FROM time_entries
+    WHERE assigned_to_id = %(user_id)s
+        AND deleted_at IS NULL
+        AND ended_at >= started_at
+        AND (%(end)s::timestamptz IS NULL OR started_at < %(end)s::timestamptz)
+)
+SELECT
+    earlier.id,
+    later.id,
+    later.started_at,
+    LEAST(earlier.ended_at, later.ended_at)
+FROM swept AS later
+INNER JOIN time_entries AS earlier
+    ON tstzrange(earlier.started_at, earlier.ended_at)
+    && tstzrange(later.started_at, later.ended_at)
+    AND (earlier.started_at, earlier.id) < (later.started_at, later.id)
+WHERE later.previous_ended_at > later.started_at
+    AND earlier.assigned_to_id = %(user_id)s
+    AND earlier.deleted_at IS NULL
+    AND earlier.ended_at >= earlier.started_at
+    AND (
+        %(start)s::timestamptz IS NULL
+        OR LEAST(earlier.ended_at, later.ended_at) > %(start)s::timestamptz
+    )
+ORDER BY later.started_at, earlier.started_at, earlier.id, later.id
+LIMIT %(limit)s
+"""
+
+# A stored entry of a user overlapping any of the candidate intervals, other
+# than the entries in `exclude_ids`, which the candidates replace. A NULL end,
+# of the candidates or of running entries, is an unbounded range.
+TIME_ENTRY_CONFLICTS_SQL = """
+SELECT time_entries.id
+FROM unnest(%(starts)s::timestamptz[], %(ends)s::timestamptz[])
+    AS candidates(started_at, ended_at)
+INNER JOIN time_entries
+    ON tstzrange(time_entries.started_at, time_entries.ended_at)
+    && tstzrange(candidates.started_at, candidates.ended_at)
+WHERE time_entries.assigned_to_id = %(user_id)s
+    AND time_entries.deleted_at IS NULL
+    AND (
+        time_entries.ended_at IS NULL
+        OR time_entries.ended_at >= time_entries.started_at
+    )
+    AND NOT time_entries.id = ANY(%(exclude_ids)s::uuid[])
+LIMIT 1
+"""
+
+Interval = Tuple[datetime, Optional[datetime]]
+
+
+class TimeEntryOverlap(Exception):
+    pass
+
+
+def find_overlaps(
+    user_id,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100,
+) -> List[tuple]:
+    """
+    The overlapping pairs of time entries of a user, see
+    TIME_ENTRY_OVERLAPS_SQL, in the order the overlaps start.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TIME_ENTRY_OVERLAPS_SQL,
+            {"user_id": user_id, "start": start, "end": end, "limit": limit},
+        )
+        return cursor.fetchall()
+
+
+def check_overlaps(user_id, intervals: Sequence[Interval], exclude_ids=()) -> None:
+    """
+    Raises TimeEntryOverlap when REJECT_OVERLAPPING_TIME_ENTRIES is set and
+    any of the (started_at, ended_at) `intervals` about to be saved for a user
+    overlaps another one or a stored entry, other than those in `exclude_ids`.
+
+    Callers should hold the user's lock, so that concurrent writes can't each
+    add one side of an overlap.
+    """
+    if not settings.REJECT_OVERLAPPING_TIME_ENTRIES:
+        return
+
+    # Empty and backwards intervals share no time with any other
+    candidates = [
+        (started_at, ended_at)
+        for started_at, ended_at in intervals
+        if ended_at is None or ended_at > started_at
+    ]
+    if not candidates:
+        return
+
+    # A sweep over the intervals by start finds overlaps among them. Running
+    # ones overlap everything starting after them.
+    candidates.sort(key=lambda interval: interval[0])
+    last_ended_at = candidates[0][1]
+    for started_at, ended_at in candidates[1:]:
+        if last_ended_at is None or started_at < last_ended_at:
+            raise TimeEntryOverlap("Time entries overlap each other")
+        last_ended_at = None if ended_at is None else max(last_ended_at, ended_at)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TIME_ENTRY_CONFLICTS_SQL,
+            {
+                "user_id": user_id,
+                "starts": [started_at for started_at, _ in candidates],
+                "ends": [ended_at for _, ended_at in candidates],
+                "exclude_ids": list(exclude_ids),
+            },
+        )
+        row = cursor.fetchone()
+
+    if row is not None:
+        raise TimeEntryOverlap(f"Time entry overlaps time entry {row[0]}")
@@ -0,0 +1,157 @@
+import base64
+import binascii
+import json
+from typing import List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates on the view's `keyset_ordering`, e.g. "-started_at", with the
+    primary key as a tiebreaker. Every page is read with an index range scan
+    from where the previous one stopped, so deep pages cost the same as the
+    first one, and nothing is counted.
+
+    Requests opt in with the `cursor` query parameter, left empty for the
+    first page, then follow the `next` and `previous` links. The keyset
+    ordering is used instead of any `ordering` parameter. Without a cursor,
+    the usual page number pagination is used.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self) -> None:
+        self.page_number_pagination = PageNumberPagination()
+        self.page_size = self.page_number_pagination.page_size
+        self.use_keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None) -> Optional[List]:
+        self.use_keyset = self.cursor_query_param in request.query_params
+        if not self.use_keyset:
+            return self.page_number_pagination.paginate_queryset(
+                queryset, request, view
+            )
+
+        self.request = request
+        self.field_name = view.keyset_ordering.lstrip("-")
+        self.model = queryset.model
+        self.field = self.model._meta.get_field(self.field_name)
+        descending = view.keyset_ordering.startswith("-")
+
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        backwards = cursor is not None and cursor[0]
+
+        # Going backwards reads the rows before the cursor in reverse, then
+        # flips them back.
+        if descending != backwards:
+            queryset = queryset.order_by(f"-{self.field_name}", "-pk")
+            comparison = "lt"
+        else:
+            queryset = queryset.order_by(self.field_name, "pk")
+            comparison = "gt"
+
+        if cursor is not None:
+            _, value, pk = cursor
+            # The plain bound on the field lets the index range scan start at
+            # the cursor, the tiebreaker only filters the rows at its value.
+            queryset = queryset.filter(
+                Q(**{f"{self.field_name}__{comparison}e": value}),
+                Q(**{f"{self.field_name}__{comparison}": value})
+                | Q(**{self.field_name: value, f"pk__{comparison}": pk}),
+            )
+
+        results = list(queryset[: page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+
+        if backwards:
+            results.reverse()
+
+        self.next_cursor = None
+        self.previous_cursor = None
+        if results:
+            if has_more or backwards:
+                self.next_cursor = self.get_cursor_link(results[-1], backwards=False)
+            if (has_more and backwards) or (cursor is not None and not backwards):
+                self.previous_cursor = self.get_cursor_link(results[0], backwards=True)
+
+        return results
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request) -> Optional[Tuple[bool, object, object]]:
+        """
+        Returns the (backwards, field value, primary key) of the cursor,
+        or None for the first page.
+        """
+        encoded = request.query_params[self.cursor_query_param]
+        if not encoded:
+            return None
+
+        try:
+            decoded = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            backwards, value, pk = decoded["b"], decoded["v"], decoded["pk"]
+            value = self.field.to_python(value)
+            pk = self.model._meta.pk.to_python(pk)
+        except (
+            binascii.Error,
+            UnicodeError,
+            ValueError,
+            KeyError,
+            TypeError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return bool(backwards), value, pk
+
+    def get_cursor_link(self, obj, backwards: bool) -> str:
+        # Pages can hold values() rows as well as model instances
+        if isinstance(obj, dict):
+            value, pk = obj[self.field.attname], obj[self.model._meta.pk.attname]
+        else:
+            value, pk = getattr(obj, self.field.attname), obj.pk
+
+        cursor = {"b": int(backwards), "v": str(value), "pk": str(pk)}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode("ascii"))
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_number_pagination.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded.decode())
+
+    def get_paginated_response(self, data) -> Response:
+        if not self.use_keyset:
+            return self.page_number_pagination.get_paginated_response(data)
+
+        return Response(
+            {
+                "next": self.next_cursor,
+                "previous": self.previous_cursor,
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return self.page_number_pagination.get_paginated_response_schema(schema)
@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
+from .rollups import RollupScope
+
 
 class SoftDeleteQuerySet(models.QuerySet):
     def only_deleted(self):
@@ -9,11 +11,34 @@ class SoftDeleteQuerySet(models.QuerySet):
     def without_deleted(self):
         return self.filter(deleted_at__isnull=True)
 
+    def _touched(self, **fields) -> dict:
+        # Soft deletes and restores are updates for the changes feed
+        if any(field.name == "updated_at" for field in self.model._meta.fields):
+            fields["updated_at"] = fields.get("deleted_at") or timezone.now()
+
+        return fields
+
     def delete(self, hard: bool = False):
-        if hard:
-            return super().delete()
+        with transaction.atomic(using=self.db):
+            scope = RollupScope.for_queryset(
+                self, RollupScope.HARD_DELETE if hard else RollupScope.DELETE
+            )
+
+            if hard:
+                result = super().delete()
+            else:
+                result = super().update(**self._touched(deleted_at=timezone.now()))
 
-        return super().update(deleted_at=timezone.now())
+            scope.refresh()
+
+            return result
 
     def restore(self):
-        return super().update(deleted_at=None)
+        with transaction.atomic(using=self.db):
+            scope = RollupScope.for_queryset(self, RollupScope.RESTORE)
+
+            result = super().update(**self._touched(deleted_at=None))
+
+            scope.refresh()
+
+            return result
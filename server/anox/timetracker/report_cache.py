@@ -0,0 +1,116 @@
+"""
+Cache for tag totals and time reports.
+
+Cached values are keyed by the tag id and the tag's report_version, which is
+bumped in the database whenever the tag's time entries or links change. Stale
+values are never invalidated explicitly, they are simply not read anymore and
+eventually evicted by the cache.
+
+Hits and misses are counted in memory by each process, see get_stats.
+"""
+
+import os
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+# Hits and misses of this process only. Counting them in a shared store would
+# add a write to every cached read, which is what the cache is there to avoid.
+_process_counts = Counter()
+_process_counts_lock = threading.Lock()
+
+
+def tag_key(tag_id, report_version: int, kind: str, *parts) -> str:
+    return ":".join(
+        ["report-cache", str(tag_id), str(report_version), kind]
+        + [str(part) for part in parts]
+    )
+
+
+def bump_tag_versions(tag_ids: Optional[Iterable] = None) -> None:
+    """
+    Bumps the report version of `tag_ids`, or of every tag if None.
+    """
+    tag_ids = None if tag_ids is None else list(tag_ids)
+    if tag_ids == []:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE tags SET report_version = report_version + 1
+            WHERE %(tag_ids)s::uuid[] IS NULL OR id = ANY(%(tag_ids)s::uuid[])
+            """,
+            {"tag_ids": tag_ids},
+        )
+
+
+def _count(hits: int = 0, misses: int = 0) -> None:
+    with _process_counts_lock:
+        _process_counts["hits"] += hits
+        _process_counts["misses"] += misses
+
+
+def get_or_compute(key: str, compute: Callable):
+    value = cache.get(key)
+    if value is not None:
+        _count(hits=1)
+        return value
+
+    _count(misses=1)
+    value = compute()
+    cache.set(key, value, timeout=settings.REPORT_CACHE_TIMEOUT)
+
+    return value
+
+
+def get_many_or_compute(keys: Dict, compute_missing: Callable[[list], Dict]) -> Dict:
+    """
+    `keys` maps ids to cache keys. Values that are not cached are computed
+    together by calling `compute_missing` with the list of their ids, which
+    must return a dict of id to value.
+    """
+    cached = cache.get_many(keys.values())
+    values = {item: cached[key] for item, key in keys.items() if key in cached}
+    missing = [item for item in keys if item not in values]
+
+    _count(hits=len(values), misses=len(missing))
+
+    if missing:
+        computed = compute_missing(missing)
+        cache.set_many(
+            {keys[item]: value for item, value in computed.items()},
+            timeout=settings.REPORT_CACHE_TIMEOUT,
+        )
+        values.update(computed)
+
+    return values
+
+
+def get_stats() -> dict:
+    """
+    Hits and misses of the report cache in this process since it started or
+    reset_stats was called. Every worker process counts its own, so this is a
+    sample of the whole deployment rather than its total.
+    """
+    with _process_counts_lock:
+        hits = _process_counts["hits"]
+        misses = _process_counts["misses"]
+
+    total = hits + misses
+
+    return {
+        "pid": os.getpid(),
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else None,
+    }
+
+
+def reset_stats() -> None:
+    with _process_counts_lock:
+        _process_counts.clear()
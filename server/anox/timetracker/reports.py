@@ -0,0 +1,239 @@
+from datetime import date, timedelta
+from typing import Dict, List
+
+from django.db import connection
+
+# The part of a time entry on the day `series.day` of DAY_SERIES_SQL, in the
+# timezone %(tz)s.
+#
+# The entry is clipped to the day in timestamptz, not in local time, so days
+# with a DST change count the time that actually passed rather than the
+# difference between wall clock readings.
+DAY_DURATION_SQL = """
+LEAST(
+    time_entries.ended_at,
+    (series.day + INTERVAL '1 day') AT TIME ZONE %(tz)s
+) - GREATEST(
+    time_entries.started_at,
+    series.day AT TIME ZONE %(tz)s
+)
+"""
+
+# One row per day a time entry spans, in the timezone %(tz)s.
+#
+# The series stops a microsecond before the end of the entry so that an entry
+# ending exactly at midnight does not produce an empty bucket for the next day.
+DAY_SERIES_SQL = """
+CROSS JOIN LATERAL generate_series(
+    date_trunc('day', time_entries.started_at AT TIME ZONE %(tz)s),
+    GREATEST(
+        time_entries.started_at,
+        time_entries.ended_at - INTERVAL '1 microsecond'
+    ) AT TIME ZONE %(tz)s,
+    INTERVAL '1 day'
+) AS series(day)
+"""
+
+# Splits every closed time entry linked to the tags in `tag_ids` into per-day
+# pieces clipped to the day, one (tag_id, day, duration) row per piece.
+# When `start`/`end` are given, only entries overlapping those days are read.
+TAG_DAY_BUCKETS_SQL = f"""
+SELECT
+    tag_links.tag_id,
+    series.day::date AS day,
+    {DAY_DURATION_SQL} AS duration
+FROM tag_links
+INNER JOIN time_entries ON time_entries.id = tag_links.time_entry_id
+{DAY_SERIES_SQL}
+WHERE (
+    %(tag_ids)s::uuid[] IS NULL
+    OR tag_links.tag_id = ANY(%(tag_ids)s::uuid[])
+)
+    AND tag_links.deleted_at IS NULL
+    AND time_entries.deleted_at IS NULL
+    AND time_entries.ended_at >= time_entries.started_at
+    AND (
+        %(start)s::date IS NULL
+        OR time_entries.ended_at > %(start)s::date::timestamp AT TIME ZONE %(tz)s
+    )
+    AND (
+        %(end)s::date IS NULL
+        OR time_entries.started_at
+        < (%(end)s::date + 1)::timestamp AT TIME ZONE %(tz)s
+    )
+"""
+
+TAG_TIME_REPORT_SQL = f"""
+SELECT buckets.day, SUM(buckets.duration)
+FROM ({TAG_DAY_BUCKETS_SQL}) AS buckets
+GROUP BY buckets.day
+"""
+
+
+def day_bucket_params(tag_ids=None, start=None, end=None, tz: str = "UTC") -> dict:
+    """
+    Parameters for TAG_DAY_BUCKETS_SQL. `tag_ids` of None means every tag.
+    """
+    return {
+        "tag_ids": None if tag_ids is None else list(tag_ids),
+        "start": start,
+        "end": end,
+        "tz": tz,
+    }
+
+
+def get_tag_time_report(tag_id, tz: str = "UTC") -> Dict[date, timedelta]:
+    """
+    Returns the time tracked for a tag on each day, with days starting at
+    midnight in the timezone `tz`.
+
+    Time entries spanning several days are split at midnight, so an entry from
+    1/1/2000 20:00 to 1/2/2000 02:00 adds 4 hours to 1/1/2000 and 2 hours
+    to 1/2/2000. Running and soft-deleted entries are ignored.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(TAG_TIME_REPORT_SQL, day_bucket_params([tag_id], tz=tz))
+        return {day: duration for day, duration in cursor.fetchall()}
+
+
+# The time of a user on each day from `start` to `end`, in the timezone %(tz)s,
+# as (day, tag_id, task_id, grouping, duration) rows of three grouping sets:
+# the total of the day (grouping 3), per tag (grouping 1) and per task
+# (grouping 2). Untagged time is under a NULL tag_id and time without a task
+# under a NULL task_id.
+#
+# Entries are joined to each of their tags, so the day and task totals only
+# count the first tag link of each piece. Entries are found by the GiST index
+# of their span, see timetracker.overlaps.
+TIMESHEET_SQL = f"""
+WITH pieces AS (
+    SELECT
+        time_entries.id AS time_entry_id,
+        time_entries.task_id,
+        series.day::date AS day,
+        {DAY_DURATION_SQL} AS duration
+    FROM time_entries
+    {DAY_SERIES_SQL}
+    WHERE time_entries.assigned_to_id = %(user_id)s
+        AND time_entries.deleted_at IS NULL
+        AND time_entries.ended_at >= time_entries.started_at
+        AND tstzrange(time_entries.started_at, time_entries.ended_at)
+        && tstzrange(
+            %(start)s::date::timestamp AT TIME ZONE %(tz)s,
+            (%(end)s::date + 1)::timestamp AT TIME ZONE %(tz)s
+        )
+        AND series.day::date BETWEEN %(start)s::date AND %(end)s::date
+),
+linked AS (
+    SELECT
+        pieces.*,
+        tag_links.tag_id,
+        ROW_NUMBER() OVER (
+            PARTITION BY pieces.time_entry_id, pieces.day
+        ) = 1 AS counted
+    FROM pieces
+    LEFT JOIN tag_links
+        ON tag_links.time_entry_id = pieces.time_entry_id
+        AND tag_links.deleted_at IS NULL
+)
+SELECT
+    day,
+    tag_id,
+    task_id,
+    GROUPING(tag_id, task_id),
+    CASE
+        WHEN GROUPING(tag_id) = 0 THEN SUM(duration)
+        ELSE SUM(duration) FILTER (WHERE counted)
+    END
+FROM linked
+GROUP BY GROUPING SETS ((day), (day, tag_id), (day, task_id))
+ORDER BY day
+"""
+
+
+def get_timesheet(user_id, start: date, end: date, tz: str = "UTC") -> List[tuple]:
+    """
+    The rows of TIMESHEET_SQL for a user from `start` to `end`, both inclusive,
+    with days starting at midnight in the timezone `tz`. Running and soft
+    deleted entries are ignored.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TIMESHEET_SQL, {"user_id": user_id, "start": start, "end": end, "tz": tz}
+        )
+        return cursor.fetchall()
+
+
+# The tasks of a user as a tree, with the time tracked on each task and on
+# the task and all of its subtasks, in seconds, as (id, parent_id, name,
+# depth, seconds, subtree_seconds) rows in depth first order. With `task_id`,
+# only the subtree of that task, which is then at depth 0.
+#
+# Tasks whose parent isn't one of the user's live tasks are roots. Each task
+# carries the path of ids from its root, so the subtree time of a task is the
+# sum over the tasks with it in their path, without walking the tree again.
+TASK_TIME_TREE_SQL = """
+WITH RECURSIVE owned AS (
+    SELECT
+        tasks.id,
+        tasks.parent_id,
+        tasks.name,
+        COALESCE(
+            SUM(EXTRACT(EPOCH FROM time_entries.ended_at - time_entries.started_at)),
+            0
+        )::float AS seconds
+    FROM tasks
+    LEFT JOIN time_entries
+        ON time_entries.task_id = tasks.id
+        AND time_entries.deleted_at IS NULL
+        AND time_entries.ended_at >= time_entries.started_at
+    WHERE tasks.assigned_to_id = %(user_id)s
+        AND tasks.deleted_at IS NULL
+    GROUP BY tasks.id
+),
+tree AS (
+    SELECT owned.id, ARRAY[owned.id] AS path
+    FROM owned
+    WHERE CASE
+        WHEN %(task_id)s::uuid IS NULL THEN NOT EXISTS (
+            SELECT FROM owned AS parent WHERE parent.id = owned.parent_id
+        )
+        ELSE owned.id = %(task_id)s::uuid
+    END
+    UNION ALL
+    SELECT child.id, tree.path || child.id
+    FROM tree
+    INNER JOIN owned AS child ON child.parent_id = tree.id
+    -- The schema doesn't prevent cycles. Tasks in one are never roots, and
+    -- the subtree of a task in one stops before the task repeats.
+    WHERE NOT child.id = ANY(tree.path)
+),
+subtrees AS (
+    SELECT ancestors.id, SUM(owned.seconds) AS seconds
+    FROM tree
+    INNER JOIN owned ON owned.id = tree.id
+    CROSS JOIN LATERAL unnest(tree.path) AS ancestors(id)
+    GROUP BY ancestors.id
+)
+SELECT
+    owned.id,
+    owned.parent_id,
+    owned.name,
+    cardinality(tree.path) - 1,
+    owned.seconds,
+    subtrees.seconds
+FROM tree
+INNER JOIN owned ON owned.id = tree.id
+INNER JOIN subtrees ON subtrees.id = tree.id
+ORDER BY tree.path
+"""
+
+
+def get_task_time_tree(user_id, task_id=None) -> List[tuple]:
+    """
+    The rows of TASK_TIME_TREE_SQL for the tasks of a user, or only for the
+    subtree of `task_id`. Running and soft deleted entries are ignored.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(TASK_TIME_TREE_SQL, {"user_id": user_id, "task_id": task_id})
+        return cursor.fetchall()
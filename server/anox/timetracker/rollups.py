@@ -0,0 +1,413 @@
+"""
+Daily tag time rollups and tag reference counts.
+
+The tag_time_rollups table stores how much time was tracked for a tag on each
+(UTC) day, so totals and reports can be read without rescanning time entries.
+Every write that can change those numbers collects a RollupScope before the
+write, then refreshes it afterwards. Refreshing recomputes only the affected
+(tag, day) rows from the source tables, applies the change in reference counts,
+and invalidates the cached reports of the affected tags.
+"""
+
+import uuid
+from collections import Counter
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min
+from django.db.models.functions import Coalesce
+
+from . import report_cache
+from .reports import TAG_DAY_BUCKETS_SQL, day_bucket_params
+
+ROLLUP_TIMEZONE = "UTC"
+
+# Periods time reports can be grouped by, in PostgreSQL date_trunc units.
+GRANULARITIES = ("day", "week", "month", "year")
+
+# Allowed difference in seconds before the checker reports a rollup as wrong.
+# Seconds are stored as floats, so sums computed in a different order can
+# differ slightly.
+CHECK_TOLERANCE = 0.001
+
+ROLLUP_SOURCE_SQL = f"""
+SELECT
+    tags.assigned_to_id AS user_id,
+    buckets.tag_id,
+    buckets.day,
+    EXTRACT(EPOCH FROM SUM(buckets.duration))::double precision AS seconds,
+    COUNT(*) AS entry_count
+FROM ({TAG_DAY_BUCKETS_SQL}) AS buckets
+INNER JOIN tags ON tags.id = buckets.tag_id
+WHERE (%(start)s::date IS NULL OR buckets.day >= %(start)s::date)
+    AND (%(end)s::date IS NULL OR buckets.day <= %(end)s::date)
+GROUP BY tags.assigned_to_id, buckets.tag_id, buckets.day
+"""
+
+DELETE_ROLLUPS_SQL = """
+DELETE FROM tag_time_rollups
+WHERE (
+    %(tag_ids)s::uuid[] IS NULL
+    OR tag_id = ANY(%(tag_ids)s::uuid[])
+)
+    AND (%(start)s::date IS NULL OR day >= %(start)s::date)
+    AND (%(end)s::date IS NULL OR day <= %(end)s::date)
+"""
+
+# Refreshes of the same tags are serialized by locking their rows first, in a
+# consistent order. Otherwise two transactions refreshing the same (tag, day)
+# would each delete the committed row, then both insert a new one, and the
+# second insert would fail on tag_time_rollups_tag_day_unique.
+LOCK_TAGS_SQL = """
+SELECT id FROM tags
+WHERE id = ANY(%(tag_ids)s::uuid[])
+ORDER BY id
+FOR UPDATE
+"""
+
+# Refreshing every tag locks the whole table instead, against refreshes of
+# tags created meanwhile. The lock conflicts with itself and with any writes.
+LOCK_ROLLUPS_SQL = "LOCK TABLE tag_time_rollups IN SHARE ROW EXCLUSIVE MODE"
+
+INSERT_ROLLUPS_SQL = f"""
+INSERT INTO tag_time_rollups (user_id, tag_id, day, seconds, entry_count)
+{ROLLUP_SOURCE_SQL}
+"""
+
+# Stored rollups differing from the rollups recomputed from the time entries,
+# including days missing on either side, compared in the database.
+CHECK_ROLLUPS_SQL = f"""
+SELECT
+    COALESCE(expected.tag_id, stored.tag_id) AS tag_id,
+    COALESCE(expected.day, stored.day) AS day,
+    expected.seconds,
+    stored.seconds,
+    expected.entry_count,
+    stored.entry_count
+FROM ({ROLLUP_SOURCE_SQL}) AS expected
+FULL OUTER JOIN tag_time_rollups AS stored
+    ON stored.tag_id = expected.tag_id AND stored.day = expected.day
+WHERE expected.tag_id IS NULL
+    OR stored.tag_id IS NULL
+    OR stored.user_id <> expected.user_id
+    OR abs(stored.seconds - expected.seconds) > %(tolerance)s
+    OR stored.entry_count <> expected.entry_count
+ORDER BY tag_id, day
+"""
+
+
+def to_rollup_day(when: datetime) -> date:
+    return when.astimezone(dt_timezone.utc).date()
+
+
+class RollupScope:
+    """
+    What a write may change in the data derived from time entries and tag
+    links: the tags and range of days of the daily rollups, and how much the
+    reference count of each tag changes by.
+
+    Collect the scope from the rows about to change before writing, add
+    anything new after writing, then call refresh().
+    """
+
+    DELETE = "delete"
+    HARD_DELETE = "hard_delete"
+    RESTORE = "restore"
+
+    def __init__(self) -> None:
+        self.tag_ids = set()
+        self.start: Optional[date] = None
+        self.end: Optional[date] = None
+        self.reference_deltas = Counter()
+
+    @classmethod
+    def for_queryset(cls, queryset, change: str) -> "RollupScope":
+        """
+        Scope of a bulk `change` (DELETE, HARD_DELETE or RESTORE) on a
+        queryset of any model. Only changes to time entries and tag links
+        matter, including the links removed along with hard deleted objects.
+        """
+        scope = cls()
+
+        model = queryset.model
+        db_table = model._meta.db_table
+        if db_table == "time_entries":
+            scope.add_time_entries(queryset)
+
+        if db_table == "tag_links":
+            scope.add_tag_links(queryset)
+
+            if change == cls.RESTORE:
+                scope.add_reference_deltas(queryset.filter(deleted_at__isnull=False))
+            else:
+                scope.add_reference_deltas(
+                    queryset.filter(deleted_at__isnull=True), sign=-1
+                )
+        elif (
+            change == cls.HARD_DELETE
+            and db_table != "tags"
+            and hasattr(model, "tag_links")
+        ):
+            # Hard deleting a tagged object deletes its links as well
+            relation = model.tag_links.rel
+            tag_links = relation.related_model.objects.filter(
+                **{f"{relation.field.name}__in": queryset.values("pk")}
+            )
+
+            scope.add_tag_links(tag_links)
+            scope.add_reference_deltas(tag_links, sign=-1)
+
+        return scope
+
+    def add_tags(self, tag_ids) -> None:
+        self.tag_ids.update(tag_ids)
+
+    def add_span(self, started_at: datetime, ended_at: Optional[datetime]) -> None:
+        start = to_rollup_day(started_at)
+        end = to_rollup_day(ended_at if ended_at is not None else started_at)
+
+        # Entries stored backwards never count, but their old or new span
+        # still has to be refreshed.
+        start, end = min(start, end), max(start, end)
+
+        self.start = start if self.start is None else min(self.start, start)
+        self.end = end if self.end is None else max(self.end, end)
+
+    def add_time_entries(self, time_entries) -> None:
+        """
+        Adds the live tags and days of a queryset of time entries.
+        """
+        self.add_tags(
+            time_entries.filter(tag_links__deleted_at__isnull=True)
+            .exclude(tag_links__tag_id__isnull=True)
+            .order_by()
+            .values_list("tag_links__tag_id", flat=True)
+            .distinct()
+        )
+
+        self._add_aggregate_span(
+            time_entries.aggregate(
+                first_started_at=Min("started_at"),
+                last_ended_at=Max(Coalesce("ended_at", "started_at")),
+            )
+        )
+
+    def add_tag_links(self, tag_links) -> None:
+        """
+        Adds the tags of a queryset of tag links and the days of their time
+        entries. Links to anything else only add their tag, as they change
+        its reference count but not its tracked time.
+        """
+        self.add_tags(
+            tag_links.exclude(tag_id__isnull=True)
+            .order_by()
+            .values_list("tag_id", flat=True)
+            .distinct()
+        )
+
+        self._add_aggregate_span(
+            tag_links.aggregate(
+                first_started_at=Min("time_entry__started_at"),
+                last_ended_at=Max(
+                    Coalesce("time_entry__ended_at", "time_entry__started_at")
+                ),
+            )
+        )
+
+    def _add_aggregate_span(self, aggregate: dict) -> None:
+        if aggregate["first_started_at"] is not None:
+            self.add_span(aggregate["first_started_at"], aggregate["last_ended_at"])
+
+    def add_reference_deltas(self, tag_links, sign: int = 1) -> None:
+        """
+        Counts every link of a queryset of tag links as `sign` references
+        of its tag.
+        """
+        counts = (
+            tag_links.exclude(tag_id__isnull=True)
+            .order_by()
+            .values_list("tag_id")
+            .annotate(count=Count("pk"))
+        )
+
+        for tag_id, count in counts:
+            self.add_reference_delta(tag_id, sign * count)
+
+    def add_reference_delta(self, tag_id, delta: int) -> None:
+        self.tag_ids.add(tag_id)
+        self.reference_deltas[tag_id] += delta
+
+    def refresh(self) -> None:
+        """
+        Recomputes the affected rollups, applies the reference count changes
+        and invalidates the cached totals and reports of the affected tags.
+        """
+        if not self.tag_ids:
+            return
+
+        if self.start is not None:
+            refresh_rollups(self.tag_ids, self.start, self.end)
+
+        apply_reference_deltas(self.reference_deltas)
+        report_cache.bump_tag_versions(self.tag_ids)
+
+
+def apply_reference_deltas(deltas: Dict) -> None:
+    deltas = {tag_id: delta for tag_id, delta in deltas.items() if delta != 0}
+    if not deltas:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE tags SET reference_count = tags.reference_count + deltas.delta
+            FROM unnest(%s::uuid[], %s::integer[]) AS deltas(id, delta)
+            WHERE tags.id = deltas.id
+            """,
+            [list(deltas.keys()), list(deltas.values())],
+        )
+
+
+def recount_references() -> int:
+    """
+    Recounts the references of every tag in bulk. Returns how many tags had
+    a wrong count.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE tags SET reference_count = counts.count
+            FROM (
+                SELECT tags.id, COUNT(tag_links.id) AS count
+                FROM tags
+                LEFT JOIN tag_links
+                    ON tag_links.tag_id = tags.id AND tag_links.deleted_at IS NULL
+                GROUP BY tags.id
+            ) AS counts
+            WHERE tags.id = counts.id AND tags.reference_count <> counts.count
+            """)
+        repaired = cursor.rowcount
+
+    report_cache.bump_tag_versions()
+
+    return repaired
+
+
+def _rollup_params(tag_ids, start, end) -> dict:
+    return day_bucket_params(tag_ids, start, end, tz=ROLLUP_TIMEZONE)
+
+
+def refresh_rollups(tag_ids=None, start=None, end=None) -> None:
+    """
+    Recomputes the rollups of `tag_ids` between the days `start` and `end`,
+    both inclusive. None means every tag, or no bound on the days.
+
+    The tags are locked until the end of the transaction, so a concurrent
+    refresh of any of them waits for it, then recomputes from what it
+    committed.
+    """
+    params = _rollup_params(tag_ids, start, end)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if tag_ids is None:
+            cursor.execute(LOCK_ROLLUPS_SQL)
+        else:
+            cursor.execute(LOCK_TAGS_SQL, params)
+
+        cursor.execute(DELETE_ROLLUPS_SQL, params)
+        cursor.execute(INSERT_ROLLUPS_SQL, params)
+
+
+def rebuild_rollups() -> None:
+    with transaction.atomic():
+        refresh_rollups()
+        report_cache.bump_tag_versions()
+
+
+def check_rollups(
+    tolerance: float = CHECK_TOLERANCE,
+) -> List[Tuple[str, date, float, float, int, int]]:
+    """
+    Compares the stored rollups with rollups recomputed from the time entries.
+
+    Returns one (tag_id, day, expected seconds, stored seconds,
+    expected entry count, stored entry count) row per mismatched day.
+    Values missing on either side are None.
+    """
+    params = {**_rollup_params(None, None, None), "tolerance": tolerance}
+
+    with connection.cursor() as cursor:
+        cursor.execute(CHECK_ROLLUPS_SQL, params)
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def get_total_seconds(tag_id) -> float:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(seconds), 0)
+            FROM tag_time_rollups
+            WHERE tag_id = %s
+            """,
+            [tag_id],
+        )
+        return cursor.fetchone()[0]
+
+
+def get_time_report(
+    tag_id, start=None, end=None, granularity: str = "day"
+) -> Dict[date, float]:
+    """
+    Seconds tracked for a tag in each period, read from the rollups.
+    See get_time_reports.
+    """
+    (report,) = get_time_reports([tag_id], start, end, granularity).values()
+    return report
+
+
+def get_time_reports(
+    tag_ids, start=None, end=None, granularity: str = "day"
+) -> Dict[uuid.UUID, Dict[date, float]]:
+    """
+    Seconds tracked for each of `tag_ids` between the UTC days `start` and
+    `end`, both inclusive, read from the rollups with one query.
+
+    Days are grouped into periods of `granularity`, one of GRANULARITIES, and
+    each period is keyed by its first day. Weeks start on Monday. The result is
+    keyed by tag UUID and has every tag in `tag_ids`, even one without any
+    tracked time.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}'")
+
+    reports = {uuid.UUID(str(tag_id)): {} for tag_id in tag_ids}
+    if not reports:
+        return reports
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT
+                tag_id,
+                date_trunc(%(granularity)s, day)::date AS period,
+                SUM(seconds)
+            FROM tag_time_rollups
+            WHERE tag_id = ANY(%(tag_ids)s::uuid[])
+                AND (%(start)s::date IS NULL OR day >= %(start)s::date)
+                AND (%(end)s::date IS NULL OR day <= %(end)s::date)
+            GROUP BY tag_id, period
+            ORDER BY tag_id, period
+            """,
+            {
+                "tag_ids": list(reports),
+                "start": start,
+                "end": end,
+                "granularity": granularity,
+            },
+        )
+
+        for tag_id, period, seconds in cursor.fetchall():
+            reports[tag_id][period] = seconds
+
+    return reports
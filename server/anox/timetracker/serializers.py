@@ -1,12 +1,62 @@
-from rest_framework import serializers
+from typing import Dict, Iterable, List, Optional, Sequence
 
-from .models import Note, Profile, Tag, TimeEntry, Timestamp
+from djangorestframework_camel_case.settings import api_settings
+from rest_framework import permissions, serializers
+
+from .camel_case import underscoreize_key
+from .models import Note, Profile, Tag, TagLink, TimeEntry, Timestamp
 from .utils import to_canonical_name
 
 
+def get_tag_payloads(context: dict) -> Dict:
+    """
+    Serialized tags by id, shared by everything serialized with `context`,
+    so each tag is serialized once per response.
+    """
+    return context.setdefault("tag_payloads", {})
+
+
+def get_query_list(request, name: str) -> Optional[List[str]]:
+    """
+    Field names listed in the query parameter `name`, either repeated or
+    comma separated, and camelCased or not. None if the parameter is missing.
+    """
+    if name not in request.query_params:
+        return None
+
+    no_underscore_before_number = bool(
+        api_settings.JSON_UNDERSCOREIZE.get("no_underscore_before_number")
+    )
+
+    return [
+        underscoreize_key(item.strip(), no_underscore_before_number)
+        for value in request.query_params.getlist(name)
+        for item in value.split(",")
+        if item.strip()
+    ]
+
+
 class TagLinkTagField(serializers.RelatedField):
+    """
+    The tag of a tag link, serialized in full, or only as its id when not
+    `expand`ed, which needs neither the tag nor a serializer.
+    """
+
+    def __init__(self, *args, expand: bool = True, **kwargs):
+        self.expand = expand
+        super().__init__(*args, **kwargs)
+
     def to_representation(self, value):
-        return TagSerializer(value.tag).data
+        if not self.expand:
+            return str(value.tag_id)
+
+        payloads = get_tag_payloads(self.context)
+
+        payload = payloads.get(value.tag_id)
+        if payload is None:
+            payload = payloads[value.tag_id] = TagSerializer(value.tag).data
+
+        return payload
 
     def get_queryset(self):
         # Any tag is fair, as long as it belongs to the user
@@ -23,10 +73,48 @@ class TagLinkTagField(serializers.RelatedField):
         return {}
 
 
-class NoteSerializer(serializers.HyperlinkedModelSerializer):
+class SparseFieldsMixin:
+    """
+    Lets GET requests pick the fields to render with the `fields` query
+    parameter, e.g. ?fields=id,title, and the relations to expand with
+    `expand`. Without `expand`, tags are expanded. With it, tags are only
+    expanded if listed, and rendered as tag ids otherwise.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get("request")
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return
+
+        fields = get_query_list(request, "fields")
+        if fields is not None:
+            unknown = [name for name in fields if name not in self.fields]
+            if unknown:
+                raise serializers.ValidationError(
+                    {"fields": [f"Unknown field '{name}'" for name in unknown]}
+                )
+
+            for name in set(self.fields.keys()) - set(fields):
+                self.fields.pop(name)
+
+        expand = get_query_list(request, "expand")
+        if "tags" in self.fields and expand is not None and "tags" not in expand:
+            self.fields["tags"] = TagLinkTagField(
+                source="tag_links", many=True, read_only=True, expand=False
+            )
+
+
+def is_tags_expanded(serializer: serializers.Serializer) -> bool:
+    tags = serializer.fields.get("tags")
+    return tags is not None and tags.child_relation.expand
+
+
+class NoteSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     created_at = serializers.DateTimeField(read_only=True)
     assigned_to_id = serializers.HiddenField(default=-1)
-    tags = TagLinkTagField(source="tag_links", many=True)
+    tags = TagLinkTagField(source="tag_links", many=True, read_only=True)
 
     class Meta:
         model = Note
@@ -41,7 +129,19 @@ class NoteSerializer(serializers.HyperlinkedModelSerializer):
         ]
 
 
-class TagSerializer(serializers.HyperlinkedModelSerializer):
+class NoteWriteSerializer(NoteSerializer):
+    """
+    A note being created or updated. `tags` are tag names, which are linked
+    by NoteViewSet rather than by the serializer, and replace the tags of an
+    updated note when given.
+    """
+
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=255), required=False, write_only=True
+    )
+
+
+class TagSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     created_at = serializers.DateTimeField(read_only=True)
     canonical_name = serializers.CharField(read_only=True)
     assigned_to_id = serializers.HiddenField(default=-1)
@@ -58,7 +158,7 @@ class TagSerializer(serializers.HyperlinkedModelSerializer):
         ]
 
 
-class TimeEntrySerializer(serializers.HyperlinkedModelSerializer):
+class TimeEntrySerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     created_at = serializers.DateTimeField(read_only=True)
     updated_at = serializers.DateTimeField(read_only=True)
     tags = TagLinkTagField(source="tag_links", many=True, read_only=True)
@@ -76,7 +176,44 @@ class TimeEntrySerializer(serializers.HyperlinkedModelSerializer):
         ]
 
 
-class TimestampSerializer(serializers.HyperlinkedModelSerializer):
+class TimeEntryBatchItemSerializer(TimeEntrySerializer):
+    """
+    One time entry of a batch. Entries with an id update that entry, partially
+    like a PATCH, the others are created. `tags` are tag names, and replace
+    the tags of an updated entry when given.
+    """
+
+    id = serializers.UUIDField(required=False)
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=255), required=False
+    )
+
+
+class TimerStartSerializer(serializers.Serializer):
+    """
+    A time entry started by the running timer, see TimeEntryViewSet.start.
+    It starts now unless `started_at` is given. `tags` are tag names.
+    """
+
+    started_at = serializers.DateTimeField(required=False)
+    description = serializers.CharField(required=False, allow_blank=True, default="")
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=255), required=False
+    )
+
+
+class OverlapsQuerySerializer(serializers.Serializer):
+    """
+    The query parameters of TimeEntryViewSet.overlaps: the range to find
+    overlaps in, unbounded by default, and the most pairs to return.
+    """
+
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+
+
+class TimestampSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     created_at = serializers.DateTimeField(read_only=True)
     tags = TagLinkTagField(source="tag_links", many=True, read_only=True)
 
@@ -85,6 +222,25 @@ class TimestampSerializer(serializers.HyperlinkedModelSerializer):
         fields = ["id", "created_at", "description", "tags"]
 
 
+class TagLinkSerializer(serializers.ModelSerializer):
+    tag_id = serializers.UUIDField(read_only=True)
+    time_entry_id = serializers.UUIDField(read_only=True)
+    timestamp_id = serializers.UUIDField(read_only=True)
+    note_id = serializers.UUIDField(read_only=True)
+
+    class Meta:
+        model = TagLink
+        fields = [
+            "id",
+            "created_at",
+            "updated_at",
+            "tag_id",
+            "time_entry_id",
+            "timestamp_id",
+            "note_id",
+        ]
+
+
 class ProfileSerializer(serializers.HyperlinkedModelSerializer):
     username = serializers.CharField(read_only=True, source="user.username")
 
@@ -99,3 +255,133 @@ class ProfileSerializer(serializers.HyperlinkedModelSerializer):
             "today_datetime_format",
             "duration_format",
         ]
+
+
+def get_tag_values_fields() -> List[str]:
+    """
+    The values() fields serialize_tag_values needs.
+    """
+    return get_values_fields(TagSerializer())
+
+
+def serialize_tag_values(rows: Iterable[dict]) -> List[dict]:
+    """
+    Serializes values() rows of tags like TagSerializer serializes tags.
+    """
+    return serialize_values(TagSerializer(), rows)
+
+
+def serialize_values(
+    serializer: serializers.Serializer, rows: Iterable[dict]
+) -> List[dict]:
+    """
+    Serializes values() rows the same way `serializer` serializes instances,
+    leaving out tags, see serialize_tagged_values for those.
+    """
+    fields = [
+        field for field in serializer._readable_fields if field.field_name != "tags"
+    ]
+
+    return [
+        {
+            field.field_name: (
+                None
+                if row[field.source] is None
+                else field.to_representation(row[field.source])
+            )
+            for field in fields
+        }
+        for row in rows
+    ]
+
+
+def serialize_tags(tag_ids, context: dict) -> Dict:
+    """
+    Serialized tags of `tag_ids` by id, reading the ones not serialized yet
+    for `context` as values() rows in one query.
+    """
+    payloads = get_tag_payloads(context)
+
+    missing = {tag_id for tag_id in tag_ids if tag_id not in payloads}
+    if missing:
+        # Like the tag_links__tag prefetch, soft deleted tags are still shown.
+        rows = list(
+            Tag.objects_with_deleted.filter(id__in=missing).values(
+                *get_tag_values_fields()
+            )
+        )
+
+        for row, payload in zip(rows, serialize_tag_values(rows)):
+            payloads[row["id"]] = payload
+
+    return payloads
+
+
+def serialize_tagged_values(
+    serializer: serializers.Serializer,
+    rows: List[dict],
+    link_field: str,
+    extra_fields: Sequence[str] = (),
+) -> List[dict]:
+    """
+    Serializes values() rows of a tagged model the same way `serializer`
+    serializes instances of it, without building model instances or a
+    serializer per tag. `link_field` is the TagLink field pointing to the model.
+    The `extra_fields` of the rows are added as they are.
+    """
+    fields = list(serializer._readable_fields)
+    expand_tags = is_tags_expanded(serializer)
+
+    tag_ids_by_object = {row["id"]: [] for row in rows}
+    if "tags" in serializer.fields:
+        links = (
+            TagLink.objects.filter(**{f"{link_field}_id__in": tag_ids_by_object.keys()})
+            .exclude(tag_id__isnull=True)
+            .order_by("id")
+            .values_list(f"{link_field}_id", "tag_id")
+        )
+        for object_id, tag_id in links:
+            tag_ids_by_object[object_id].append(tag_id)
+
+    tag_payloads = {}
+    if expand_tags:
+        tag_payloads = serialize_tags(
+            {tag_id for tag_ids in tag_ids_by_object.values() for tag_id in tag_ids},
+            serializer.context,
+        )
+
+    data = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            if field.field_name == "tags":
+                tag_ids = tag_ids_by_object[row["id"]]
+                item["tags"] = (
+                    [tag_payloads[tag_id] for tag_id in tag_ids]
+                    if expand_tags
+                    else [str(tag_id) for tag_id in tag_ids]
+                )
+                continue
+
+            value = row[field.source]
+            item[field.field_name] = (
+                None if value is None else field.to_representation(value)
+            )
+
+        for name in extra_fields:
+            item[name] = row[name]
+
+        data.append(item)
+
+    return data
+
+
+def get_values_fields(serializer: serializers.Serializer) -> List[str]:
+    """
+    The values() fields serialize_tagged_values needs for `serializer`.
+    """
+    return [
+        field.source
+        for field in serializer._readable_fields
+        if field.field_name != "tags"
+    ]
@@ -0,0 +1,170 @@
+"""
+Changes feed, for clients keeping a local copy of a user's data.
+
+Every synced row has a change_xid, the id of the transaction that created or
+last updated it, set by a trigger whenever updated_at changes: when it is
+saved, soft deleted or restored. A sync only reads rows written by
+transactions that ended before the oldest one still running, the xmin of the
+current snapshot, so a row can't commit behind the cursor later, however
+long its transaction takes. The row is held back until its transaction ends
+instead.
+
+A cursor holds, for each kind of row, the (change_xid, id) of the last row
+sent, or only that horizon when every row before it was sent. The next sync
+reads the rows after it from the (user, change_xid, id) indexes. The first
+sync, without a cursor, sends everything, in pages of at most SYNC_LIMIT rows
+of each kind. Hard deleted rows are not reported.
+"""
+
+import base64
+import binascii
+import json
+from typing import Dict, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+from .models import Note, Tag, TagLink, TimeEntry, Timestamp
+from .serializers import (
+    NoteSerializer,
+    TagLinkSerializer,
+    TagSerializer,
+    TimeEntrySerializer,
+    TimestampSerializer,
+    get_values_fields,
+    serialize_values,
+)
+
+# Most rows of each kind sent by one sync.
+SYNC_LIMIT = 500
+
+# name: (model, serializer class, lookup of the owner's id), in the order
+# they are sent, tags first so links never point to unknown tags.
+SYNCED = {
+    "tags": (Tag, TagSerializer, "assigned_to_id"),
+    "notes": (Note, NoteSerializer, "assigned_to_id"),
+    "time_entries": (TimeEntry, TimeEntrySerializer, "assigned_to_id"),
+    "timestamps": (Timestamp, TimestampSerializer, "assigned_to_id"),
+    "tag_links": (TagLink, TagLinkSerializer, "tag__assigned_to_id"),
+}
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict[str, tuple]:
+    """
+    The (change_xid, id) of the last row of each kind sent, by name. The id is
+    None when every row before change_xid was sent.
+    """
+    if not cursor:
+        return {}
+
+    try:
+        positions = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+
+        decoded = {}
+        for name, (change_xid, pk) in positions.items():
+            model = SYNCED[name][0]
+            if type(change_xid) is not int:
+                raise ValueError(change_xid)
+
+            if pk is not None:
+                pk = model._meta.pk.to_python(pk)
+
+            decoded[name] = (change_xid, pk)
+    except (
+        binascii.Error,
+        UnicodeError,
+        ValueError,
+        KeyError,
+        TypeError,
+        AttributeError,
+        ValidationError,
+    ):
+        raise InvalidCursor("Invalid cursor")
+
+    return decoded
+
+
+def encode_cursor(positions: Dict[str, tuple]) -> str:
+    encoded = {
+        name: [change_xid, None if pk is None else str(pk)]
+        for name, (change_xid, pk) in positions.items()
+    }
+
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode("ascii")).decode()
+
+
+def get_horizon() -> int:
+    """
+    The oldest transaction still running. Every transaction before it has
+    either committed or rolled back.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")
+        return cursor.fetchone()[0]
+
+
+def get_changes(user_id, cursor: Optional[str] = None) -> dict:
+    """
+    The rows of a user changed since `cursor`, a cursor returned by an earlier
+    call or None for everything. For each kind of row, the rows created or
+    updated are serialized in "updated" and the ids of the rows soft deleted
+    listed in "deleted". "has_more" tells whether there are more changes to
+    read already, with the returned cursor.
+
+    Rows written by the current transaction are never read, so this must not
+    be called after writing.
+    """
+    positions = decode_cursor(cursor)
+    horizon = get_horizon()
+
+    changes = {}
+    has_more = False
+    for name, (model, serializer_class, owner) in SYNCED.items():
+        queryset = model.objects_with_deleted.filter(
+            **{owner: user_id}, change_xid__lt=horizon
+        )
+        if model is TagLink:
+            # Links to tasks and statistics are not synced
+            queryset = queryset.filter(
+                Q(time_entry_id__isnull=False)
+                | Q(timestamp_id__isnull=False)
+                | Q(note_id__isnull=False)
+            )
+
+        if name in positions:
+            change_xid, pk = positions[name]
+            # Same as the keyset pagination: the plain bound starts the index
+            # range scan at the cursor.
+            queryset = queryset.filter(change_xid__gte=change_xid)
+            if pk is not None:
+                queryset = queryset.filter(
+                    Q(change_xid__gt=change_xid) | Q(change_xid=change_xid, pk__gt=pk)
+                )
+
+        serializer = serializer_class()
+        fields = ["id", "change_xid", "deleted_at", *get_values_fields(serializer)]
+        rows = list(
+            queryset.order_by("change_xid", "pk").values(*dict.fromkeys(fields))[
+                : SYNC_LIMIT + 1
+            ]
+        )
+        if len(rows) > SYNC_LIMIT:
+            has_more = True
+            rows = rows[:SYNC_LIMIT]
+            positions[name] = (rows[-1]["change_xid"], rows[-1]["id"])
+        else:
+            positions[name] = (horizon, None)
+
+        changes[name] = {
+            "updated": serialize_values(
+                serializer, [row for row in rows if row["deleted_at"] is None]
+            ),
+            "deleted": [row["id"] for row in rows if row["deleted_at"] is not None],
+        }
+
+    return {"cursor": encode_cursor(positions), "has_more": has_more, **changes}
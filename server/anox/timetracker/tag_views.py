@@ -1,16 +1,33 @@
-from django.db import IntegrityError
+import functools
+import uuid
+from datetime import date
+from typing import List, Optional, Tuple
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import IntegrityError, connection
+from django.utils.dateparse import parse_date
 from rest_framework import filters, permissions, status, viewsets
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from . import report_cache, rollups
+from .conditional import ConditionalGetMixin, conditional_get
 from .filters import IsAssignedToFilterBackend
 from .models import Tag
-from .serializers import TagSerializer
+from .serializers import (
+    TagSerializer,
+    get_tag_values_fields,
+    get_values_fields,
+    serialize_tag_values,
+)
 from .utils import to_canonical_name
 
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permissions_classes = [permissions.IsAuthenticated]
@@ -20,9 +37,19 @@ class TagViewSet(viewsets.ModelViewSet):
         IsAssignedToFilterBackend,
     ]
     search_fields = ["canonical_name"]
-    ordering_fields = ["created_at", "name"]
+    ordering_fields = ["created_at", "name", "reference_count"]
     ordering = ["-created_at"]
 
+    def get_queryset(self):
+        """
+        Only loads the columns the serializer renders, see SparseFieldsMixin.
+        """
+        queryset = super().get_queryset()
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+
+        return queryset.only(*get_values_fields(self.get_serializer()))
+
     def create(self, request, *args, **kwargs):
         serializer = TagSerializer(data=request.data)
         tag_name = to_canonical_name(request.data["name"])
@@ -60,40 +87,262 @@ class TagViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+class BadRequest(Exception):
+    pass
+
+
+def bad_request(message: str) -> Response:
+    return Response({"error": {"message": message}}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def parse_date_param(request: Request, name: str) -> Optional[date]:
+    value = request.query_params.get(name)
+    if not value:
+        return None
+
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+
+    if parsed is None:
+        raise BadRequest(f"'{name}' must be a date formatted as YYYY-MM-DD")
+
+    return parsed
+
+
+def parse_date_range(request: Request) -> Tuple[Optional[date], Optional[date]]:
+    start = parse_date_param(request, "start")
+    end = parse_date_param(request, "end")
+
+    if start is not None and end is not None and end < start:
+        raise BadRequest("'end' is before 'start'")
+
+    return start, end
+
+
+def parse_granularity(request: Request) -> str:
+    granularity = request.query_params.get("granularity", "day")
+    if granularity not in rollups.GRANULARITIES:
+        raise BadRequest(
+            f"'granularity' must be one of {', '.join(rollups.GRANULARITIES)}"
+        )
+
+    return granularity
+
+
+def parse_tag_ids(request: Request) -> Optional[List[uuid.UUID]]:
+    """
+    Tag ids from the `tags` query parameter, either repeated or comma
+    separated. None if the parameter is missing, meaning all of the user's tags.
+    """
+    values = request.query_params.getlist("tags")
+    if not values:
+        return None
+
+    tag_ids = []
+    for value in values:
+        for tag_id in value.split(","):
+            try:
+                tag_ids.append(uuid.UUID(tag_id.strip()))
+            except ValueError:
+                raise BadRequest(f"'{tag_id}' is not a valid tag id")
+
+    return list(dict.fromkeys(tag_ids))
+
+
+def report_to_response(report) -> dict:
+    result = []
+    total = 0
+    for date_key in sorted(report.keys()):
+        seconds = report[date_key]
+        total += seconds
+        result.append({"date": str(date_key), "seconds": seconds})
+
+    return {"report": result, "total": total}
+
+
+def parse_limit(request: Request, default: int, maximum: int) -> int:
+    value = request.query_params.get("limit")
+    if not value:
+        return default
+
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+
+    if not 0 < limit <= maximum:
+        raise BadRequest(f"'limit' must be a number from 1 to {maximum}")
+
+    return limit
+
+
+@functools.cache
+def has_trigram_extension() -> bool:
+    """
+    Whether pg_trgm is installed, which it is wherever it is available, see
+    migration 0013.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
 @api_view(["GET"])
+@conditional_get
+def tag_autocomplete(request: Request):
+    """
+    Up to `limit` of the user's tags whose name starts with `q`, most used
+    first. Read from tags_user_name_prefix_idx, so it stays fast enough to
+    call on every keystroke.
+
+    When fewer tags than that start with `q`, the rest are filled up with the
+    tags whose names are most similar to it, read from tags_name_trgm_idx, so
+    typos and words in the middle of names still find tags.
+    """
+    try:
+        limit = parse_limit(
+            request, default=AUTOCOMPLETE_LIMIT, maximum=MAX_AUTOCOMPLETE_LIMIT
+        )
+    except BadRequest as e:
+        return bad_request(str(e))
+
+    prefix = to_canonical_name(request.query_params.get("q", ""))
+    tags = Tag.objects.filter(assigned_to_id=request.user.id)
+    fields = get_tag_values_fields()
+
+    rows = list(
+        tags.filter(canonical_name__startswith=prefix)
+        .order_by("-reference_count", "canonical_name")
+        .values(*fields)[:limit]
+    )
+
+    if prefix and len(rows) < limit and has_trigram_extension():
+        rows += (
+            tags.filter(canonical_name__trigram_similar=prefix)
+            .exclude(canonical_name__startswith=prefix)
+            .annotate(similarity=TrigramSimilarity("canonical_name", prefix))
+            .order_by("-similarity", "-reference_count", "canonical_name")
+            .values(*fields)[: limit - len(rows)]
+        )
+
+    return Response({"results": serialize_tag_values(rows)})
+
+
+@api_view(["GET"])
+@conditional_get
 def tag_totals(request: Request, tag_id):
     try:
         tag: Tag = Tag.objects.get(pk=tag_id)
     except Tag.DoesNotExist:
         return Response(None, status=status.HTTP_404_NOT_FOUND)
 
-    if tag.assigned_to != request.user:
+    if tag.assigned_to_id != request.user.id:
         return Response(None, status=status.HTTP_403_FORBIDDEN)
 
-    return Response(
-        {
+    totals = report_cache.get_or_compute(
+        report_cache.tag_key(tag.id, tag.report_version, "totals"),
+        lambda: {
             "references": tag.get_total_references(),
-            "totalTime": tag.get_total_time().total_seconds(),
-        }
+            "totalTime": rollups.get_total_seconds(tag.id),
+        },
     )
 
+    return Response(totals)
+
 
 @api_view(["GET"])
+@conditional_get
 def tag_time_report(request: Request, tag_id):
+    """
+    Time tracked for a tag per period. Takes optional `start` and `end` dates
+    (YYYY-MM-DD, both inclusive) and a `granularity` of day, week, month or
+    year. Each period is reported under the date it starts on.
+    """
     try:
         tag: Tag = Tag.objects.get(pk=tag_id)
     except Tag.DoesNotExist:
         return Response(None, status=status.HTTP_404_NOT_FOUND)
 
-    if tag.assigned_to != request.user:
+    if tag.assigned_to_id != request.user.id:
         return Response(None, status=status.HTTP_403_FORBIDDEN)
 
-    result = []
-    report = tag.get_time_report()
-    total = 0
-    for date_key in sorted(report.keys()):
-        seconds = report[date_key].total_seconds()
-        total += seconds
-        result.append({"date": str(date_key), "seconds": seconds})
+    try:
+        start, end = parse_date_range(request)
+        granularity = parse_granularity(request)
+    except BadRequest as e:
+        return bad_request(str(e))
+
+    report = report_cache.get_or_compute(
+        report_cache.tag_key(
+            tag.id, tag.report_version, "time-report", start, end, granularity
+        ),
+        lambda: report_to_response(
+            rollups.get_time_report(tag.id, start, end, granularity)
+        ),
+    )
+
+    return Response(report)
+
+
+@api_view(["GET"])
+@conditional_get
+def tags_time_report(request: Request):
+    """
+    Time reports for several tags at once. Takes a list of tag ids in `tags`,
+    all of the user's tags if it is missing, and the same `start`, `end` and
+    `granularity` parameters as tag_time_report.
+    """
+    try:
+        tag_ids = parse_tag_ids(request)
+        start, end = parse_date_range(request)
+        granularity = parse_granularity(request)
+    except BadRequest as e:
+        return bad_request(str(e))
+
+    if tag_ids is None:
+        versions = dict(
+            Tag.objects.filter(assigned_to=request.user).values_list(
+                "id", "report_version"
+            )
+        )
+    else:
+        tags = Tag.objects.filter(pk__in=tag_ids).values_list(
+            "id", "assigned_to_id", "report_version"
+        )
+
+        if len(tags) != len(tag_ids):
+            return Response(None, status=status.HTTP_404_NOT_FOUND)
+
+        if any(owner != request.user.id for _, owner, _ in tags):
+            return Response(None, status=status.HTTP_403_FORBIDDEN)
 
-    return Response({"report": result, "total": total})
+        versions = {tag_id: version for tag_id, _, version in tags}
+        # Keep the requested order
+        versions = {tag_id: versions[tag_id] for tag_id in tag_ids}
+
+    reports = report_cache.get_many_or_compute(
+        {
+            tag_id: report_cache.tag_key(
+                tag_id, version, "time-report", start, end, granularity
+            )
+            for tag_id, version in versions.items()
+        },
+        lambda missing: {
+            tag_id: report_to_response(report)
+            for tag_id, report in rollups.get_time_reports(
+                missing, start, end, granularity
+            ).items()
+        },
+    )
+
+    return Response(
+        {"reports": [{"tag_id": str(tag_id), **reports[tag_id]} for tag_id in versions]}
+    )
+
+
+@api_view(["GET"])
+@permission_classes([permissions.IsAdminUser])
+def report_cache_stats(request: Request):
+    return Response(report_cache.get_stats())
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Tag, TagLink
+from .rollups import RollupScope
+from .utils import to_canonical_name
+
+
+class TagNameTaken(Exception):
+    """
+    A tag name is already used by another user. Canonical names are unique
+    across all users.
+    """
+
+    def __init__(self, canonical_name: str) -> None:
+        super().__init__(f"Tag with the name '{canonical_name}' already exists")
+        self.canonical_name = canonical_name
+
+
+def resolve_tags(user_id, names: Iterable[str]) -> Dict[str, Tag]:
+    """
+    The user's tags named `names`, keyed by canonical name. Tags that do not
+    exist yet are created, in bulk, and soft deleted ones are restored.
+
+    Takes one query when every tag exists. Raises TagNameTaken if a name
+    belongs to another user's tag.
+    """
+    names_by_canonical: Dict[str, str] = {}
+    for name in names:
+        names_by_canonical.setdefault(to_canonical_name(name), name)
+
+    if not names_by_canonical:
+        return {}
+
+    tags = {
+        tag.canonical_name: tag
+        for tag in Tag.objects_with_deleted.filter(
+            assigned_to_id=user_id, canonical_name__in=names_by_canonical.keys()
+        )
+    }
+
+    deleted = [tag for tag in tags.values() if tag.deleted_at is not None]
+    if deleted:
+        Tag.objects_with_deleted.filter(id__in=[tag.id for tag in deleted]).restore()
+        for tag in deleted:
+            tag.deleted_at = None
+
+    missing = names_by_canonical.keys() - tags.keys()
+    if missing:
+        # bulk_create skips save(), so the canonical name is set here. Tags
+        # created concurrently are skipped too, then read back with the rest.
+        Tag.objects.bulk_create(
+            [
+                Tag(
+                    name=names_by_canonical[canonical_name],
+                    canonical_name=canonical_name,
+                    color=settings.DEFAULT_TAG_COLOR,
+                    assigned_to_id=user_id,
+                )
+                for canonical_name in missing
+            ],
+            ignore_conflicts=True,
+        )
+
+        tags.update(
+            (tag.canonical_name, tag)
+            for tag in Tag.objects.filter(
+                assigned_to_id=user_id, canonical_name__in=missing
+            )
+        )
+
+        taken = missing - tags.keys()
+        if taken:
+            raise TagNameTaken(min(taken))
+
+    return tags
+
+
+def get_tag_ids(tags: Dict[str, Tag], names: Iterable[str]) -> List:
+    """
+    Ids of the tags named `names` among tags resolved by resolve_tags, in
+    order and without duplicates.
+    """
+    return list(dict.fromkeys(tags[to_canonical_name(name)].id for name in names))
+
+
+def link_tags(
+    link_field: str,
+    tag_ids_by_object: Dict,
+    scope: RollupScope,
+    replace: Iterable = (),
+) -> None:
+    """
+    Links each object of `tag_ids_by_object`, keyed by id, to its tags through
+    the TagLink field `link_field`, e.g. "note", with one bulk insert.
+
+    Objects in `replace` may be linked already. Their links to the given tags
+    are kept and the others soft deleted. The changes in reference counts are
+    added to `scope`, to be refreshed by the caller.
+    """
+    linked = defaultdict(set)
+    removed = []
+
+    links = TagLink.objects.filter(
+        **{
+            f"{link_field}_id__in": [
+                object_id for object_id in replace if object_id in tag_ids_by_object
+            ]
+        }
+    ).values_list("id", f"{link_field}_id", "tag_id")
+    for link_id, object_id, tag_id in links:
+        if tag_id in tag_ids_by_object[object_id] and tag_id not in linked[object_id]:
+            linked[object_id].add(tag_id)
+        else:
+            removed.append(link_id)
+            if tag_id is not None:
+                scope.add_reference_delta(tag_id, -1)
+
+    now = timezone.now()
+    TagLink.objects.filter(id__in=removed).update(deleted_at=now, updated_at=now)
+
+    new_links = [
+        TagLink(tag_id=tag_id, **{f"{link_field}_id": object_id})
+        for object_id, tag_ids in tag_ids_by_object.items()
+        for tag_id in tag_ids
+        if tag_id not in linked[object_id]
+    ]
+    TagLink.objects.bulk_create(new_links)
+
+    for link in new_links:
+        scope.add_reference_delta(link.tag_id, 1)
@@ -0,0 +1,52 @@
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .conditional import conditional_get
+from .models import Task
+from .reports import get_task_time_tree
+
+
+def tree_to_response(rows) -> dict:
+    return {
+        "tasks": [
+            {
+                "id": task_id,
+                "parent_id": parent_id,
+                "name": name,
+                "depth": depth,
+                "seconds": seconds,
+                "subtree_seconds": subtree_seconds,
+            }
+            for task_id, parent_id, name, depth, seconds, subtree_seconds in rows
+        ]
+    }
+
+
+@api_view(["GET"])
+@conditional_get
+def tasks_time_tree(request: Request):
+    """
+    Every task of the user, in depth first order, with the time tracked on it
+    and on it and its subtasks. See reports.TASK_TIME_TREE_SQL.
+    """
+    return Response(tree_to_response(get_task_time_tree(request.user.id)))
+
+
+@api_view(["GET"])
+@conditional_get
+def task_time_tree(request: Request, task_id):
+    """
+    The same as tasks_time_tree, for a task and its subtasks only.
+    """
+    owner_id = (
+        Task.objects.filter(pk=task_id).values_list("assigned_to_id", flat=True).first()
+    )
+    if owner_id is None:
+        return Response(None, status=status.HTTP_404_NOT_FOUND)
+
+    if owner_id != request.user.id:
+        return Response(None, status=status.HTTP_403_FORBIDDEN)
+
+    return Response(tree_to_response(get_task_time_tree(request.user.id, task_id)))
@@ -0,0 +1,485 @@
+"""
+Helpers for the benchmark suite in test_benchmarks.py: seeding a large
+dataset, exporting data in the format importdata reads, and measuring the
+latency, query count and peak memory of a call.
+"""
+
+import json
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from timetracker.models import (
+    Note,
+    Statistic,
+    StatisticValue,
+    Tag,
+    TagLink,
+    Task,
+    TimeEntry,
+    Timestamp,
+)
+from timetracker.rollups import rebuild_rollups, recount_references
+
+BATCH_SIZE = 5000
+
+# Row counts at scale 1, spread evenly over every user
+TIME_ENTRIES = 200_000
+NOTES = 20_000
+TIMESTAMPS = 20_000
+STATISTIC_VALUES = 100_000
+TASKS = 2_000
+TAGS = 500
+STATISTICS = 50
+USERS = 5
+
+# Enough for every object to get a few distinct tags at small scales
+MIN_TAGS = 10
+
+TAGS_PER_TIME_ENTRY = 2
+TAGS_PER_NOTE = 2
+
+START = datetime(2020, 1, 1, tzinfo=timezone.get_fixed_timezone(0))
+
+NOTE_WORDS = [
+    "meeting",
+    "review",
+    "design",
+    "release",
+    "bug",
+    "planning",
+    "retro",
+    "lunch",
+    "deploy",
+    "interview",
+]
+
+
+@dataclass
+class Dataset:
+    user: User
+    admin: User
+    tags: List[Tag]
+    time_entry: TimeEntry
+    note: Note
+    timestamp: Timestamp
+    # A page in the middle of the time entries of the user
+    deep_page: int
+    counts: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class Measurement:
+    median_ms: float
+    min_ms: float
+    max_ms: float
+    queries: int
+    peak_memory_kb: float
+    repeat: int
+
+
+def scaled(count: int, scale: float) -> int:
+    return max(1, int(count * scale))
+
+
+def _bulk_create(model, objects) -> int:
+    """
+    Creates the objects of a generator in batches, without ever holding
+    all of them in memory.
+    """
+    created = 0
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+
+    if batch:
+        model.objects.bulk_create(batch)
+        created += len(batch)
+
+    return created
+
+
+def _intervals(rng: random.Random, count: int):
+    """
+    Yields `count` back to back (started_at, ended_at) pairs of 5 minutes to
+    3 hours, with gaps of up to an hour.
+    """
+    started_at = START
+    for _ in range(count):
+        started_at += timedelta(minutes=rng.randint(0, 60))
+        ended_at = started_at + timedelta(minutes=rng.randint(5, 180))
+        yield started_at, ended_at
+        started_at = ended_at
+
+
+def seed_dataset(scale: float = 1.0, seed: int = 0) -> Dataset:
+    """
+    Seeds USERS users with time entries, tag links, notes, timestamps, tasks
+    and statistic values, `scale` times the module counts in total.
+    The first user is the one benchmarks make requests as.
+    """
+    rng = random.Random(seed)
+
+    users = [
+        User.objects.create(username=f"benchmark-{index}") for index in range(USERS)
+    ]
+    admin = User.objects.create(username="benchmark-admin", is_staff=True)
+
+    def per_user(count: int) -> int:
+        return max(1, scaled(count, scale) // USERS)
+
+    counts = {}
+
+    tags_by_user = {}
+    for user in users:
+        tags_by_user[user.id] = Tag.objects.bulk_create(
+            Tag(
+                name=f"Tag {user.username} {index}",
+                canonical_name=f"tag-{user.username}-{index}",
+                color="FF0000FF",
+                assigned_to=user,
+            )
+            for index in range(max(MIN_TAGS, per_user(TAGS)))
+        )
+    counts["tags"] = sum(len(tags) for tags in tags_by_user.values())
+
+    counts["tasks"] = _bulk_create(
+        Task,
+        (
+            Task(
+                name=f"Task {user.username} {index}",
+                canonical_name=f"task-{user.username}-{index}",
+                description="",
+                assigned_to=user,
+            )
+            for user in users
+            for index in range(per_user(TASKS))
+        ),
+    )
+
+    def tagged(objects, tags_per_object: int, link_field: str):
+        for obj in objects:
+            for tag in rng.sample(tags_by_user[obj.assigned_to_id], tags_per_object):
+                yield TagLink(tag=tag, **{link_field: obj})
+
+    for user in users:
+        time_entries = [
+            TimeEntry(
+                started_at=started_at,
+                ended_at=ended_at,
+                description=rng.choice(NOTE_WORDS),
+                assigned_to=user,
+            )
+            for started_at, ended_at in _intervals(rng, per_user(TIME_ENTRIES))
+        ]
+        counts["time_entries"] = counts.get("time_entries", 0) + _bulk_create(
+            TimeEntry, time_entries
+        )
+        counts["tag_links"] = counts.get("tag_links", 0) + _bulk_create(
+            TagLink, tagged(time_entries, TAGS_PER_TIME_ENTRY, "time_entry")
+        )
+
+        notes = [
+            Note(
+                title=f"{rng.choice(NOTE_WORDS)} {index}",
+                content=" ".join(rng.choices(NOTE_WORDS, k=50)),
+                for_date=START + timedelta(days=index),
+                assigned_to=user,
+            )
+            for index in range(per_user(NOTES))
+        ]
+        counts["notes"] = counts.get("notes", 0) + _bulk_create(Note, notes)
+        counts["tag_links"] += _bulk_create(
+            TagLink, tagged(notes, TAGS_PER_NOTE, "note")
+        )
+
+        timestamps = [
+            Timestamp(description=rng.choice(NOTE_WORDS), assigned_to=user)
+            for _ in range(per_user(TIMESTAMPS))
+        ]
+        counts["timestamps"] = counts.get("timestamps", 0) + _bulk_create(
+            Timestamp, timestamps
+        )
+        counts["tag_links"] += _bulk_create(TagLink, tagged(timestamps, 1, "timestamp"))
+
+        user_statistics = Statistic.objects.bulk_create(
+            Statistic(
+                name=f"Statistic {user.username} {index}",
+                canonical_name=f"statistic-{user.username}-{index}",
+                color="FF0000FF",
+                time_type="instance",
+                assigned_to=user,
+            )
+            for index in range(per_user(STATISTICS))
+        )
+        counts["statistic_values"] = counts.get("statistic_values", 0) + _bulk_create(
+            StatisticValue,
+            (
+                StatisticValue(
+                    started_at=started_at,
+                    ended_at=ended_at,
+                    value=rng.random() * 100,
+                    statistic=rng.choice(user_statistics),
+                )
+                for started_at, ended_at in _intervals(rng, per_user(STATISTIC_VALUES))
+            ),
+        )
+
+    rebuild_rollups()
+    recount_references()
+
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    user = users[0]
+    return Dataset(
+        user=user,
+        admin=admin,
+        tags=list(Tag.objects.filter(assigned_to=user).order_by("-reference_count")),
+        time_entry=TimeEntry.objects.filter(assigned_to=user).first(),
+        note=Note.objects.filter(assigned_to=user).first(),
+        timestamp=Timestamp.objects.filter(assigned_to=user).first(),
+        deep_page=max(
+            1, per_user(TIME_ENTRIES) // (2 * settings.REST_FRAMEWORK["PAGE_SIZE"])
+        ),
+        counts=counts,
+    )
+
+
+def write_import_files(directory: Path, scale: float = 1.0, seed: int = 0) -> int:
+    """
+    Writes a dataset of `scale` times 10% of the seeded time entries, in the
+    format read by the importdata command, to `directory`. Returns how many
+    records were written.
+    """
+    rng = random.Random(seed)
+
+    def ts(value: datetime) -> str:
+        return str(int(value.timestamp()))
+
+    username = "benchmark-import"
+    created_at = ts(START)
+
+    users = [
+        {
+            "username": username,
+            "email": "import@example.com",
+            "timezone": "UTC",
+            "dateFormat": "",
+            "dateTimeFormat": "",
+            "todayDateTimeFormat": "",
+            "durationFormat": "",
+        }
+    ]
+    tags = [
+        {
+            "id": str(uuid.uuid4()),
+            "createdAt": created_at,
+            "name": f"Import {index}",
+            "canonicalName": f"import-{index}",
+            "color": "#FF0000",
+            "assignedTo": username,
+        }
+        for index in range(max(MIN_TAGS, scaled(TAGS, scale)))
+    ]
+    statistics_ = [
+        {
+            "id": str(uuid.uuid4()),
+            "createdAt": created_at,
+            "name": f"Import statistic {index}",
+            "canonicalName": f"import-statistic-{index}",
+            "description": "",
+            "color": "#FF0000",
+            "unit": "",
+            "timeType": "instance",
+            "assignedTo": username,
+            "tags": [],
+        }
+        for index in range(scaled(STATISTICS, scale))
+    ]
+
+    def tag_refs(count: int):
+        return [{"id": tag["id"]} for tag in rng.sample(tags, count)]
+
+    intervals = _intervals(rng, scaled(TIME_ENTRIES // 10, scale))
+    time_entries = [
+        {
+            "id": str(uuid.uuid4()),
+            "createdAt": ts(started_at),
+            "updatedAt": ts(ended_at),
+            "startedAt": ts(started_at),
+            "endedAt": ts(ended_at),
+            "description": rng.choice(NOTE_WORDS),
+            "assignedTo": username,
+            "tags": tag_refs(TAGS_PER_TIME_ENTRY),
+        }
+        for started_at, ended_at in intervals
+    ]
+    notes = [
+        {
+            "id": str(uuid.uuid4()),
+            "createdAt": created_at,
+            "updatedAt": created_at,
+            "title": rng.choice(NOTE_WORDS),
+            "content": " ".join(rng.choices(NOTE_WORDS, k=50)),
+            "assignedTo": username,
+            "tags": tag_refs(TAGS_PER_NOTE),
+        }
+        for _ in range(scaled(NOTES // 10, scale))
+    ]
+    intervals = _intervals(rng, scaled(STATISTIC_VALUES // 10, scale))
+    statistic_values = [
+        {
+            "id": str(uuid.uuid4()),
+            "createdAt": ts(started_at),
+            "startedAt": ts(started_at),
+            "endedAt": ts(ended_at),
+            "value": rng.random() * 100,
+            "statisticId": rng.choice(statistics_)["id"],
+        }
+        for started_at, ended_at in intervals
+    ]
+
+    files = {
+        "users_0.json": users,
+        "tags_0.json": tags,
+        "statistics_0.json": statistics_,
+        "statistic_values_0.json": statistic_values,
+        "time_entries_0.json": time_entries,
+        "notes_0.json": notes,
+    }
+
+    for name, items in files.items():
+        with (directory / name).open("w") as f:
+            json.dump(items, f)
+
+    with (directory / "order.json").open("w") as f:
+        json.dump(list(files.keys()), f)
+
+    return sum(len(items) for items in files.values())
+
+
+class QueryCounter:
+    """
+    Counts the queries run on a connection. Unlike CaptureQueriesContext it
+    still works across test client requests, which reset the query log.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(
+    call: Callable[[], None],
+    repeat: int = 5,
+    setup: Optional[Callable[[], None]] = None,
+) -> Measurement:
+    """
+    Times `repeat` calls and counts the queries of the last one, then makes
+    one more call under tracemalloc for the peak memory, which would otherwise
+    skew the timings. `setup` runs before every call, outside the measurement.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - start) * 1000)
+
+    if setup is not None:
+        setup()
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(
+        median_ms=statistics.median(timings),
+        min_ms=min(timings),
+        max_ms=max(timings),
+        queries=counter.count,
+        peak_memory_kb=peak / 1024,
+        repeat=repeat,
+    )
+
+
+def check_thresholds(
+    name: str,
+    measurement: Measurement,
+    thresholds: dict,
+    baseline: Optional[dict] = None,
+    tolerance: float = 1.5,
+) -> List[str]:
+    """
+    Returns how `measurement` breaks the limits of `name` in `thresholds`, or
+    regresses from the `baseline` results by more than `tolerance` times.
+    Query counts never get any tolerance.
+    """
+    failures = []
+
+    limits = thresholds.get(name, {})
+    for key, limit in limits.items():
+        value = getattr(measurement, key)
+        if value > limit:
+            failures.append(f"{name}: {key} {value:.1f} is over the limit {limit}")
+
+    previous = (baseline or {}).get(name)
+    if previous is not None:
+        if measurement.queries > previous["queries"]:
+            failures.append(
+                f"{name}: {measurement.queries} queries, "
+                f"up from {previous['queries']}"
+            )
+
+        for key in ("median_ms", "peak_memory_kb"):
+            value = getattr(measurement, key)
+            if value > previous[key] * tolerance:
+                failures.append(
+                    f"{name}: {key} {value:.1f} regressed from {previous[key]:.1f}"
+                )
+
+    return failures
+
+
+def write_results(
+    path: Path, scale: float, counts: dict, results: Dict[str, Measurement]
+) -> None:
+    with path.open("w") as f:
+        json.dump(
+            {
+                "created_at": timezone.now().isoformat(),
+                "scale": scale,
+                "counts": counts,
+                "results": {
+                    name: asdict(measurement)
+                    for name, measurement in sorted(results.items())
+                },
+            },
+            f,
+            indent=2,
+        )
@@ -0,0 +1,20 @@
+import pytest
+from rest_framework.test import APIClient
+from timetracker.models import User
+
+
+@pytest.fixture
+def user():
+    return User(username="test")
+
+
+@pytest.fixture
+def db_user(db):
+    return User.objects.create(username="test")
+
+
+@pytest.fixture
+def client(db_user):
+    client = APIClient()
+    client.force_authenticate(db_user)
+    return client
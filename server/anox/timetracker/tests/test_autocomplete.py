@@ -0,0 +1,66 @@
+import pytest
+from django.contrib.auth.models import User
+from timetracker.models import Tag
+from timetracker.tag_views import has_trigram_extension
+
+
+def create_tag(user, name, reference_count=0) -> Tag:
+    tag = Tag.objects.create(name=name, color="FF0000FF", assigned_to=user)
+    Tag.objects.filter(id=tag.id).update(reference_count=reference_count)
+    return tag
+
+
+def autocomplete(client, **params):
+    response = client.get("/api/tags/autocomplete/", params)
+    assert response.status_code == 200
+    return [tag["name"] for tag in response.data["results"]]
+
+
+@pytest.mark.django_db
+class TestTagAutocomplete:
+    def test_prefix_by_usage(self, client, db_user):
+        create_tag(db_user, "Meeting", reference_count=2)
+        create_tag(db_user, "Meetup", reference_count=5)
+        create_tag(db_user, "Mentoring", reference_count=9)
+        create_tag(db_user, "Reading", reference_count=1)
+
+        assert autocomplete(client, q="mee") == ["Meetup", "Meeting"]
+        assert autocomplete(client, q="writing") == []
+        assert autocomplete(client, q="me") == ["Mentoring", "Meetup", "Meeting"]
+        assert autocomplete(client, q="  ME") == ["Mentoring", "Meetup", "Meeting"]
+        assert autocomplete(client) == ["Mentoring", "Meetup", "Meeting", "Reading"]
+
+    def test_similar(self, client, db_user):
+        if not has_trigram_extension():
+            pytest.skip("pg_trgm is not available")
+
+        create_tag(db_user, "Meeting", reference_count=5)
+        create_tag(db_user, "Meetup", reference_count=1)
+        create_tag(db_user, "Reading", reference_count=9)
+
+        # Tags starting with q come first, then the most similar ones
+        assert autocomplete(client, q="meetu") == ["Meetup", "Meeting"]
+        assert autocomplete(client, q="meetnig") == ["Meetup", "Meeting"]
+        assert autocomplete(client, q="meetu", limit=1) == ["Meetup"]
+
+    def test_limit(self, client, db_user):
+        for i in range(15):
+            create_tag(db_user, f"project {i:02}", reference_count=i)
+
+        assert len(autocomplete(client, q="project")) == 10
+        assert autocomplete(client, q="project", limit=2) == [
+            "project 14",
+            "project 13",
+        ]
+
+        for limit in ["0", "51", "many"]:
+            response = client.get("/api/tags/autocomplete/", {"limit": limit})
+            assert response.status_code == 400
+
+    def test_only_own_live_tags(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+        create_tag(stranger, "Secret")
+        create_tag(db_user, "Second").delete()
+        create_tag(db_user, "Seconds")
+
+        assert autocomplete(client, q="sec") == ["Seconds"]
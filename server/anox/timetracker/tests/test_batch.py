@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from timetracker.models import Tag, TagLink, TimeEntry
+from timetracker.rollups import check_rollups, get_total_seconds
+
+START = datetime(2000, 1, 1, 9, tzinfo=timezone.get_current_timezone())
+
+
+def entry(hours: int, tags=None, **fields) -> dict:
+    item = {
+        "started_at": (START + timedelta(days=hours)).isoformat(),
+        "ended_at": (START + timedelta(days=hours, hours=hours)).isoformat(),
+        "description": f"{hours} hours",
+        **fields,
+    }
+    if tags is not None:
+        item["tags"] = tags
+
+    return item
+
+
+def batch(client, items, status=200):
+    response = client.post("/api/time_entries/batch/", items, format="json")
+    assert response.status_code == status
+    return response.data
+
+
+def tag_names(result) -> list:
+    return [tag["name"] for tag in result["data"]["tags"]]
+
+
+@pytest.mark.django_db
+class TestTimeEntryBatch:
+    def test_create(self, client, db_user):
+        Tag.objects.create(name="Work", color="FF0000FF", assigned_to=db_user)
+
+        results = batch(
+            client,
+            [
+                entry(1, tags=["work", "Reading"]),
+                entry(2, tags=["Reading", "reading"]),
+                entry(3),
+            ],
+        )
+
+        assert [result["status"] for result in results] == [201, 201, 201]
+        assert [result["data"]["description"] for result in results] == [
+            "1 hours",
+            "2 hours",
+            "3 hours",
+        ]
+        assert tag_names(results[0]) == ["Work", "Reading"]
+        assert tag_names(results[1]) == ["Reading"]
+        assert tag_names(results[2]) == []
+
+        assert TimeEntry.objects.filter(assigned_to=db_user).count() == 3
+
+        reading = Tag.objects.get(canonical_name="reading")
+        assert reading.reference_count == 2
+        assert get_total_seconds(reading.id) == 3 * 3600
+        assert check_rollups() == []
+
+    def test_update(self, client, db_user):
+        created = batch(client, [entry(1, tags=["work"]), entry(2, tags=["work"])])
+        first, second = (result["data"]["id"] for result in created)
+
+        results = batch(
+            client,
+            [
+                {"id": first, "description": "changed"},
+                {"id": second, "tags": ["home"]},
+                entry(3, tags=["home"]),
+            ],
+        )
+
+        assert [result["status"] for result in results] == [200, 200, 201]
+        assert results[0]["data"]["description"] == "changed"
+        assert tag_names(results[0]) == ["work"]
+        assert tag_names(results[1]) == ["home"]
+
+        work = Tag.objects.get(canonical_name="work")
+        home = Tag.objects.get(canonical_name="home")
+        assert work.reference_count == 1
+        assert home.reference_count == 2
+        assert get_total_seconds(work.id) == 3600
+        assert get_total_seconds(home.id) == 5 * 3600
+        assert check_rollups() == []
+
+    def test_invalid_batch_saves_nothing(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+        other = TimeEntry.objects.create(
+            started_at=START, description="", assigned_to=stranger
+        )
+
+        errors = batch(
+            client,
+            [
+                entry(1, tags=["work"]),
+                {"description": "no start"},
+                {"id": str(other.id), "description": "mine now"},
+            ],
+            status=400,
+        )
+
+        assert errors[0] == {}
+        assert "started_at" in errors[1]
+        assert "id" in errors[2]
+
+        assert not TimeEntry.objects.filter(assigned_to=db_user).exists()
+        assert not Tag.objects.exists()
+
+        for items in [[], {"description": "not a list"}]:
+            batch(client, items, status=400)
+
+    def test_tag_of_another_user(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+        Tag.objects.create(name="Work", color="FF0000FF", assigned_to=stranger)
+
+        batch(client, [entry(1, tags=["work"])], status=400)
+
+        assert not TimeEntry.objects.filter(assigned_to=db_user).exists()
+
+    def test_queries_do_not_grow(self, client, db_user, django_assert_num_queries):
+        batch(client, [entry(1, tags=["work", "home"])])
+
+        # Creating the tags the first time takes two more queries
+        with django_assert_num_queries(15):
+            batch(client, [entry(1, tags=["work", "home"])])
+
+        with django_assert_num_queries(15):
+            batch(client, [entry(i, tags=["work", "home"]) for i in range(1, 50)])
+
+        assert TagLink.objects.count() == 2 * 51
@@ -0,0 +1,290 @@
+"""
+Benchmarks of every route in timetracker/urls.py and of importdata, against a
+large seeded dataset. Skipped unless ANOX_BENCHMARK is set, see the README.
+"""
+
+import json
+import os
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from .benchmark import (
+    check_thresholds,
+    measure,
+    seed_dataset,
+    write_import_files,
+    write_results,
+)
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("ANOX_BENCHMARK"), reason="set ANOX_BENCHMARK to run benchmarks"
+)
+
+SCALE = float(os.getenv("ANOX_BENCHMARK_SCALE", "1"))
+REPEAT = int(os.getenv("ANOX_BENCHMARK_REPEAT", "5"))
+OUTPUT = Path(os.getenv("ANOX_BENCHMARK_OUTPUT", "benchmark-results.json"))
+THRESHOLDS = Path(
+    os.getenv(
+        "ANOX_BENCHMARK_THRESHOLDS",
+        Path(__file__).parent / "benchmark_thresholds.json",
+    )
+)
+BASELINE = os.getenv("ANOX_BENCHMARK_BASELINE")
+TOLERANCE = float(os.getenv("ANOX_BENCHMARK_TOLERANCE", "1.5"))
+
+# name: (method, url, data, expected status, whether to clear the report cache)
+# where url, and data when callable, are built from the dataset.
+ROUTES = {
+    "api-root": ("get", lambda d: "/api/", None, 200, False),
+    "notes-list": ("get", lambda d: "/api/notes/", None, 200, False),
+    "notes-list-sparse": (
+        "get",
+        lambda d: "/api/notes/",
+        {"fields": "id,title"},
+        200,
+        False,
+    ),
+    "notes-search": (
+        "get",
+        lambda d: "/api/notes/",
+        {"search": "interview"},
+        200,
+        False,
+    ),
+    "notes-detail": ("get", lambda d: f"/api/notes/{d.note.id}/", None, 200, False),
+    "notes-create": (
+        "post",
+        lambda d: "/api/notes/",
+        {"title": "benchmark", "content": "", "tags": ["benchmark", "other"]},
+        201,
+        False,
+    ),
+    "tags-list": ("get", lambda d: "/api/tags/", None, 200, False),
+    "tags-list-by-references": (
+        "get",
+        lambda d: "/api/tags/",
+        {"ordering": "-reference_count"},
+        200,
+        False,
+    ),
+    "sync": ("get", lambda d: "/api/sync/", None, 200, False),
+    "tags-autocomplete": (
+        "get",
+        lambda d: "/api/tags/autocomplete/",
+        lambda d: {"q": d.tags[0].name[:2]},
+        200,
+        False,
+    ),
+    "tags-detail": ("get", lambda d: f"/api/tags/{d.tags[0].id}/", None, 200, False),
+    "time-entries-list": ("get", lambda d: "/api/time_entries/", None, 200, False),
+    "time-entries-deep-page": (
+        "get",
+        lambda d: "/api/time_entries/",
+        lambda d: {"page": d.deep_page},
+        200,
+        False,
+    ),
+    "time-entries-cursor": (
+        "get",
+        lambda d: "/api/time_entries/",
+        {"cursor": ""},
+        200,
+        False,
+    ),
+    "time-entries-batch": (
+        "post",
+        lambda d: "/api/time_entries/batch/",
+        lambda d: [
+            {
+                "started_at": d.time_entry.started_at.isoformat(),
+                "ended_at": d.time_entry.ended_at.isoformat(),
+                "description": "benchmark",
+                "tags": [d.tags[i % 3].name, "benchmark"],
+            }
+            for i in range(50)
+        ],
+        200,
+        False,
+    ),
+    "tasks-time": ("get", lambda d: "/api/tasks/time/", None, 200, False),
+    "timesheet": (
+        "get",
+        lambda d: "/api/timesheet/",
+        lambda d: {
+            "start": str(d.time_entry.started_at.date()),
+            "end": str(d.time_entry.started_at.date() + timedelta(days=6)),
+        },
+        200,
+        False,
+    ),
+    "time-entries-overlaps": (
+        "get",
+        lambda d: "/api/time_entries/overlaps/",
+        None,
+        200,
+        False,
+    ),
+    "time-entries-range": (
+        "get",
+        lambda d: "/api/time_entries/",
+        lambda d: {
+            "started_after": (d.time_entry.started_at - timedelta(days=7)).isoformat(),
+            "started_before": d.time_entry.started_at.isoformat(),
+        },
+        200,
+        False,
+    ),
+    "time-entries-running": (
+        "get",
+        lambda d: "/api/time_entries/running/",
+        None,
+        204,
+        False,
+    ),
+    "time-entries-detail": (
+        "get",
+        lambda d: f"/api/time_entries/{d.time_entry.id}/",
+        None,
+        200,
+        False,
+    ),
+    "time-entries-update": (
+        "patch",
+        lambda d: f"/api/time_entries/{d.time_entry.id}/",
+        {"description": "benchmark"},
+        200,
+        False,
+    ),
+    "timestamps-list": ("get", lambda d: "/api/timestamps/", None, 200, False),
+    "timestamps-detail": (
+        "get",
+        lambda d: f"/api/timestamps/{d.timestamp.id}/",
+        None,
+        200,
+        False,
+    ),
+    "tag-totals": (
+        "get",
+        lambda d: f"/api/tags/{d.tags[0].id}/totals/",
+        None,
+        200,
+        True,
+    ),
+    "tag-totals-cached": (
+        "get",
+        lambda d: f"/api/tags/{d.tags[0].id}/totals/",
+        None,
+        200,
+        False,
+    ),
+    "tag-time-report": (
+        "get",
+        lambda d: f"/api/tags/{d.tags[0].id}/time-report/",
+        None,
+        200,
+        True,
+    ),
+    "tag-time-report-monthly": (
+        "get",
+        lambda d: f"/api/tags/{d.tags[0].id}/time-report/",
+        {"granularity": "month"},
+        200,
+        True,
+    ),
+    "tags-time-report": ("get", lambda d: "/api/tags/time-report/", None, 200, True),
+    "profile": ("get", lambda d: "/api/user/profile/", None, 200, False),
+}
+
+
+@pytest.fixture(scope="module")
+def dataset(django_db_setup, django_db_blocker):
+    # Seeded once for the whole module, outside the per-test transactions.
+    with django_db_blocker.unblock():
+        dataset = seed_dataset(SCALE)
+
+    yield dataset
+
+    with django_db_blocker.unblock():
+        call_command("flush", interactive=False, verbosity=0)
+
+
+@pytest.fixture(scope="module")
+def results(dataset):
+    results = {}
+
+    yield results
+
+    write_results(OUTPUT, SCALE, dataset.counts, results)
+
+
+@pytest.fixture(scope="module")
+def thresholds():
+    with THRESHOLDS.open() as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    if not BASELINE:
+        return None
+
+    with open(BASELINE) as f:
+        return json.load(f)["results"]
+
+
+def record(name, measurement, results, thresholds, baseline):
+    results[name] = measurement
+
+    failures = check_thresholds(name, measurement, thresholds, baseline, TOLERANCE)
+    assert failures == []
+
+
+@pytest.mark.django_db
+class TestBenchmarks:
+    @pytest.mark.parametrize("name", ROUTES.keys())
+    def test_route(self, name, dataset, results, thresholds, baseline):
+        method, url, data, status, cold = ROUTES[name]
+
+        client = APIClient()
+        client.force_authenticate(dataset.user)
+        url = url(dataset)
+        if callable(data):
+            data = data(dataset)
+
+        def call():
+            response = getattr(client, method)(url, data, format="json")
+            assert response.status_code == status
+
+        cache.clear()
+        measurement = measure(call, REPEAT, setup=cache.clear if cold else None)
+
+        record(name, measurement, results, thresholds, baseline)
+
+    def test_admin_route(self, dataset, results, thresholds, baseline):
+        client = APIClient()
+        client.force_authenticate(dataset.admin)
+
+        def call():
+            assert client.get("/api/report-cache/stats/").status_code == 200
+
+        measurement = measure(call, REPEAT)
+
+        record("report-cache-stats", measurement, results, thresholds, baseline)
+
+    def test_importdata(self, dataset, results, thresholds, baseline, tmp_path):
+        write_import_files(tmp_path, SCALE)
+
+        def call():
+            call_command("importdata", tmp_path, stdout=StringIO())
+
+        # Importing again updates every record instead of creating it, so
+        # only one run is comparable.
+        measurement = measure(call, repeat=1)
+
+        record("importdata", measurement, results, thresholds, baseline)
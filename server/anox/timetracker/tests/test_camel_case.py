@@ -0,0 +1,107 @@
+import io
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+import pytest
+from django.http import QueryDict
+from djangorestframework_camel_case.parser import (
+    CamelCaseJSONParser as LibraryJSONParser,
+)
+from djangorestframework_camel_case.render import (
+    CamelCaseJSONRenderer as LibraryJSONRenderer,
+)
+from djangorestframework_camel_case.util import underscoreize as library_underscoreize
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from timetracker import camel_case
+from timetracker.camel_case import (
+    CamelCaseJSONParser,
+    CamelCaseJSONRenderer,
+    underscoreize,
+)
+
+PAYLOADS = [
+    {"results": [{"started_at": "2000-01-01", "tag_id": 1, "tags": []}] * 3},
+    {"nested_list": [[{"inner_key": None}], (1, 2)], "a_1_b": True},
+    {"unicode_text": 'é 😀     \x00 \x7f " \\ \n\t'},
+    {"floats": [0.0, -0.0, 0.1, 1e-4, 1e-5, 1e15, 1e16, 1.5e300, 7200.0]},
+    {"big_int": 2**70, "small_int": -(2**63)},
+    {1: "int key", "some_key": {2.5: "float key"}},
+    {
+        "when": datetime(2000, 1, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+        "day": date(2000, 1, 1),
+        "duration": timedelta(hours=1),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "amount": Decimal("1.50"),
+    },
+    [{"list_root": 1}],
+    "plain",
+    {},
+]
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "json"])
+def use_orjson(request, monkeypatch):
+    if request.param and camel_case.orjson is None:
+        pytest.skip("orjson is not installed")
+
+    if not request.param:
+        monkeypatch.setattr(camel_case, "orjson", None)
+
+
+class TestCamelCase:
+    @pytest.mark.parametrize("payload", PAYLOADS)
+    def test_render_matches_library(self, use_orjson, payload):
+        assert CamelCaseJSONRenderer().render(payload) == LibraryJSONRenderer().render(
+            payload
+        )
+
+    def test_render_uses_orjson(self, monkeypatch):
+        if camel_case.orjson is None:
+            pytest.skip("orjson is not installed")
+
+        def fail(*args, **kwargs):
+            raise AssertionError("Rendered with the json module")
+
+        monkeypatch.setattr(JSONRenderer, "render", fail)
+
+        assert CamelCaseJSONRenderer().render(PAYLOADS[0]).startswith(b'{"results"')
+
+    def test_render_indent(self, use_orjson):
+        payload = {"some_key": [1, 2]}
+        context = {"indent": 2}
+
+        assert CamelCaseJSONRenderer().render(
+            payload, renderer_context=context
+        ) == LibraryJSONRenderer().render(payload, renderer_context=context)
+
+    @pytest.mark.parametrize("value", [float("nan"), float("inf")])
+    def test_render_refuses_nan(self, use_orjson, value):
+        with pytest.raises(ValueError):
+            CamelCaseJSONRenderer().render({"value": value})
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            b'{"startedAt": "2000-01-01", "tagIds": [1, 2], "nestedKey": {"aB": 1}}',
+            b'{"bigInt": 1180591620717411303424, "value": NaN}',
+            b'[{"HTTPResponse": 1, "a1B": 2}]',
+        ],
+    )
+    def test_parse_matches_library(self, use_orjson, body):
+        parsed = CamelCaseJSONParser().parse(io.BytesIO(body))
+        expected = LibraryJSONParser().parse(io.BytesIO(body))
+
+        assert repr(parsed) == repr(expected)
+
+    def test_parse_error(self, use_orjson):
+        with pytest.raises(ParseError):
+            CamelCaseJSONParser().parse(io.BytesIO(b'{"a": '))
+
+    def test_query_params(self):
+        query = QueryDict("pageSize=10&tagIds=1&tagIds=2&cursor=")
+
+        assert underscoreize(query) == library_underscoreize(query)
+        assert underscoreize(query).getlist("tag_ids") == ["1", "2"]
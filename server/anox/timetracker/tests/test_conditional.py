@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from timetracker.models import (
+    Note,
+    Tag,
+    TagLink,
+    TimeEntry,
+    Timestamp,
+    tag_object,
+)
+
+
+@pytest.fixture
+def tag(db_user):
+    return Tag.objects.create(name="work", color="FF0000FF", assigned_to=db_user)
+
+
+def get(client, url, etag=None, **headers):
+    if etag is not None:
+        headers["HTTP_IF_NONE_MATCH"] = etag
+
+    return client.get(url, **headers)
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    def test_not_modified(self, client, db_user, tag, django_assert_num_queries):
+        Note.objects.create(title="note", assigned_to=db_user)
+
+        for url in [
+            "/api/notes/",
+            "/api/tags/",
+            f"/api/tags/{tag.id}/",
+            f"/api/tags/{tag.id}/totals/",
+            f"/api/tags/{tag.id}/time-report/",
+            "/api/tags/time-report/",
+            "/api/tags/autocomplete/",
+            "/api/time_entries/",
+            "/api/timestamps/",
+        ]:
+            response = get(client, url)
+            assert response.status_code == 200
+            etag = response["ETag"]
+
+            # Only the change version is read
+            with django_assert_num_queries(1):
+                response = get(client, url, etag)
+
+            assert response.status_code == 304
+            assert response["ETag"] == etag
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            lambda user, tag: Note.objects.create(title="new", assigned_to=user),
+            lambda user, tag: Note.objects.filter(assigned_to=user).delete(),
+            lambda user, tag: Tag.objects.filter(id=tag.id).update(color="00FF00FF"),
+            lambda user, tag: TimeEntry.objects.bulk_create(
+                [TimeEntry(started_at=timezone.now(), assigned_to=user)]
+            ),
+            lambda user, tag: tag_object(
+                Note.objects.filter(assigned_to=user).get(), [tag]
+            ),
+        ],
+    )
+    def test_modified(self, client, db_user, tag, change):
+        Note.objects.create(title="note", assigned_to=db_user)
+        etag = get(client, "/api/notes/")["ETag"]
+
+        change(db_user, tag)
+
+        response = get(client, "/api/notes/", etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_tag_link_change(self, client, db_user, tag):
+        note = Note.objects.create(title="note", assigned_to=db_user)
+        tag_object(note, [tag])
+        url = f"/api/tags/{tag.id}/totals/"
+        etag = get(client, url)["ETag"]
+
+        TagLink.objects.filter(note=note).delete()
+
+        assert get(client, url, etag).status_code == 200
+
+    def test_other_users_changes(self, client, db_user, tag):
+        etag = get(client, "/api/tags/")["ETag"]
+
+        stranger = User.objects.create(username="stranger")
+        Tag.objects.create(name="other", color="FF0000FF", assigned_to=stranger)
+
+        assert get(client, "/api/tags/", etag).status_code == 304
+
+        other_client = APIClient()
+        other_client.force_authenticate(stranger)
+        assert get(other_client, "/api/tags/", etag).status_code == 200
+
+    def test_only_own_objects(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+
+        for model in [Note, TimeEntry, Timestamp]:
+            fields = {"started_at": timezone.now()} if model is TimeEntry else {}
+            other = model.objects.create(assigned_to=stranger, **fields)
+            url = f"/api/{model._meta.db_table}/"
+
+            # A version of the user's data only answers for the user's objects
+            assert get(client, url).data["count"] == 0
+            assert get(client, f"{url}{other.id}/").status_code == 404
+
+    def test_if_modified_since(self, client, db_user, tag):
+        response = get(client, "/api/tags/")
+        last_modified = response["Last-Modified"]
+
+        response = get(client, "/api/tags/", HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == 304
+
+        earlier = http_date((timezone.now() - timedelta(days=1)).timestamp())
+        response = get(client, "/api/tags/", HTTP_IF_MODIFIED_SINCE=earlier)
+        assert response.status_code == 200
+
+    def test_writes_not_affected(self, client, db_user, tag):
+        etag = get(client, "/api/tags/")["ETag"]
+
+        response = client.patch(
+            f"/api/tags/{tag.id}/",
+            {"color": "00FF00FF"},
+            format="json",
+            HTTP_IF_NONE_MATCH=etag,
+        )
+
+        assert response.status_code == 200
+        assert get(client, "/api/tags/", etag).status_code == 200
@@ -0,0 +1,168 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+from django.utils import timezone
+
+from timetracker.filters import TimeEntryFilter
+from timetracker.models import Note, Tag, TagLink, TimeEntry, Timestamp
+from timetracker.overlaps import TIME_ENTRY_CONFLICTS_SQL, TIME_ENTRY_OVERLAPS_SQL
+from timetracker.reports import TAG_TIME_REPORT_SQL, day_bucket_params
+
+
+@pytest.fixture
+def no_seqscan(db):
+    # The test tables are tiny, so the planner would otherwise always pick a
+    # sequential scan.
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+
+def explain(sql: str, params) -> str:
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN {sql}", params)
+        return "\n".join(row[0] for row in cursor.fetchall())
+
+
+@pytest.mark.django_db
+class TestIndexes:
+    @pytest.mark.parametrize(
+        "queryset, index",
+        [
+            (
+                lambda user: TimeEntry.objects.filter(assigned_to=user).order_by(
+                    "-started_at"
+                ),
+                "time_entries_user_started_idx",
+            ),
+            (
+                lambda user: Note.objects.filter(assigned_to=user).order_by(
+                    "-created_at"
+                ),
+                "notes_user_created_idx",
+            ),
+            (
+                lambda user: Timestamp.objects.filter(assigned_to=user).order_by(
+                    "-created_at"
+                ),
+                "timestamps_user_created_idx",
+            ),
+            (
+                lambda user: Tag.objects.filter(assigned_to=user).order_by(
+                    "-created_at"
+                ),
+                "tags_user_created_idx",
+            ),
+        ],
+    )
+    def test_list_queries(self, db_user, no_seqscan, queryset, index):
+        assert index in queryset(db_user)[:20].explain()
+
+    def test_report_query(self, db_user, no_seqscan):
+        tag = Tag.objects.create(name="test", color="FF0000FF", assigned_to=db_user)
+
+        plan = explain(TAG_TIME_REPORT_SQL, day_bucket_params([tag.id]))
+        assert "tag_links_tag_entry_idx" in plan
+
+    def test_note_search(self, db_user, no_seqscan):
+        Note.objects.bulk_create(
+            Note(title=f"note {i}", content="daily notes", assigned_to=db_user)
+            for i in range(500)
+        )
+        Note.objects.create(title="plans", assigned_to=db_user)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE notes")
+
+        queryset = Note.objects.filter(
+            search_vector=SearchQuery("plans", config="english")
+        )
+
+        assert "notes_search_vector_idx" in queryset.explain()
+
+    def test_tag_autocomplete(self, db_user, no_seqscan):
+        queryset = Tag.objects.filter(
+            assigned_to=db_user, canonical_name__startswith="pla"
+        ).order_by("-reference_count")
+
+        assert "tags_user_name_prefix_idx" in queryset[:10].explain()
+
+    def test_sync(self, db_user, no_seqscan):
+        queryset = Note.objects_with_deleted.filter(
+            assigned_to=db_user, change_xid__gte=10, change_xid__lt=20
+        ).order_by("change_xid", "pk")
+
+        assert "notes_user_change_idx" in queryset[:500].explain()
+
+        queryset = TagLink.objects_with_deleted.filter(
+            tag__assigned_to=db_user, change_xid__gte=10, change_xid__lt=20
+        ).order_by("change_xid", "pk")
+
+        assert "tag_links_tag_change_idx" in queryset[:500].explain()
+
+    def test_running_timer(self, db_user, no_seqscan):
+        # time_entries_span_idx covers running entries too, but also the
+        # closed ones
+        now = timezone.now()
+        TimeEntry.objects.bulk_create(
+            TimeEntry(
+                started_at=now - timedelta(hours=i + 1),
+                ended_at=now - timedelta(hours=i),
+                assigned_to=db_user,
+            )
+            for i in range(1000)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE time_entries")
+        queryset = TimeEntry.objects.filter(assigned_to=db_user, ended_at__isnull=True)
+
+        assert "time_entries_running_idx" in queryset.explain()
+
+    def test_time_entry_range(self, db_user, no_seqscan):
+        now = timezone.now()
+        queryset = TimeEntry.objects.filter(
+            assigned_to=db_user,
+            started_at__gte=now - timedelta(days=7),
+            started_at__lte=now,
+        ).order_by("-started_at")
+
+        plan = queryset[:20].explain()
+        assert "time_entries_user_started_idx" in plan
+        assert "Index Cond" in plan and "started_at" in plan
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {"overlaps_after": "2024-01-01T00:00:00Z"},
+            {"overlaps_before": "2024-01-01T00:00:00Z"},
+        ],
+    )
+    def test_time_entry_overlaps(self, db_user, no_seqscan, params):
+        queryset = TimeEntryFilter(
+            params, TimeEntry.objects.filter(assigned_to=db_user)
+        ).qs
+
+        assert "time_entries_span_idx" in queryset.explain()
+
+    def test_overlaps(self, db_user, no_seqscan):
+        plan = explain(
+            TIME_ENTRY_OVERLAPS_SQL,
+            {"user_id": db_user.id, "start": None, "end": None, "limit": 100},
+        )
+
+        assert "time_entries_span_idx" in plan
+
+    def test_conflicts(self, db_user, no_seqscan):
+        now = timezone.now()
+        plan = explain(
+            TIME_ENTRY_CONFLICTS_SQL,
+            {
+                "user_id": db_user.id,
+                "starts": [now],
+                "ends": [None],
+                "exclude_ids": [],
+            },
+        )
+
+        assert "time_entries_span_idx" in plan
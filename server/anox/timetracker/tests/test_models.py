@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 import pytest
 from django.utils import timezone
@@ -14,8 +14,6 @@ from timetracker.models import (
     tag_object,
 )
 
-from .fixtures import user
-
 
 class TestObjectToQueryClassName:
     def test_correct_result(self, user):
@@ -60,7 +58,7 @@ class TagObjectTestCase:
         note_link_count = tag_object(note, [t1, t2])
         assert note_link_count == 2
 
-    def test_apply_tag_multiple_times(self):
+    def test_apply_tag_multiple_times(self, user):
         tag = Tag.objects.create(name="test", color="FF00FFFF", assigned_to=user)
 
         task_1 = Task.objects.create(name="task", assigned_to=user)
@@ -71,7 +69,7 @@ class TagObjectTestCase:
 
         assert TagLink.objects.count() == 2
 
-    def skips_existing_tag_links(self):
+    def skips_existing_tag_links(self, user):
         t1 = Tag.objects.create(name="test", color="FF00FFFF", assigned_to=user)
         t2 = Tag.objects.create(name="test2", color="FF00FFFF", assigned_to=user)
         t3 = Tag.objects.create(name="test3", color="FF00FFFF", assigned_to=user)
@@ -91,40 +89,41 @@ class TagObjectTestCase:
         assert TagLink.objects.count() == 3
 
 
-class TagTestCase:
-    def test_total_time(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+@pytest.mark.django_db
+class TestTag:
+    def test_total_time(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         start_time = timezone.now()
 
         time_entry = TimeEntry.objects.create(
             started_at=start_time,
             ended_at=start_time + timedelta(seconds=10),
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry, [t])
 
         assert t.get_total_time() == timedelta(seconds=10)
 
-    def test_no_total_time(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_no_total_time(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         assert t.get_total_time() == timedelta(0)
 
-    def test_no_total_references(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_no_total_references(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
         assert t.get_total_references() == 0
 
-    def test_total_time_many_entries(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_total_time_many_entries(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         start_time = timezone.now()
 
         time_entry = TimeEntry.objects.create(
             started_at=start_time,
             ended_at=start_time + timedelta(seconds=10),
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry, [t])
@@ -132,24 +131,22 @@ class TagTestCase:
         time_entry_2 = TimeEntry.objects.create(
             started_at=start_time + timedelta(seconds=10),
             ended_at=start_time + timedelta(seconds=20),
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry_2, [t])
 
         assert t.get_total_time() == timedelta(seconds=20)
 
-        assert t.get_total_time(chunk_size=1) == timedelta(seconds=20)
-
-    def test_total_time_soft_deletes(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_total_time_soft_deletes(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         start_time = timezone.now()
 
         time_entry = TimeEntry.objects.create(
             started_at=start_time,
             ended_at=start_time + timedelta(seconds=10),
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry, [t])
@@ -157,7 +154,7 @@ class TagTestCase:
         time_entry_2 = TimeEntry.objects.create(
             started_at=start_time + timedelta(seconds=10),
             ended_at=start_time + timedelta(seconds=20),
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry_2, [t])
@@ -168,22 +165,63 @@ class TagTestCase:
 
         assert t.get_total_time() == timedelta(seconds=10)
 
-    def test_time_report_no_entries(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_total_time_ignores_open_entries_and_deleted_links(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
+
+        start_time = timezone.now()
+
+        closed = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(seconds=10),
+            assigned_to=db_user,
+        )
+        running = TimeEntry.objects.create(started_at=start_time, assigned_to=db_user)
+        unlinked = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(seconds=30),
+            assigned_to=db_user,
+        )
+
+        tag_object(closed, [t])
+        tag_object(running, [t])
+        tag_object(unlinked, [t])
+
+        TagLink.objects.filter(time_entry=unlinked).delete()
+
+        assert t.get_total_time() == timedelta(seconds=10)
+
+    def test_total_time_single_query(self, db_user, django_assert_num_queries):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
+
+        start_time = timezone.now()
+
+        for i in range(5):
+            time_entry = TimeEntry.objects.create(
+                started_at=start_time,
+                ended_at=start_time + timedelta(seconds=i),
+                assigned_to=db_user,
+            )
+            tag_object(time_entry, [t])
+
+        with django_assert_num_queries(1):
+            assert t.get_total_time() == timedelta(seconds=10)
+
+    def test_time_report_no_entries(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         report = t.get_time_report()
 
         assert report == {}
 
-    def test_time_report_single_entry(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_time_report_single_entry(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         start_time = timezone.now()
 
         time_entry = TimeEntry.objects.create(
             started_at=start_time,
             ended_at=start_time + timedelta(seconds=10),
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry, [t])
@@ -192,8 +230,8 @@ class TagTestCase:
 
         assert report == {start_time.date(): timedelta(seconds=10)}
 
-    def test_time_report_single_entry_span_days(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_time_report_single_entry_span_days(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         start_time = datetime(
             year=2000, month=1, day=1, hour=12, tzinfo=timezone.get_current_timezone()
@@ -203,7 +241,7 @@ class TagTestCase:
         time_entry = TimeEntry.objects.create(
             started_at=start_time,
             ended_at=end_time,
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry, [t])
@@ -215,21 +253,21 @@ class TagTestCase:
             end_time.date(): timedelta(hours=1),
         }
 
-    def test_time_report_many_entries_one_day(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_time_report_many_entries_one_day(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         start_time = timezone.now()
 
         time_entry = TimeEntry.objects.create(
             started_at=start_time,
             ended_at=start_time + timedelta(hours=1),
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         time_entry_2 = TimeEntry.objects.create(
             started_at=start_time + timedelta(minutes=10),
             ended_at=start_time + timedelta(minutes=20),
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry, [t])
@@ -239,8 +277,8 @@ class TagTestCase:
 
         assert report == {start_time.date(): timedelta(hours=1, minutes=10)}
 
-    def test_time_report_many_entries_many_days(self, user):
-        t = Tag.objects.create(name="test", assigned_to=user)
+    def test_time_report_many_entries_many_days(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
 
         start_1 = datetime(
             year=2000, month=1, day=1, hour=12, tzinfo=timezone.get_current_timezone()
@@ -253,13 +291,13 @@ class TagTestCase:
         time_entry = TimeEntry.objects.create(
             started_at=start_1,
             ended_at=end_1,
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         time_entry_2 = TimeEntry.objects.create(
             started_at=start_2,
             ended_at=end_2,
-            assigned_to=user,
+            assigned_to=db_user,
         )
 
         tag_object(time_entry, [t])
@@ -272,6 +310,83 @@ class TagTestCase:
             end_2.date(): timedelta(hours=2, minutes=30),
         }
 
+    def test_time_report_span_months(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
+
+        start_time = datetime(
+            year=2000, month=1, day=31, hour=22, tzinfo=timezone.get_current_timezone()
+        )
+        end_time = start_time + timedelta(days=2)
+
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time, ended_at=end_time, assigned_to=db_user
+        )
+
+        tag_object(time_entry, [t])
+
+        assert t.get_time_report() == {
+            date(2000, 1, 31): timedelta(hours=2),
+            date(2000, 2, 1): timedelta(hours=24),
+            date(2000, 2, 2): timedelta(hours=22),
+        }
+
+    def test_time_report_ends_at_midnight(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
+
+        start_time = datetime(
+            year=2000, month=1, day=1, hour=12, tzinfo=timezone.get_current_timezone()
+        )
+
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=12),
+            assigned_to=db_user,
+        )
+
+        tag_object(time_entry, [t])
+
+        assert t.get_time_report() == {date(2000, 1, 1): timedelta(hours=12)}
+
+    def test_time_report_skips_running_and_deleted(self, db_user):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
+
+        start_time = datetime(
+            year=2000, month=1, day=1, hour=12, tzinfo=timezone.get_current_timezone()
+        )
+
+        running = TimeEntry.objects.create(started_at=start_time, assigned_to=db_user)
+        deleted = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+
+        tag_object(running, [t])
+        tag_object(deleted, [t])
+        deleted.delete()
+
+        assert t.get_time_report() == {}
+
+    def test_time_report_single_query(self, db_user, django_assert_num_queries):
+        t = Tag.objects.create(name="test", assigned_to=db_user)
+
+        start_time = datetime(
+            year=2000, month=1, day=1, hour=12, tzinfo=timezone.get_current_timezone()
+        )
+
+        for i in range(5):
+            time_entry = TimeEntry.objects.create(
+                started_at=start_time + timedelta(days=i),
+                ended_at=start_time + timedelta(days=i, hours=1),
+                assigned_to=db_user,
+            )
+            tag_object(time_entry, [t])
+
+        with django_assert_num_queries(1):
+            report = t.get_time_report()
+
+        assert len(report) == 5
+
 
 class TaskTestCase:
     def test_delete(self, user):
@@ -0,0 +1,192 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import pytest
+from django.contrib.auth.models import User
+
+from timetracker.models import TimeEntry
+from timetracker.overlaps import TimeEntryOverlap, check_overlaps, find_overlaps
+
+START = datetime(2024, 1, 1, 9, tzinfo=dt_timezone.utc)
+
+
+def at(hours: float) -> datetime:
+    return START + timedelta(hours=hours)
+
+
+@pytest.fixture
+def reject_overlaps(settings):
+    settings.REJECT_OVERLAPPING_TIME_ENTRIES = True
+
+
+def create_entries(user, intervals):
+    return TimeEntry.objects.bulk_create(
+        TimeEntry(
+            started_at=at(started_at),
+            ended_at=None if ended_at is None else at(ended_at),
+            description=f"{started_at}-{ended_at}",
+            assigned_to=user,
+        )
+        for started_at, ended_at in intervals
+    )
+
+
+@pytest.mark.django_db
+class TestFindOverlaps:
+    def test_pairs(self, db_user):
+        # Touching, invalid and running entries don't overlap
+        a, b, c, _, _, _ = create_entries(
+            db_user, [(0, 3), (1, 2), (2.5, 4), (4, 5), (10, 9), (0, None)]
+        )
+        deleted = create_entries(db_user, [(0, 5)])[0]
+        deleted.delete()
+
+        stranger = User.objects.create(username="stranger")
+        create_entries(stranger, [(0, 5)])
+
+        assert find_overlaps(db_user.id) == [
+            (a.id, b.id, at(1), at(2)),
+            (a.id, c.id, at(2.5), at(3)),
+        ]
+
+    def test_range(self, db_user):
+        a, b, c = create_entries(db_user, [(0, 3), (1, 2), (2.5, 4)])
+
+        assert find_overlaps(db_user.id, start=at(2), end=at(2.5)) == []
+        assert find_overlaps(db_user.id, start=at(2.75)) == [
+            (a.id, c.id, at(2.5), at(3))
+        ]
+        assert find_overlaps(db_user.id, end=at(1.5)) == [(a.id, b.id, at(1), at(2))]
+        assert len(find_overlaps(db_user.id, limit=1)) == 1
+
+    def test_same_start(self, db_user):
+        create_entries(db_user, [(0, 1), (0, 1)])
+
+        assert len(find_overlaps(db_user.id)) == 1
+
+    def test_endpoint(self, client, db_user):
+        a, b = create_entries(db_user, [(0, 3), (1, 2)])
+
+        response = client.get("/api/time_entries/overlaps/")
+        assert response.status_code == 200
+        assert response.data == [
+            {
+                "earlier_id": a.id,
+                "later_id": b.id,
+                "started_at": at(1),
+                "ended_at": at(2),
+            }
+        ]
+
+        response = client.get(
+            "/api/time_entries/overlaps/", {"start": at(2).isoformat()}
+        )
+        assert response.data == []
+
+        response = client.get("/api/time_entries/overlaps/", {"limit": 0})
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("reject_overlaps")
+class TestRejectOverlaps:
+    def test_check(self, db_user):
+        a, _ = create_entries(db_user, [(0, 2), (3, 4)])
+
+        check_overlaps(db_user.id, [(at(2), at(3)), (at(5), None), (at(1), at(1))])
+        check_overlaps(db_user.id, [(at(1), at(2.5))], exclude_ids=[a.id])
+
+        with pytest.raises(TimeEntryOverlap):
+            check_overlaps(db_user.id, [(at(1), at(2.5))])
+
+        with pytest.raises(TimeEntryOverlap):
+            check_overlaps(db_user.id, [(at(5), at(7)), (at(6), at(8))])
+
+    def test_check_running(self, db_user):
+        create_entries(db_user, [(0, 2)])
+
+        # Unbounded on the right
+        check_overlaps(db_user.id, [(at(2), None)])
+        with pytest.raises(TimeEntryOverlap):
+            check_overlaps(db_user.id, [(at(-1), None)])
+        with pytest.raises(TimeEntryOverlap):
+            check_overlaps(db_user.id, [(at(3), None), (at(5), at(6))])
+
+        running = create_entries(db_user, [(3, None)])[0]
+        check_overlaps(db_user.id, [(at(2), at(3))])
+        check_overlaps(db_user.id, [(at(4), at(5))], exclude_ids=[running.id])
+        with pytest.raises(TimeEntryOverlap):
+            check_overlaps(db_user.id, [(at(4), at(5))])
+
+    def test_allowed_by_default(self, db_user, settings):
+        settings.REJECT_OVERLAPPING_TIME_ENTRIES = False
+        create_entries(db_user, [(0, 2)])
+
+        check_overlaps(db_user.id, [(at(1), at(2.5))])
+
+    def test_batch(self, client, db_user):
+        create_entries(db_user, [(0, 2)])
+
+        response = client.post(
+            "/api/time_entries/batch/",
+            [
+                {
+                    "started_at": at(1).isoformat(),
+                    "ended_at": at(3).isoformat(),
+                    "description": "overlapping",
+                }
+            ],
+            format="json",
+        )
+
+        assert response.status_code == 400
+        assert "overlaps" in response.data["error"]["message"]
+        assert TimeEntry.objects.count() == 1
+
+    def test_update(self, client, db_user):
+        _, b = create_entries(db_user, [(0, 2), (3, 4)])
+        url = f"/api/time_entries/{b.id}/"
+
+        response = client.patch(url, {"started_at": at(1).isoformat()}, format="json")
+        assert response.status_code == 400
+        assert TimeEntry.objects.get(id=b.id).started_at == at(3)
+
+        response = client.patch(url, {"started_at": at(2).isoformat()}, format="json")
+        assert response.status_code == 200
+
+    def test_batch_across_timer(self, client, db_user):
+        create_entries(db_user, [(0, None)])
+
+        response = client.post(
+            "/api/time_entries/batch/",
+            [
+                {
+                    "started_at": at(1).isoformat(),
+                    "ended_at": at(2).isoformat(),
+                    "description": "during the timer",
+                }
+            ],
+            format="json",
+        )
+
+        assert response.status_code == 400
+        assert "overlaps" in response.data["error"]["message"]
+        assert TimeEntry.objects.count() == 1
+
+    def test_timer(self, client, db_user):
+        create_entries(db_user, [(0, 2)])
+
+        response = client.post(
+            "/api/time_entries/start/", {"started_at": at(1).isoformat()}, format="json"
+        )
+        assert response.status_code == 400
+        assert not TimeEntry.objects.filter(ended_at__isnull=True).exists()
+
+        response = client.post(
+            "/api/time_entries/start/", {"started_at": at(3).isoformat()}, format="json"
+        )
+        assert response.status_code == 201
+
+        response = client.post("/api/time_entries/stop/")
+        assert response.status_code == 200
+        assert response.data["ended_at"] is not None
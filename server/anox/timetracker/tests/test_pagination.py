@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+from django.utils import timezone
+from timetracker.models import TimeEntry
+
+
+@pytest.fixture
+def time_entries(db_user):
+    start = datetime(2000, 1, 1, tzinfo=timezone.get_current_timezone())
+
+    # Pairs of entries starting at the same time, to exercise the tiebreaker
+    return TimeEntry.objects.bulk_create(
+        TimeEntry(started_at=start + timedelta(hours=i // 2), assigned_to=db_user)
+        for i in range(25)
+    )
+
+
+def ids(response):
+    return [item["id"] for item in response.data["results"]]
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    def test_pages(self, client, time_entries, django_assert_num_queries):
+        expected = [
+            str(time_entry.id)
+            for time_entry in sorted(
+                time_entries,
+                key=lambda time_entry: (time_entry.started_at, time_entry.id),
+                reverse=True,
+            )
+        ]
+
+        # The change version, the page and its tag links, without a count
+        with django_assert_num_queries(3):
+            response = client.get("/api/time_entries/", {"cursor": ""})
+
+        assert "count" not in response.data
+        assert response.data["previous"] is None
+
+        seen = ids(response)
+        pages = [response]
+        while response.data["next"] is not None:
+            response = client.get(response.data["next"])
+            seen.extend(ids(response))
+            pages.append(response)
+
+        assert seen == expected
+        assert len(pages) == 3
+
+        # And all the way back
+        response = pages[-1]
+        for page in reversed(pages[:-1]):
+            response = client.get(response.data["previous"])
+            assert ids(response) == ids(page)
+
+        assert response.data["previous"] is None
+
+    def test_page_size(self, client, time_entries):
+        response = client.get("/api/time_entries/", {"cursor": "", "page_size": 20})
+        assert len(response.data["results"]) == 20
+
+    def test_invalid_cursor(self, client, time_entries):
+        response = client.get("/api/time_entries/", {"cursor": "not-a-cursor"})
+        assert response.status_code == 404
+
+    def test_page_numbers(self, client, time_entries):
+        response = client.get("/api/time_entries/", {"page": 3})
+
+        assert response.status_code == 200
+        assert response.data["count"] == 25
+        assert len(response.data["results"]) == 5
@@ -0,0 +1,512 @@
+import os
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIClient
+from timetracker import report_cache
+from timetracker.models import (
+    Note,
+    Tag,
+    TagLink,
+    TagTimeRollup,
+    TimeEntry,
+    tag_object,
+)
+from timetracker.rollups import (
+    check_rollups,
+    get_time_report,
+    rebuild_rollups,
+    recount_references,
+    refresh_rollups,
+)
+
+
+def rollups_for(tag: Tag):
+    return {
+        rollup.day: (rollup.seconds, rollup.entry_count)
+        for rollup in TagTimeRollup.objects.filter(tag=tag)
+    }
+
+
+@pytest.fixture
+def start_time():
+    return datetime(
+        year=2000, month=1, day=1, hour=22, tzinfo=timezone.get_current_timezone()
+    )
+
+
+@pytest.fixture
+def tag(db_user):
+    return Tag.objects.create(name="test", color="FF0000FF", assigned_to=db_user)
+
+
+@pytest.mark.django_db
+class TestRollups:
+    def test_tag_object(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=4),
+            assigned_to=db_user,
+        )
+
+        assert rollups_for(tag) == {}
+
+        tag_object(time_entry, [tag])
+
+        assert rollups_for(tag) == {
+            date(2000, 1, 1): (7200, 1),
+            date(2000, 1, 2): (7200, 1),
+        }
+        assert check_rollups() == []
+
+    def test_edit_time_entry(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        time_entry.started_at = start_time + timedelta(days=3)
+        time_entry.ended_at = start_time + timedelta(days=3, minutes=30)
+        time_entry.save()
+
+        assert rollups_for(tag) == {date(2000, 1, 4): (1800, 1)}
+        assert check_rollups() == []
+
+    def test_stop_running_time_entry(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time, assigned_to=db_user
+        )
+        tag_object(time_entry, [tag])
+
+        assert rollups_for(tag) == {}
+
+        time_entry.ended_at = start_time + timedelta(minutes=10)
+        time_entry.save()
+
+        assert rollups_for(tag) == {date(2000, 1, 1): (600, 1)}
+
+    def test_soft_delete_and_restore(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        time_entry.delete()
+        assert rollups_for(tag) == {}
+
+        time_entry.restore()
+        assert rollups_for(tag) == {date(2000, 1, 1): (3600, 1)}
+
+    def test_hard_delete(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        time_entry.delete(hard=True)
+
+        assert rollups_for(tag) == {}
+
+    def test_queryset_delete_and_restore(self, db_user, tag, start_time):
+        for i in range(3):
+            time_entry = TimeEntry.objects.create(
+                started_at=start_time + timedelta(days=i),
+                ended_at=start_time + timedelta(days=i, minutes=10),
+                assigned_to=db_user,
+            )
+            tag_object(time_entry, [tag])
+
+        TimeEntry.objects.filter(started_at__gt=start_time).delete()
+        assert rollups_for(tag) == {date(2000, 1, 1): (600, 1)}
+
+        TimeEntry.objects_deleted.restore()
+        assert len(rollups_for(tag)) == 3
+
+        TimeEntry.objects.delete(hard=True)
+        assert rollups_for(tag) == {}
+
+    def test_tag_link_changes(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+        other = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(minutes=30),
+            assigned_to=db_user,
+        )
+
+        link = TagLink(tag=tag, time_entry=time_entry)
+        link.save()
+        tag_object(other, [tag])
+
+        assert rollups_for(tag) == {date(2000, 1, 1): (5400, 2)}
+
+        TagLink.objects.filter(time_entry=other).delete()
+        assert rollups_for(tag) == {date(2000, 1, 1): (3600, 1)}
+
+        TagLink.objects_deleted.restore()
+        assert rollups_for(tag) == {date(2000, 1, 1): (5400, 2)}
+
+        link.delete()
+        assert rollups_for(tag) == {date(2000, 1, 1): (1800, 1)}
+        assert check_rollups() == []
+
+    def test_check_and_rebuild(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        TagTimeRollup.objects.update(seconds=1)
+        TagTimeRollup.objects.create(
+            user=db_user, tag=tag, day=date(2010, 1, 1), seconds=5, entry_count=1
+        )
+
+        assert check_rollups() == [
+            (tag.id, date(2000, 1, 1), 3600, 1, 1, 1),
+            (tag.id, date(2010, 1, 1), None, 5, None, 1),
+        ]
+
+        with pytest.raises(CommandError):
+            call_command("checkrollups", stdout=None)
+
+        rebuild_rollups()
+
+        assert check_rollups() == []
+        assert get_time_report(tag.id) == {date(2000, 1, 1): 3600}
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConcurrentRollups:
+    def test_refresh_same_tag(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        refreshed = threading.Event()
+        errors = []
+
+        def refresh_in_thread():
+            try:
+                with transaction.atomic():
+                    refresh_rollups([tag.id])
+                    refreshed.set()
+                    time.sleep(0.2)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=refresh_in_thread)
+        thread.start()
+        assert refreshed.wait(5)
+
+        # Refreshes the same rollup while the thread's refresh is uncommitted
+        refresh_rollups([tag.id])
+        thread.join()
+
+        assert errors == []
+        assert rollups_for(tag) == {date(2000, 1, 1): (3600, 1)}
+
+
+def reference_count(tag: Tag) -> int:
+    return Tag.objects.get(pk=tag.id).reference_count
+
+
+@pytest.mark.django_db
+class TestReferenceCounts:
+    def test_tag_and_untag(self, db_user, tag):
+        note = Note.objects.create(title="note", assigned_to=db_user)
+        other = Note.objects.create(title="other", assigned_to=db_user)
+
+        tag_object(note, [tag])
+        tag_object(note, [tag])
+        tag_object(other, [tag])
+        assert reference_count(tag) == 2
+
+        TagLink.objects.filter(note=note).delete()
+        assert reference_count(tag) == 1
+
+        TagLink.objects_deleted.restore()
+        assert reference_count(tag) == 2
+
+        TagLink.objects.get(note=other).delete()
+        assert reference_count(tag) == 1
+
+        link = TagLink(tag=tag, note=other)
+        link.save()
+        assert reference_count(tag) == 2
+
+        link.deleted_at = timezone.now()
+        link.save()
+        assert reference_count(tag) == 1
+
+    def test_hard_delete_tagged_objects(self, db_user, tag, start_time):
+        note = Note.objects.create(title="note", assigned_to=db_user)
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time, assigned_to=db_user
+        )
+        tag_object(note, [tag])
+        tag_object(time_entry, [tag])
+
+        # Soft deleting the object keeps its links
+        note.delete()
+        assert reference_count(tag) == 2
+
+        note.delete(hard=True)
+        assert reference_count(tag) == 1
+
+        TimeEntry.objects.delete(hard=True)
+        assert reference_count(tag) == 0
+
+    def test_tag_save_keeps_count(self, db_user, tag):
+        tag_object(Note.objects.create(title="note", assigned_to=db_user), [tag])
+
+        tag.name = "renamed"
+        tag.save()
+
+        assert reference_count(tag) == 1
+
+    def test_recount(self, db_user, tag):
+        tag_object(Note.objects.create(title="note", assigned_to=db_user), [tag])
+        Tag.objects.update(reference_count=10)
+
+        assert recount_references() == 1
+        assert reference_count(tag) == 1
+        assert recount_references() == 0
+
+    def test_order_tags_by_references(self, db_user, tag):
+        other_tag = Tag.objects.create(
+            name="other", color="FF0000FF", assigned_to=db_user
+        )
+        tag_object(Note.objects.create(title="note", assigned_to=db_user), [other_tag])
+
+        client = APIClient()
+        client.force_authenticate(db_user)
+
+        response = client.get("/api/tags/", {"ordering": "-reference_count"})
+        assert response.status_code == 200
+        assert [result["name"] for result in response.data["results"]] == [
+            "other",
+            "test",
+        ]
+
+
+@pytest.mark.django_db
+class TestTagViews:
+    def test_totals_and_report(self, db_user, tag, start_time):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=4),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        client = APIClient()
+        client.force_authenticate(db_user)
+
+        response = client.get(f"/api/tags/{tag.id}/totals/")
+        assert response.status_code == 200
+        assert response.data == {"references": 1, "totalTime": 14400}
+
+        response = client.get(f"/api/tags/{tag.id}/time-report/")
+        assert response.status_code == 200
+        assert response.data == {
+            "report": [
+                {"date": "2000-01-01", "seconds": 7200},
+                {"date": "2000-01-02", "seconds": 7200},
+            ],
+            "total": 14400,
+        }
+
+    def test_multi_tag_report(self, db_user, tag, start_time):
+        other_tag = Tag.objects.create(
+            name="other", color="FF0000FF", assigned_to=db_user
+        )
+
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=4),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag, other_tag])
+
+        client = APIClient()
+        client.force_authenticate(db_user)
+
+        response = client.get(
+            "/api/tags/time-report/",
+            {"tags": f"{tag.id},{other_tag.id}", "start": "2000-01-02"},
+        )
+        assert response.status_code == 200
+
+        reports = {report["tag_id"]: report for report in response.data["reports"]}
+        assert reports[str(tag.id)] == {
+            "tag_id": str(tag.id),
+            "report": [{"date": "2000-01-02", "seconds": 7200}],
+            "total": 7200,
+        }
+        assert reports[str(other_tag.id)]["total"] == 7200
+
+        response = client.get("/api/tags/time-report/")
+        assert response.status_code == 200
+        assert len(response.data["reports"]) == 2
+
+    def test_multi_tag_report_ownership(self, db_user, tag):
+        stranger = User.objects.create(username="stranger")
+        stranger_tag = Tag.objects.create(
+            name="stranger", color="FF0000FF", assigned_to=stranger
+        )
+
+        client = APIClient()
+        client.force_authenticate(db_user)
+
+        response = client.get(
+            "/api/tags/time-report/", {"tags": [tag.id, stranger_tag.id]}
+        )
+        assert response.status_code == 403
+
+        response = client.get("/api/tags/time-report/", {"tags": [uuid.uuid4()]})
+        assert response.status_code == 404
+
+        response = client.get("/api/tags/time-report/", {"tags": "not-a-tag"})
+        assert response.status_code == 400
+
+        response = client.get(
+            "/api/tags/time-report/", {"start": "2000-01-02", "end": "2000-01-01"}
+        )
+        assert response.status_code == 400
+
+    def test_report_granularity(self, db_user, tag, start_time):
+        # Saturday 1/1/2000 22:00 to Tuesday 1/4/2000 02:00
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(days=2, hours=4),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        client = APIClient()
+        client.force_authenticate(db_user)
+        url = f"/api/tags/{tag.id}/time-report/"
+
+        response = client.get(url, {"granularity": "week"})
+        assert response.data["report"] == [
+            {"date": "1999-12-27", "seconds": 26 * 3600},
+            {"date": "2000-01-03", "seconds": 26 * 3600},
+        ]
+
+        response = client.get(url, {"granularity": "month", "end": "2000-01-02"})
+        assert response.data == {
+            "report": [{"date": "2000-01-01", "seconds": 26 * 3600}],
+            "total": 26 * 3600,
+        }
+
+        response = client.get(url, {"granularity": "decade"})
+        assert response.status_code == 400
+
+
+@pytest.mark.django_db
+class TestReportCache:
+    def test_cached_until_changed(
+        self, db_user, tag, start_time, django_assert_num_queries
+    ):
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        report_cache.reset_stats()
+
+        client = APIClient()
+        client.force_authenticate(db_user)
+        url = f"/api/tags/{tag.id}/totals/"
+
+        assert client.get(url).data["totalTime"] == 3600
+
+        # Only the change version and tag lookups are left once cached
+        with django_assert_num_queries(2):
+            assert client.get(url).data["totalTime"] == 3600
+
+        time_entry.ended_at = start_time + timedelta(hours=2)
+        time_entry.save()
+
+        assert client.get(url).data["totalTime"] == 7200
+
+        tag_object(
+            Note.objects.create(title="note", assigned_to=db_user),
+            [tag],
+        )
+
+        assert client.get(url).data["references"] == 2
+
+        assert report_cache.get_stats() == {
+            "pid": os.getpid(),
+            "hits": 1,
+            "misses": 3,
+            "hit_rate": 0.25,
+        }
+
+    def test_multi_tag_report_cached_per_tag(self, db_user, tag, start_time):
+        Tag.objects.create(name="other", color="FF0000FF", assigned_to=db_user)
+
+        client = APIClient()
+        client.force_authenticate(db_user)
+
+        report_cache.reset_stats()
+
+        client.get(f"/api/tags/{tag.id}/time-report/")
+        response = client.get("/api/tags/time-report/")
+
+        assert len(response.data["reports"]) == 2
+        assert report_cache.get_stats()["hits"] == 1
+        assert report_cache.get_stats()["misses"] == 2
+
+    def test_tag_save_keeps_version(self, db_user, tag, start_time):
+        stale = Tag.objects.get(pk=tag.id)
+
+        time_entry = TimeEntry.objects.create(
+            started_at=start_time,
+            ended_at=start_time + timedelta(hours=1),
+            assigned_to=db_user,
+        )
+        tag_object(time_entry, [tag])
+
+        stale.color = "00FF00FF"
+        stale.save()
+
+        assert Tag.objects.get(pk=tag.id).report_version == 1
+
+    def test_stats_admin_only(self, db_user):
+        client = APIClient()
+        client.force_authenticate(db_user)
+
+        assert client.get("/api/report-cache/stats/").status_code == 403
+
+        db_user.is_staff = True
+        db_user.save()
+
+        assert client.get("/api/report-cache/stats/").status_code == 200
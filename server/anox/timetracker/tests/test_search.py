@@ -0,0 +1,69 @@
+import pytest
+from django.contrib.auth.models import User
+from timetracker.models import Note
+
+
+def search(client, terms, **params):
+    response = client.get("/api/notes/", {"search": terms, **params})
+    assert response.status_code == 200
+    return response.data["results"]
+
+
+@pytest.mark.django_db
+class TestNoteSearch:
+    def test_ranked_and_highlighted(self, client, db_user):
+        Note.objects.create(
+            title="Groceries", content="Buy milk and eggs", assigned_to=db_user
+        )
+        Note.objects.create(
+            title="Interviews",
+            content="Interviewed two candidates today",
+            assigned_to=db_user,
+        )
+        Note.objects.create(
+            title="Standup", content="Talked about interviewing", assigned_to=db_user
+        )
+
+        results = search(client, "interview")
+
+        # Stemmed, with title matches first
+        assert [result["title"] for result in results] == ["Interviews", "Standup"]
+        assert results[0]["rank"] > results[1]["rank"]
+        assert results[1]["headline"] == "Talked about <mark>interviewing</mark>"
+
+        assert search(client, '"milk and eggs" -bread')[0]["title"] == "Groceries"
+        assert search(client, "milk -eggs") == []
+
+    def test_follows_edits(self, client, db_user):
+        note = Note.objects.create(title="Draft", content="", assigned_to=db_user)
+        assert search(client, "final") == []
+
+        note.title = "Final version"
+        note.save()
+
+        assert len(search(client, "final")) == 1
+
+    def test_only_own_live_notes(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+        Note.objects.create(title="Secret plans", assigned_to=stranger)
+        Note.objects.create(title="Old plans", assigned_to=db_user).delete()
+
+        assert search(client, "plans") == []
+
+    def test_ordering(self, client, db_user):
+        for title in ["b plan", "plan plan plan", "a plan"]:
+            Note.objects.create(title=title, assigned_to=db_user)
+
+        results = search(client, "plan", ordering="title")
+        assert [result["title"] for result in results] == [
+            "a plan",
+            "b plan",
+            "plan plan plan",
+        ]
+
+    def test_without_search(self, client, db_user):
+        Note.objects.create(title="Note", assigned_to=db_user)
+
+        results = client.get("/api/notes/", {"search": " "}).data["results"]
+        assert len(results) == 1
+        assert "headline" not in results[0]
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import pytest
+from django.utils import timezone
+from timetracker.models import Note, Tag, TimeEntry, Timestamp, tag_object
+from timetracker.serializers import (
+    NoteSerializer,
+    TimeEntrySerializer,
+    TimestampSerializer,
+)
+
+
+@pytest.fixture
+def tags(db_user):
+    return [
+        Tag.objects.create(name=f"tag {i}", color="FF0000FF", assigned_to=db_user)
+        for i in range(3)
+    ]
+
+
+@pytest.mark.django_db
+class TestTaggedValuesList:
+    @pytest.mark.parametrize(
+        "url, model, serializer_class, create",
+        [
+            (
+                "/api/time_entries/",
+                TimeEntry,
+                TimeEntrySerializer,
+                lambda user, i: TimeEntry.objects.create(
+                    started_at=datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+                    + timedelta(hours=i),
+                    ended_at=None if i == 0 else timezone.now(),
+                    assigned_to=user,
+                ),
+            ),
+            (
+                "/api/timestamps/",
+                Timestamp,
+                TimestampSerializer,
+                lambda user, i: Timestamp.objects.create(
+                    description=f"timestamp {i}", assigned_to=user
+                ),
+            ),
+            (
+                "/api/notes/",
+                Note,
+                NoteSerializer,
+                lambda user, i: Note.objects.create(
+                    title=f"note {i}", assigned_to=user
+                ),
+            ),
+        ],
+    )
+    def test_matches_serializer(
+        self, client, db_user, tags, url, model, serializer_class, create
+    ):
+        for i in range(5):
+            tag_object(create(db_user, i), tags[: i % 4])
+
+        # A soft deleted tag is still shown, as it is by the serializer
+        tags[0].delete()
+
+        response = client.get(url)
+        assert response.status_code == 200
+
+        ids = [item["id"] for item in response.data["results"]]
+        instances = model.objects.in_bulk(ids)
+        expected = serializer_class(
+            [instances[model._meta.pk.to_python(id)] for id in ids], many=True
+        ).data
+
+        assert response.data["results"] == expected
+        assert any(item["tags"] for item in response.data["results"])
+
+    def test_tags_read_once(self, client, db_user, tags, django_assert_num_queries):
+        for i in range(20):
+            tag_object(Note.objects.create(title=f"{i}", assigned_to=db_user), tags)
+
+        # The change version, the count, the page, its tag links and their tags
+        with django_assert_num_queries(5):
+            response = client.get("/api/notes/")
+
+        payloads = [item["tags"][0] for item in response.data["results"]]
+        assert all(payload is payloads[0] for payload in payloads)
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import pytest
+
+from timetracker.models import Note, Tag, TimeEntry, tag_object
+
+
+@pytest.fixture
+def tags(db_user):
+    return [
+        Tag.objects.create(name=f"tag {i}", color="FF0000FF", assigned_to=db_user)
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def notes(db_user, tags):
+    notes = [
+        Note.objects.create(title=f"note {i}", content="long", assigned_to=db_user)
+        for i in range(3)
+    ]
+    for note in notes:
+        tag_object(note, tags[:2])
+
+    return notes
+
+
+def get_sql(captured) -> str:
+    return "\n".join(query["sql"] for query in captured.captured_queries)
+
+
+@pytest.mark.django_db
+class TestSparseFields:
+    def test_list_fields(self, client, notes, django_assert_num_queries):
+        # The change version, the count and the page, without any tag
+        with django_assert_num_queries(3) as captured:
+            response = client.get("/api/notes/", {"fields": "id,title"})
+
+        assert response.status_code == 200
+        assert [set(item) for item in response.data["results"]] == [{"id", "title"}] * 3
+        assert '"notes"."content"' not in get_sql(captured)
+
+    def test_list_tag_ids(self, client, notes, tags, django_assert_num_queries):
+        # The tag links are read, but not the tags
+        with django_assert_num_queries(4):
+            response = client.get("/api/notes/", {"fields": "title,tags", "expand": ""})
+
+        assert response.data["results"][0] == {
+            "title": "note 2",
+            "tags": [str(tags[0].id), str(tags[1].id)],
+        }
+
+        response = client.get("/api/notes/", {"fields": "tags", "expand": "tags"})
+        assert response.data["results"][0]["tags"][0]["name"] == "tag 0"
+
+    def test_camel_case_names(self, client, notes):
+        response = client.get("/api/notes/", {"fields": "createdAt", "expand": ""})
+
+        assert set(response.data["results"][0]) == {"created_at"}
+
+    def test_unknown_field(self, client, notes):
+        response = client.get("/api/notes/", {"fields": "title,secret"})
+
+        assert response.status_code == 400
+        assert response.data == {"fields": ["Unknown field 'secret'"]}
+
+    def test_detail(self, client, notes, tags, django_assert_num_queries):
+        url = f"/api/notes/{notes[0].id}/"
+
+        # The change version, the note and its tag links
+        with django_assert_num_queries(3) as captured:
+            response = client.get(url, {"fields": "title,tags", "expand": ""})
+
+        assert response.data == {
+            "title": "note 0",
+            "tags": [str(tags[0].id), str(tags[1].id)],
+        }
+        assert '"notes"."content"' not in get_sql(captured)
+
+        assert client.get(url).data["content"] == "long"
+
+    def test_keyset_pages(self, client, db_user):
+        start = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+        TimeEntry.objects.bulk_create(
+            TimeEntry(started_at=start + timedelta(hours=i), assigned_to=db_user)
+            for i in range(15)
+        )
+
+        response = client.get(
+            "/api/time_entries/", {"cursor": "", "fields": "description"}
+        )
+        response = client.get(response.data["next"])
+
+        assert len(response.data["results"]) == 5
+        assert set(response.data["results"][0]) == {"description"}
+
+    def test_writes_render_every_field(self, client, notes):
+        response = client.patch(
+            f"/api/notes/{notes[0].id}/?fields=title",
+            {"content": "short"},
+            format="json",
+        )
+
+        assert response.status_code == 200
+        assert response.data["content"] == "short"
+
+    def test_tags(self, client, tags, django_assert_num_queries):
+        # The change version, the count and the page
+        with django_assert_num_queries(3) as captured:
+            response = client.get("/api/tags/", {"fields": "name"})
+
+        assert response.data["results"] == [
+            {"name": "tag 2"},
+            {"name": "tag 1"},
+            {"name": "tag 0"},
+        ]
+        assert '"tags"."color"' not in get_sql(captured)
+
+        with django_assert_num_queries(2) as captured:
+            response = client.get(f"/api/tags/{tags[0].id}/", {"fields": "name"})
+
+        assert response.data == {"name": "tag 0"}
+        assert '"tags"."color"' not in get_sql(captured)
@@ -0,0 +1,165 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from timetracker import sync
+from timetracker.models import Note, Tag, TagLink, TimeEntry, tag_object
+
+
+def get_sync(client, cursor=None, status=200):
+    params = {} if cursor is None else {"cursor": cursor}
+    response = client.get("/api/sync/", params)
+    assert response.status_code == status
+    return response.data
+
+
+def get_ids(changes, name):
+    return [str(item["id"]) for item in changes[name]["updated"]]
+
+
+# Rows written by the test's own transaction would never be synced, as it is
+# still running, so every write commits.
+@pytest.mark.django_db(transaction=True)
+class TestSync:
+    def test_full_then_incremental(self, client, db_user):
+        tag = Tag.objects.create(name="work", color="FF0000FF", assigned_to=db_user)
+        note = Note.objects.create(title="note", content="", assigned_to=db_user)
+        tag_object(note, [tag])
+        link = TagLink.objects.get(note=note)
+
+        changes = get_sync(client)
+
+        assert not changes["has_more"]
+        assert get_ids(changes, "tags") == [str(tag.id)]
+        assert get_ids(changes, "notes") == [str(note.id)]
+        assert changes["notes"]["updated"][0]["title"] == "note"
+        assert changes["tag_links"]["updated"][0]["id"] == link.id
+        assert changes["tag_links"]["updated"][0]["note_id"] == str(note.id)
+
+        changes = get_sync(client, changes["cursor"])
+        assert all(not changes[name]["updated"] for name in sync.SYNCED)
+
+        note.title = "renamed"
+        note.save()
+        entry = TimeEntry.objects.create(started_at=timezone.now(), assigned_to=db_user)
+
+        changes = get_sync(client, changes["cursor"])
+        assert changes["notes"]["updated"][0]["title"] == "renamed"
+        assert get_ids(changes, "time_entries") == [str(entry.id)]
+        assert not changes["tags"]["updated"]
+
+    def test_soft_deletes(self, client, db_user):
+        tag = Tag.objects.create(name="work", color="FF0000FF", assigned_to=db_user)
+        note = Note.objects.create(title="note", content="", assigned_to=db_user)
+        tag_object(note, [tag])
+        link = TagLink.objects.get(note=note)
+        cursor = get_sync(client)["cursor"]
+
+        TagLink.objects.filter(id=link.id).delete()
+        note.delete()
+
+        changes = get_sync(client, cursor)
+        assert changes["notes"] == {"updated": [], "deleted": [note.id]}
+        assert changes["tag_links"]["deleted"] == [link.id]
+
+        Note.objects_deleted.filter(id=note.id).restore()
+        changes = get_sync(client, changes["cursor"])
+        assert get_ids(changes, "notes") == [str(note.id)]
+
+    def test_pages(self, client, db_user, monkeypatch):
+        monkeypatch.setattr(sync, "SYNC_LIMIT", 2)
+        # Rows saved by one transaction share the same change_xid
+        with transaction.atomic():
+            tags = [
+                Tag.objects.create(
+                    name=f"tag {i}", color="FF0000FF", assigned_to=db_user
+                )
+                for i in range(5)
+            ]
+
+        received = []
+        cursor = None
+        while True:
+            changes = get_sync(client, cursor)
+            received += get_ids(changes, "tags")
+            cursor = changes["cursor"]
+            if not changes["has_more"]:
+                break
+
+        assert sorted(received) == sorted(str(tag.id) for tag in tags)
+
+    def test_other_users(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+        tag = Tag.objects.create(name="work", color="FF0000FF", assigned_to=stranger)
+        note = Note.objects.create(title="note", content="", assigned_to=stranger)
+        tag_object(note, [tag])
+
+        changes = get_sync(client)
+        assert all(not changes[name]["updated"] for name in sync.SYNCED)
+
+    def test_query_count(self, client, db_user, django_assert_num_queries):
+        note = Note.objects.create(title="note", content="", assigned_to=db_user)
+        tags = [
+            Tag.objects.create(name=f"tag {i}", color="FF0000FF", assigned_to=db_user)
+            for i in range(10)
+        ]
+        tag_object(note, tags)
+
+        # The horizon, then one per kind of row
+        with django_assert_num_queries(len(sync.SYNCED) + 1):
+            get_sync(client)
+
+    def test_uncommitted_changes_held_back(self, client, db_user):
+        tag = Tag.objects.create(name="work", color="FF0000FF", assigned_to=db_user)
+        written = threading.Event()
+        commit = threading.Event()
+
+        def write_slowly():
+            try:
+                with transaction.atomic():
+                    # Saved long before its transaction commits
+                    Note.objects.create(
+                        title="slow",
+                        content="",
+                        assigned_to=db_user,
+                        updated_at=timezone.now() - timedelta(hours=1),
+                    )
+                    written.set()
+                    commit.wait(5)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=write_slowly)
+        thread.start()
+        assert written.wait(5)
+
+        changes = get_sync(client)
+        assert get_ids(changes, "tags") == [str(tag.id)]
+        assert not changes["notes"]["updated"]
+
+        commit.set()
+        thread.join()
+
+        changes = get_sync(client, changes["cursor"])
+        assert [note["title"] for note in changes["notes"]["updated"]] == ["slow"]
+        assert not changes["tags"]["updated"]
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "nope",
+            "e30",
+            "eyJhIjogMX0=",
+            "W10=",
+            # Positions of the old updated_at cursors
+            "eyJ0YWdzIjogWyIyMDI0LTAxLTAxVDAwOjAwOjAwKzAwOjAwIiwgbnVsbF19",
+        ],
+    )
+    def test_invalid_cursor(self, client, cursor):
+        response = client.get("/api/sync/", {"cursor": cursor})
+
+        assert response.status_code == 400
+        assert response.data == {"error": {"message": "Invalid cursor"}}
@@ -0,0 +1,154 @@
+import pytest
+from django.contrib.auth.models import User
+from timetracker.models import Note, Tag, TagLink
+from timetracker.rollups import RollupScope
+from timetracker.tags import TagNameTaken, get_tag_ids, link_tags, resolve_tags
+
+
+def create_note(client, tags, status=201):
+    response = client.post(
+        "/api/notes/",
+        {"title": "Note", "content": "", "tags": tags},
+        format="json",
+    )
+    assert response.status_code == status
+    return response.data
+
+
+@pytest.mark.django_db
+class TestResolveTags:
+    def test_creates_missing(self, db_user, django_assert_num_queries):
+        work = Tag.objects.create(name="Work", color="FF0000FF", assigned_to=db_user)
+
+        with django_assert_num_queries(3):
+            tags = resolve_tags(db_user.id, ["work", "Home", " home ", "Reading"])
+
+        assert tags.keys() == {"work", "home", "reading"}
+        assert tags["work"].id == work.id
+        assert tags["home"].name == "Home"
+        assert Tag.objects.filter(assigned_to=db_user).count() == 3
+
+        with django_assert_num_queries(1):
+            assert resolve_tags(db_user.id, ["WORK", "home"]).keys() == {
+                "work",
+                "home",
+            }
+
+    def test_restores_deleted(self, db_user):
+        tag = Tag.objects.create(name="Work", color="FF0000FF", assigned_to=db_user)
+        tag.delete()
+
+        assert resolve_tags(db_user.id, ["work"])["work"].id == tag.id
+        assert Tag.objects.filter(id=tag.id).exists()
+
+    def test_scoped_to_user(self, db_user):
+        stranger = User.objects.create(username="stranger")
+        Tag.objects.create(name="Work", color="FF0000FF", assigned_to=stranger)
+
+        with pytest.raises(TagNameTaken):
+            resolve_tags(db_user.id, ["home", "work"])
+
+
+@pytest.mark.django_db
+class TestLinkTags:
+    def test_replace(self, db_user):
+        tags = resolve_tags(db_user.id, ["a", "b", "c"])
+        notes = [Note.objects.create(title=f"{i}", assigned_to=db_user) for i in "12"]
+
+        scope = RollupScope()
+        link_tags(
+            "note",
+            {
+                notes[0].id: get_tag_ids(tags, ["a", "b"]),
+                notes[1].id: get_tag_ids(tags, ["a"]),
+            },
+            scope,
+        )
+        scope.refresh()
+
+        scope = RollupScope()
+        link_tags(
+            "note",
+            {notes[0].id: get_tag_ids(tags, ["b", "c"])},
+            scope,
+            replace=[notes[0].id],
+        )
+        scope.refresh()
+
+        linked = TagLink.objects.filter(note=notes[0]).values_list(
+            "tag__canonical_name", flat=True
+        )
+        assert sorted(linked) == ["b", "c"]
+        assert TagLink.objects_deleted.get(note=notes[0]).tag_id == tags["a"].id
+
+        counts = dict(
+            Tag.objects.filter(assigned_to=db_user).values_list(
+                "canonical_name", "reference_count"
+            )
+        )
+        assert counts == {"a": 1, "b": 1, "c": 1}
+
+
+@pytest.mark.django_db
+class TestNoteCreate:
+    def test_links_tags(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+        Tag.objects.create(name="Secret", color="FF0000FF", assigned_to=stranger)
+        Tag.objects.create(name="Work", color="FF0000FF", assigned_to=db_user)
+
+        note = create_note(client, ["work", "Home", "home"])
+
+        assert [tag["name"] for tag in note["tags"]] == ["Work", "Home"]
+        assert Tag.objects.get(canonical_name="home").assigned_to == db_user
+        assert Tag.objects.get(canonical_name="work").reference_count == 1
+
+        create_note(client, ["secret"], status=400)
+        assert Note.objects.count() == 1
+
+    def test_queries_do_not_grow(self, client, db_user, django_assert_num_queries):
+        names = [f"tag {i}" for i in range(15)]
+        resolve_tags(db_user.id, names)
+
+        # The tags, the note and its links, the reference counts and report
+        # versions, and the savepoint around them
+        with django_assert_num_queries(7):
+            create_note(client, names)
+
+
+@pytest.mark.django_db
+class TestNoteUpdate:
+    def test_replaces_tags(self, client, db_user):
+        note = create_note(client, ["Work", "Home"])
+        url = f"/api/notes/{note['id']}/"
+
+        response = client.patch(url, {"tags": ["home", "Reading"]}, format="json")
+
+        assert response.status_code == 200
+        assert [tag["name"] for tag in response.data["tags"]] == ["Home", "Reading"]
+        assert Tag.objects.get(canonical_name="work").reference_count == 0
+        assert Tag.objects.get(canonical_name="home").reference_count == 1
+
+    def test_keeps_tags(self, client, db_user):
+        note = create_note(client, ["Work"])
+        url = f"/api/notes/{note['id']}/"
+
+        response = client.patch(url, {"title": "Renamed"}, format="json")
+        assert response.status_code == 200
+        assert [tag["name"] for tag in response.data["tags"]] == ["Work"]
+
+        response = client.put(url, {"title": "Again", "content": ""}, format="json")
+        assert response.status_code == 200
+        assert response.data["title"] == "Again"
+        assert [tag["name"] for tag in response.data["tags"]] == ["Work"]
+
+    def test_tag_of_another_user(self, client, db_user):
+        note = create_note(client, ["Work"])
+        stranger = User.objects.create(username="stranger")
+        Tag.objects.create(name="Secret", color="FF0000FF", assigned_to=stranger)
+
+        response = client.patch(
+            f"/api/notes/{note['id']}/", {"tags": ["secret"]}, format="json"
+        )
+
+        assert response.status_code == 400
+        assert TagLink.objects.get(note_id=note["id"]).tag.name == "Work"
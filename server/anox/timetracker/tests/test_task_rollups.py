@@ -0,0 +1,156 @@
+import uuid
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import pytest
+from django.contrib.auth.models import User
+from timetracker.models import Task, TimeEntry
+from timetracker.reports import get_task_time_tree
+
+START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def create_task(user, name, parent=None):
+    return Task.objects.create(
+        name=name, description="", parent=parent, assigned_to=user
+    )
+
+
+def track(task, hours):
+    TimeEntry.objects.create(
+        started_at=START,
+        ended_at=START + timedelta(hours=hours),
+        task=task,
+        assigned_to=task.assigned_to,
+    )
+
+
+@pytest.fixture
+def tree(db_user):
+    """
+    project (1h)
+    ├── design (2h)
+    │   └── mockups (4h)
+    └── build (8h)
+    """
+    project = create_task(db_user, "project")
+    design = create_task(db_user, "design", project)
+    mockups = create_task(db_user, "mockups", design)
+    build = create_task(db_user, "build", project)
+
+    for task, hours in [(project, 1), (design, 2), (mockups, 4), (build, 8)]:
+        track(task, hours)
+
+    return {task.name: task for task in [project, design, mockups, build]}
+
+
+def get_totals(rows):
+    return {
+        name: (depth, seconds, subtree) for _, _, name, depth, seconds, subtree in rows
+    }
+
+
+@pytest.mark.django_db
+class TestTaskTimeTree:
+    def test_totals(self, db_user, tree):
+        rows = get_task_time_tree(db_user.id)
+
+        assert get_totals(rows) == {
+            "project": (0, 3600, 15 * 3600),
+            "design": (1, 2 * 3600, 6 * 3600),
+            "mockups": (2, 4 * 3600, 4 * 3600),
+            "build": (1, 8 * 3600, 8 * 3600),
+        }
+        # Depth first, every task after its parent
+        names = [row[2] for row in rows]
+        assert names[0] == "project"
+        assert names.index("mockups") == names.index("design") + 1
+
+    def test_subtree(self, db_user, tree):
+        rows = get_task_time_tree(db_user.id, tree["design"].id)
+
+        assert get_totals(rows) == {
+            "design": (0, 2 * 3600, 6 * 3600),
+            "mockups": (1, 4 * 3600, 4 * 3600),
+        }
+
+    def test_ignores_deleted_and_running(self, db_user, tree):
+        tree["mockups"].delete()
+        TimeEntry.objects.filter(task=tree["build"]).delete()
+        TimeEntry.objects.create(
+            started_at=START, task=tree["project"], assigned_to=db_user
+        )
+
+        assert get_totals(get_task_time_tree(db_user.id)) == {
+            "project": (0, 3600, 3 * 3600),
+            "design": (1, 2 * 3600, 2 * 3600),
+            "build": (1, 0, 0),
+        }
+
+    def test_deep_tree(self, db_user, django_assert_num_queries):
+        parent = None
+        tasks = []
+        for depth in range(1000):
+            task = Task(
+                name=f"task {depth}",
+                canonical_name=f"task {depth}",
+                description="",
+                parent=parent,
+                assigned_to=db_user,
+            )
+            tasks.append(task)
+            parent = task
+        Task.objects.bulk_create(tasks)
+        track(tasks[-1], 1)
+
+        with django_assert_num_queries(1):
+            rows = get_task_time_tree(db_user.id)
+
+        assert len(rows) == 1000
+        assert all(row[5] == 3600 for row in rows)
+        assert rows[-1][3] == 999
+
+    def test_cycle(self, db_user, tree):
+        Task.objects.filter(id=tree["project"].id).update(parent=tree["mockups"])
+
+        rows = get_task_time_tree(db_user.id, tree["project"].id)
+
+        assert get_totals(rows)["project"] == (0, 3600, 15 * 3600)
+        assert get_totals(get_task_time_tree(db_user.id)) == {}
+
+
+@pytest.mark.django_db
+class TestTaskTimeViews:
+    def test_all_tasks(self, client, tree):
+        response = client.get("/api/tasks/time/")
+
+        assert response.status_code == 200
+        project = response.data["tasks"][0]
+        assert project == {
+            "id": tree["project"].id,
+            "parent_id": None,
+            "name": "project",
+            "depth": 0,
+            "seconds": 3600,
+            "subtree_seconds": 15 * 3600,
+        }
+
+    def test_task(self, client, db_user, tree):
+        response = client.get(f"/api/tasks/{tree['build'].id}/time/")
+        assert [task["name"] for task in response.data["tasks"]] == ["build"]
+
+        assert client.get(f"/api/tasks/{uuid.uuid4()}/time/").status_code == 404
+
+        stranger = User.objects.create(username="stranger")
+        secret = create_task(stranger, "secret")
+        assert client.get(f"/api/tasks/{secret.id}/time/").status_code == 403
+
+    def test_not_modified_until_tasks_change(self, client, tree):
+        etag = client.get("/api/tasks/time/")["ETag"]
+        response = client.get("/api/tasks/time/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        Task.objects.filter(id=tree["build"].id).update(parent=tree["design"])
+
+        response = client.get("/api/tasks/time/", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import pytest
+from django.contrib.auth.models import User
+
+from timetracker.models import TimeEntry
+
+MONDAY = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture
+def entries(db_user):
+    """
+    An hour long entry at noon on each day of two weeks, from Monday, and one
+    still running from Sunday night.
+    """
+    entries = TimeEntry.objects.bulk_create(
+        TimeEntry(
+            started_at=MONDAY + timedelta(days=day, hours=12),
+            ended_at=MONDAY + timedelta(days=day, hours=13),
+            description=f"day {day}",
+            assigned_to=db_user,
+        )
+        for day in range(14)
+    )
+    entries.append(
+        TimeEntry.objects.create(
+            started_at=MONDAY + timedelta(days=6, hours=23), assigned_to=db_user
+        )
+    )
+
+    return entries
+
+
+def list_descriptions(client, params):
+    response = client.get("/api/time_entries/", params)
+    assert response.status_code == 200
+    return sorted(item["description"] for item in response.data["results"])
+
+
+@pytest.mark.django_db
+class TestTimeEntryFilters:
+    def test_started(self, client, entries):
+        params = {
+            "started_after": MONDAY,
+            "started_before": MONDAY + timedelta(days=2),
+        }
+
+        assert list_descriptions(client, params) == ["day 0", "day 1"]
+
+    def test_camel_case(self, client, entries):
+        params = {"startedAfter": MONDAY + timedelta(days=13)}
+
+        assert list_descriptions(client, params) == ["day 13"]
+
+    def test_overlaps(self, client, entries):
+        params = {
+            "overlaps_after": MONDAY + timedelta(days=1, hours=12, minutes=30),
+            "overlaps_before": MONDAY + timedelta(days=2, hours=12, minutes=30),
+        }
+
+        assert list_descriptions(client, params) == ["day 1", "day 2"]
+
+        params = {"overlaps_after": MONDAY + timedelta(days=7)}
+        descriptions = list_descriptions(client, params)
+        assert len(descriptions) == 8
+        assert "" in descriptions
+
+    def test_overlaps_empty_and_backwards(self, client, db_user):
+        TimeEntry.objects.bulk_create(
+            TimeEntry(
+                started_at=MONDAY + timedelta(hours=started_at),
+                ended_at=MONDAY + timedelta(hours=ended_at),
+                description=f"{started_at}-{ended_at}",
+                assigned_to=db_user,
+            )
+            for started_at, ended_at in [(1, 1), (2, 1), (0, 2)]
+        )
+        params = {
+            "overlaps_after": MONDAY,
+            "overlaps_before": MONDAY + timedelta(hours=3),
+        }
+
+        assert list_descriptions(client, params) == ["0-2"]
+
+    def test_invalid(self, client, entries):
+        response = client.get("/api/time_entries/", {"started_after": "monday"})
+
+        assert response.status_code == 400
+
+    def test_scoped_to_user(self, client, entries):
+        stranger = User.objects.create(username="stranger")
+        other = TimeEntry.objects.create(started_at=MONDAY, assigned_to=stranger)
+
+        assert client.get("/api/time_entries/").data["count"] == 15
+        assert client.get(f"/api/time_entries/{other.id}/").status_code == 404
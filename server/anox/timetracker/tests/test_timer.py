@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import pytest
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from timetracker.models import Tag, TimeEntry
+
+
+def start(client, data=None, status=201):
+    response = client.post("/api/time_entries/start/", data or {}, format="json")
+    assert response.status_code == status
+    return response.data
+
+
+@pytest.mark.django_db
+class TestRunningTimer:
+    def test_start_and_stop(self, client, db_user):
+        assert client.get("/api/time_entries/running/").status_code == 204
+
+        entry = start(client, {"description": "work", "tags": ["Project"]})
+        assert entry["ended_at"] is None
+        assert [tag["name"] for tag in entry["tags"]] == ["Project"]
+
+        response = client.get("/api/time_entries/running/")
+        assert response.status_code == 200
+        assert response.data == entry
+
+        response = client.post("/api/time_entries/stop/")
+        assert response.status_code == 200
+        assert response.data["id"] == entry["id"]
+        assert response.data["ended_at"] is not None
+
+        assert client.get("/api/time_entries/running/").status_code == 204
+        assert client.post("/api/time_entries/stop/").status_code == 404
+
+    def test_start_stops_running(self, client, db_user):
+        started_at = datetime(2024, 1, 1, 9, tzinfo=dt_timezone.utc)
+        first = start(client, {"started_at": started_at.isoformat()})
+
+        later = started_at + timedelta(hours=2)
+        second = start(client, {"started_at": later.isoformat()})
+
+        assert TimeEntry.objects.get(id=first["id"]).ended_at == later
+        assert client.get("/api/time_entries/running/").data["id"] == second["id"]
+        assert TimeEntry.objects.filter(ended_at__isnull=True).count() == 1
+
+    def test_stops_every_running_entry(self, client, db_user):
+        now = datetime.now(dt_timezone.utc)
+        TimeEntry.objects.bulk_create(
+            TimeEntry(started_at=now - timedelta(hours=i), assigned_to=db_user)
+            for i in range(1, 3)
+        )
+
+        start(client)
+
+        assert TimeEntry.objects.filter(ended_at__isnull=True).count() == 1
+
+    def test_rollups(self, client, db_user):
+        start(client, {"tags": ["Project"]})
+        client.post("/api/time_entries/stop/")
+
+        assert Tag.objects.get(canonical_name="project").reference_count == 1
+
+    def test_other_users(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+        other_client = APIClient()
+        other_client.force_authenticate(stranger)
+        start(other_client)
+
+        assert client.get("/api/time_entries/running/").status_code == 204
+        start(client)
+        assert TimeEntry.objects.filter(ended_at__isnull=True).count() == 2
+
+    def test_ignores_deleted(self, client, db_user):
+        entry = start(client)
+        TimeEntry.objects.get(id=entry["id"]).delete()
+
+        assert client.get("/api/time_entries/running/").status_code == 204
+
+    def test_invalid(self, client):
+        response = client.post(
+            "/api/time_entries/start/", {"started_at": "never"}, format="json"
+        )
+
+        assert response.status_code == 400
+        assert "started_at" in response.data
+
+    def test_running_queries(self, client, db_user, django_assert_num_queries):
+        start(client, {"tags": ["a", "b"]})
+
+        # The entry, its tag links and their tags
+        with django_assert_num_queries(3):
+            client.get("/api/time_entries/running/")
@@ -0,0 +1,149 @@
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+import pytest
+from django.contrib.auth.models import User
+from timetracker.models import Profile, Tag, Task, TimeEntry, tag_object
+
+MONDAY = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def create_entry(user, started_at, hours, tags=(), task=None):
+    entry = TimeEntry.objects.create(
+        started_at=started_at,
+        ended_at=started_at + timedelta(hours=hours),
+        task=task,
+        assigned_to=user,
+    )
+    tag_object(entry, tags)
+    return entry
+
+
+def get_timesheet(client, status=200, **params):
+    response = client.get("/api/timesheet/", params)
+    assert response.status_code == status
+    return response.data
+
+
+@pytest.mark.django_db
+class TestTimesheet:
+    def test_totals(self, client, db_user):
+        work = Tag.objects.create(name="Work", color="FF0000FF", assigned_to=db_user)
+        urgent = Tag.objects.create(
+            name="Urgent", color="FF0000FF", assigned_to=db_user
+        )
+        task = Task.objects.create(
+            name="Report", canonical_name="report", description="", assigned_to=db_user
+        )
+
+        create_entry(db_user, MONDAY + timedelta(hours=9), 2, [work, urgent], task)
+        create_entry(db_user, MONDAY + timedelta(hours=13), 1, [work])
+        create_entry(db_user, MONDAY + timedelta(days=1, hours=9), 3)
+
+        sheet = get_timesheet(client, start="2024-01-01", end="2024-01-07")
+
+        assert sheet["start"] == date(2024, 1, 1)
+        assert sheet["timezone"] == "UTC"
+        assert sheet["seconds"] == 6 * 3600
+        assert len(sheet["days"]) == 7
+
+        monday = sheet["days"][0]
+        assert monday["date"] == date(2024, 1, 1)
+        assert monday["seconds"] == 3 * 3600
+        assert {item["tag_id"]: item["seconds"] for item in monday["tags"]} == {
+            work.id: 3 * 3600,
+            urgent.id: 2 * 3600,
+        }
+        assert {item["task_id"]: item["seconds"] for item in monday["tasks"]} == {
+            task.id: 2 * 3600,
+            None: 3600,
+        }
+
+        tuesday = sheet["days"][1]
+        assert tuesday["seconds"] == 3 * 3600
+        assert tuesday["tags"] == [{"tag_id": None, "seconds": 3 * 3600}]
+        assert sheet["days"][2] == {
+            "date": date(2024, 1, 3),
+            "seconds": 0,
+            "tags": [],
+            "tasks": [],
+        }
+
+        assert sorted(tag["name"] for tag in sheet["tags"]) == ["Urgent", "Work"]
+        assert sheet["tasks"] == [{"id": task.id, "name": "Report"}]
+
+    def test_split_at_user_midnight(self, client, db_user):
+        Profile.objects.filter(user=db_user).update(timezone="America/New_York")
+        # 22:00 to 02:00 in New York, on Monday
+        create_entry(db_user, MONDAY + timedelta(hours=27), 4)
+
+        sheet = get_timesheet(client, start="2024-01-01", end="2024-01-02")
+
+        assert sheet["timezone"] == "America/New_York"
+        assert [day["seconds"] for day in sheet["days"]] == [7200, 7200]
+
+    @pytest.mark.parametrize(
+        "day, started_at, hours",
+        [
+            # Spring forward, 01:00 EST to 04:00 EDT
+            (date(2024, 3, 10), datetime(2024, 3, 10, 6, tzinfo=dt_timezone.utc), 2),
+            # The whole day, from midnight EST to midnight EDT
+            (date(2024, 3, 10), datetime(2024, 3, 10, 5, tzinfo=dt_timezone.utc), 23),
+            # Fall back, 01:00 EDT to 01:00 EST
+            (date(2024, 11, 3), datetime(2024, 11, 3, 5, tzinfo=dt_timezone.utc), 2),
+            # The whole day, from midnight EDT to midnight EST
+            (date(2024, 11, 3), datetime(2024, 11, 3, 4, tzinfo=dt_timezone.utc), 25),
+        ],
+    )
+    def test_dst(self, client, db_user, day, started_at, hours):
+        Profile.objects.filter(user=db_user).update(timezone="America/New_York")
+        create_entry(db_user, started_at, hours)
+
+        sheet = get_timesheet(
+            client, start=day - timedelta(days=1), end=day + timedelta(days=1)
+        )
+
+        assert [day["seconds"] for day in sheet["days"]] == [0, hours * 3600, 0]
+
+    def test_clipped_to_range(self, client, db_user):
+        create_entry(db_user, MONDAY - timedelta(hours=1), 2)
+
+        sheet = get_timesheet(client, start="2024-01-01", end="2024-01-01")
+
+        assert sheet["seconds"] == 3600
+
+    def test_ignores_other_entries(self, client, db_user):
+        stranger = User.objects.create(username="stranger")
+        create_entry(stranger, MONDAY, 1)
+        create_entry(db_user, MONDAY, 1).delete()
+        TimeEntry.objects.create(started_at=MONDAY, assigned_to=db_user)
+
+        sheet = get_timesheet(client, start="2024-01-01", end="2024-01-01")
+
+        assert sheet["seconds"] == 0
+
+    def test_current_week(self, client, db_user):
+        now = MONDAY + timedelta(days=9, hours=12)
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            sheet = get_timesheet(client)
+
+        assert sheet["start"] == date(2024, 1, 8)
+        assert sheet["end"] == date(2024, 1, 14)
+
+    def test_invalid_range(self, client):
+        get_timesheet(client, 400, start="2024-01-01", end="2024-03-01")
+        get_timesheet(client, 400, start="2024-01-02", end="2024-01-01")
+        get_timesheet(client, 400, start="monday")
+
+    def test_queries(self, client, db_user, django_assert_num_queries):
+        tags = [
+            Tag.objects.create(name=f"tag {i}", color="FF0000FF", assigned_to=db_user)
+            for i in range(5)
+        ]
+        for day in range(7):
+            create_entry(db_user, MONDAY + timedelta(days=day), 1, tags)
+
+        # The profile, the timesheet and its tags, without any task to read
+        with django_assert_num_queries(3):
+            get_timesheet(client, start="2024-01-01", end="2024-01-07")
@@ -1,7 +1,7 @@
 from django.urls import include, path
 from rest_framework import routers
 
-from . import tag_views, views
+from . import tag_views, task_views, views
 
 router = routers.DefaultRouter()
 router.register("notes", views.NoteViewSet)
@@ -11,6 +11,17 @@ router.register("timestamps", views.TimestampViewSet)
 
 app_name = "timetracker"
 urlpatterns = [
+    # Before the router, which would otherwise treat these as tag ids.
+    path(
+        "api/tags/time-report/",
+        tag_views.tags_time_report,
+        name="tags_time_report",
+    ),
+    path(
+        "api/tags/autocomplete/",
+        tag_views.tag_autocomplete,
+        name="tag_autocomplete",
+    ),
     path("api/", include(router.urls)),
     path("api/tags/<tag_id>/totals/", tag_views.tag_totals, name="tag_totals"),
     path(
@@ -18,6 +29,19 @@ urlpatterns = [
         tag_views.tag_time_report,
         name="tag_time_report",
     ),
+    path(
+        "api/report-cache/stats/",
+        tag_views.report_cache_stats,
+        name="report_cache_stats",
+    ),
+    path("api/tasks/time/", task_views.tasks_time_tree, name="tasks_time_tree"),
+    path(
+        "api/tasks/<uuid:task_id>/time/",
+        task_views.task_time_tree,
+        name="task_time_tree",
+    ),
+    path("api/sync/", views.sync, name="sync"),
+    path("api/timesheet/", views.timesheet, name="timesheet"),
     path("api/user/profile/", views.get_profile, name="get_user_profile"),
     path("api/user/profile/", views.update_profile, name="update_user_profile"),
 ]
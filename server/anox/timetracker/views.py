@@ -1,89 +1,201 @@
-from typing import Dict, List
+from datetime import timedelta
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, permissions, status, viewsets
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from .filters import IsAssignedToFilterBackend
-from .models import Note, Profile, Tag, TagLink, TimeEntry, Timestamp
+from .conditional import ConditionalGetMixin, conditional_get
+from .filters import IsAssignedToFilterBackend, NoteSearchFilter, TimeEntryFilter
+from .models import Note, Profile, Tag, Task, TimeEntry, Timestamp
+from .overlaps import TimeEntryOverlap, check_overlaps, find_overlaps
+from .pagination import KeysetPagination
+from .reports import get_timesheet
+from .rollups import RollupScope
 from .serializers import (
     NoteSerializer,
+    NoteWriteSerializer,
+    OverlapsQuerySerializer,
     ProfileSerializer,
     TagSerializer,
+    TimeEntryBatchItemSerializer,
     TimeEntrySerializer,
+    TimerStartSerializer,
     TimestampSerializer,
+    get_tag_payloads,
+    get_tag_values_fields,
+    get_values_fields,
+    is_tags_expanded,
+    serialize_tag_values,
+    serialize_tagged_values,
 )
-from .utils import to_canonical_name
+from .sync import InvalidCursor, get_changes
+from .tag_views import BadRequest, bad_request, parse_date_range
+from .tags import TagNameTaken, get_tag_ids, link_tags, resolve_tags
 
+# Most time entries one batch request can create or update.
+MAX_BATCH_SIZE = 500
 
-class NoteViewSet(viewsets.ModelViewSet):
+# Most days one timesheet can span.
+MAX_TIMESHEET_DAYS = 31
+
+
+class TaggedValuesListMixin:
+    """
+    Lists a tagged model from values() rows, serialized by
+    serialize_tagged_values instead of the serializer, which is much slower
+    for big pages. `tag_link_field` is the TagLink field pointing to the model.
+    Annotations named in `list_annotations` are listed too, when present.
+    """
+
+    tag_link_field: str
+    list_annotations = []
+
+    def get_queryset(self):
+        """
+        Only loads the columns and prefetches the tags the serializer renders,
+        see SparseFieldsMixin.
+        """
+        queryset = super().get_queryset()
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+
+        serializer = self.get_serializer()
+        queryset = queryset.prefetch_related(None)
+        if "tags" in serializer.fields:
+            queryset = queryset.prefetch_related(
+                "tag_links__tag" if is_tags_expanded(serializer) else "tag_links"
+            )
+
+        return queryset.only(*get_values_fields(serializer))
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+
+        queryset = self.filter_queryset(self.get_queryset())
+        annotations = [
+            name for name in self.list_annotations if name in queryset.query.annotations
+        ]
+        # Tags are found by id and pages by the keyset field, even when neither
+        # is rendered.
+        fields = ["id", *get_values_fields(serializer)]
+        if hasattr(self, "keyset_ordering"):
+            fields.append(self.keyset_ordering.lstrip("-"))
+        queryset = queryset.prefetch_related(None).values(
+            *dict.fromkeys(fields), *annotations
+        )
+
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+
+        data = serialize_tagged_values(
+            serializer, rows, self.tag_link_field, annotations
+        )
+
+        if page is not None:
+            return self.get_paginated_response(data)
+
+        return Response(data)
+
+
+class NoteViewSet(ConditionalGetMixin, TaggedValuesListMixin, viewsets.ModelViewSet):
     queryset = (
         Note.objects.all().prefetch_related("tag_links__tag").order_by("-created_at")
     )
     serializer_class = NoteSerializer
     permissions_classes = [permissions.IsAuthenticated]
     filter_backends = [
-        filters.SearchFilter,
         filters.OrderingFilter,
+        NoteSearchFilter,
         IsAssignedToFilterBackend,
     ]
-    search_fields = ["title", "content"]
     ordering_fields = ["created_at", "for_date", "title"]
     ordering = ["-created_at"]
+    pagination_class = KeysetPagination
+    keyset_ordering = "-created_at"
+    tag_link_field = "note"
+    list_annotations = ["rank", "headline"]
+
+    def get_serializer_class(self):
+        if self.action in ("create", "update", "partial_update"):
+            return NoteWriteSerializer
+
+        return NoteSerializer
 
     def create(self, request, *args, **kwargs):
-        tag_names = request.data["tags"]
-        request.data["tags"] = []
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = NoteSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save(
-                assigned_to_id=request.user.id,
-            )
+        # Linked below in bulk, rather than one by one by the serializer
+        tag_names = serializer.validated_data.pop("tags", [])
 
-            name_to_canonical: Dict[str, str] = {
-                tag_name: to_canonical_name(tag_name) for tag_name in tag_names
-            }
-            tag_mapping = Tag.objects.in_bulk(
-                name_to_canonical.values(), field_name="canonical_name"
+        try:
+            with transaction.atomic():
+                tags = resolve_tags(request.user.id, tag_names)
+                note = serializer.save(assigned_to_id=request.user.id)
+
+                tag_ids = get_tag_ids(tags, tag_names)
+                scope = RollupScope()
+                link_tags("note", {note.id: tag_ids}, scope)
+                scope.refresh()
+        except TagNameTaken as e:
+            return Response(
+                {"error": {"message": str(e)}}, status=status.HTTP_400_BAD_REQUEST
             )
 
-            tags: List[Tag] = []
-            for tag_name in tag_names:
-                canonical_name = name_to_canonical[tag_name]
-                if tag := tag_mapping.get(canonical_name):
-                    tags.append(tag)
-                else:
-                    new_tag = Tag(
-                        name=tag_name,
-                        color=settings.DEFAULT_TAG_COLOR,
-                        assigned_to=request.user,
-                    )
-                    new_tag.save()
-                    tags.append(new_tag)
+        payloads = get_tag_payloads(serializer.context)
+        payloads.update((tag.id, TagSerializer(tag).data) for tag in tags.values())
 
-            existing_links = TagLink.objects.filter(note=serializer.data["id"]).in_bulk(
-                field_name="id"
-            )
+        data = serializer.data
+        data["tags"] = [payloads[tag_id] for tag_id in tag_ids]
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop("partial", False)
+        note = self.get_object()
+
+        serializer = self.get_serializer(note, data=request.data, partial=partial)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            tag_links = [tag_link for _, tag_link in existing_links]
-            for tag in tags:
-                if tag.id not in existing_links:
-                    link = TagLink(tag=tag, note_id=serializer.data["id"])
-                    link.save()
-                    tag_links.append(link)
+        # The note's tags are only replaced when given
+        tag_names = serializer.validated_data.pop("tags", None)
 
-            # TODO this works fine, but we might want to move the logic to the
-            # serializer as a mixin or something to make it re-usable
-            serializer._data["tags"] = [TagSerializer(tag).data for tag in tags]
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        try:
+            with transaction.atomic():
+                note = serializer.save(assigned_to_id=request.user.id)
+
+                if tag_names is not None:
+                    tags = resolve_tags(request.user.id, tag_names)
+                    scope = RollupScope()
+                    link_tags(
+                        "note",
+                        {note.id: get_tag_ids(tags, tag_names)},
+                        scope,
+                        replace=[note.id],
+                    )
+                    scope.refresh()
+        except TagNameTaken as e:
+            return Response(
+                {"error": {"message": str(e)}}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Read again, for the links as they are now
+        note = self.get_queryset().get(pk=note.pk)
+        return Response(NoteSerializer(note, context=serializer.context).data)
 
 
-class TimeEntryViewSet(viewsets.ModelViewSet):
+class TimeEntryViewSet(
+    ConditionalGetMixin, TaggedValuesListMixin, viewsets.ModelViewSet
+):
     queryset = (
         TimeEntry.objects.all()
         .prefetch_related("tag_links__tag")
@@ -91,9 +203,221 @@ class TimeEntryViewSet(viewsets.ModelViewSet):
     )
     serializer_class = TimeEntrySerializer
     permissions_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, IsAssignedToFilterBackend]
+    filterset_class = TimeEntryFilter
+    pagination_class = KeysetPagination
+    keyset_ordering = "-started_at"
+    tag_link_field = "time_entry"
 
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Creates and updates a list of time entries, see
+        TimeEntryBatchItemSerializer, in one transaction. Either every entry
+        is saved or, when any of them is invalid, none is and the errors of
+        each entry are returned in order.
+        """
+        items = request.data
+        if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_SIZE:
+            return Response(
+                {
+                    "error": {
+                        "message": f"Expected a list of 1 to {MAX_BATCH_SIZE} "
+                        "time entries"
+                    }
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializers = [
+            TimeEntryBatchItemSerializer(
+                data=item, partial=isinstance(item, dict) and "id" in item
+            )
+            for item in items
+        ]
+        errors = [
+            {} if serializer.is_valid() else dict(serializer.errors)
+            for serializer in serializers
+        ]
+
+        ids = [
+            serializer.validated_data["id"]
+            for serializer in serializers
+            if "id" in serializer.validated_data
+        ]
+        existing = TimeEntry.objects.filter(
+            assigned_to_id=request.user.id, id__in=ids
+        ).in_bulk()
+
+        seen = set()
+        for serializer, item_errors in zip(serializers, errors):
+            entry_id = serializer.validated_data.get("id")
+            if entry_id is None:
+                continue
+
+            if entry_id not in existing:
+                item_errors["id"] = ["Time entry not found."]
+            elif entry_id in seen:
+                item_errors["id"] = ["Time entry is already in the batch."]
+            seen.add(entry_id)
+
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        items = [serializer.validated_data for serializer in serializers]
+        try:
+            entries = save_time_entry_batch(request.user.id, items, existing)
+        except (TagNameTaken, TimeEntryOverlap) as e:
+            return Response(
+                {"error": {"message": str(e)}}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        data = self.serialize_entries(entries)
+
+        return Response(
+            [
+                {
+                    "status": (
+                        status.HTTP_200_OK if "id" in item else status.HTTP_201_CREATED
+                    ),
+                    "data": data[str(entry.id)],
+                }
+                for entry, item in zip(entries, items)
+            ]
+        )
+
+    @action(detail=False)
+    def running(self, request):
+        """
+        The running time entry of the user, the one without an end, or 204 No
+        Content when no timer is running.
+        """
+        serializer = self.get_serializer()
+        fields = ["id", *get_values_fields(serializer)]
+        rows = list(
+            get_running_time_entries(request.user.id)
+            .order_by("-started_at")
+            .values(*dict.fromkeys(fields))[:1]
+        )
+        if not rows:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        return Response(serialize_tagged_values(serializer, rows, "time_entry")[0])
+
+    @action(detail=False, methods=["post"])
+    def start(self, request):
+        """
+        Starts a new time entry, see TimerStartSerializer, and stops the running
+        one when the new one starts.
+        """
+        serializer = TimerStartSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            entry = start_timer(request.user.id, serializer.validated_data)
+        except (TagNameTaken, TimeEntryOverlap) as e:
+            return Response(
+                {"error": {"message": str(e)}}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            self.serialize_entries([entry])[str(entry.id)],
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=["post"])
+    def stop(self, request):
+        """
+        Ends the running time entry now, and returns it.
+        """
+        try:
+            entry = stop_timer(request.user.id)
+        except TimeEntryOverlap as e:
+            return Response(
+                {"error": {"message": str(e)}}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if entry is None:
+            return Response(
+                {"error": {"message": "No timer is running"}},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response(self.serialize_entries([entry])[str(entry.id)])
+
+    @action(detail=False)
+    def overlaps(self, request):
+        """
+        The pairs of the user's time entries that overlap, in the order the
+        overlaps start, see OverlapsQuerySerializer and timetracker.overlaps.
+        """
+        serializer = OverlapsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = find_overlaps(request.user.id, **serializer.validated_data)
+
+        return Response(
+            [
+                {
+                    "earlier_id": earlier_id,
+                    "later_id": later_id,
+                    "started_at": started_at,
+                    "ended_at": ended_at,
+                }
+                for earlier_id, later_id, started_at, ended_at in rows
+            ]
+        )
+
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except TimeEntryOverlap as e:
+            return Response(
+                {"error": {"message": str(e)}}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-class TimestampViewSet(viewsets.ModelViewSet):
+    def perform_update(self, serializer):
+        if not settings.REJECT_OVERLAPPING_TIME_ENTRIES:
+            return super().perform_update(serializer)
+
+        entry = serializer.instance
+        data = serializer.validated_data
+        with transaction.atomic():
+            lock_time_entries(entry.assigned_to_id)
+            check_overlaps(
+                entry.assigned_to_id,
+                [
+                    (
+                        data.get("started_at", entry.started_at),
+                        data.get("ended_at", entry.ended_at),
+                    )
+                ],
+                exclude_ids=[entry.id],
+            )
+            super().perform_update(serializer)
+
+    def serialize_entries(self, entries: List[TimeEntry]) -> Dict[str, dict]:
+        """
+        The time entries read back and rendered in full, by id.
+        """
+        serializer = self.get_serializer()
+        rows = (
+            TimeEntry.objects.filter(id__in=[entry.id for entry in entries])
+            .order_by()
+            .values(*get_values_fields(serializer))
+        )
+
+        return {
+            item["id"]: item
+            for item in serialize_tagged_values(serializer, list(rows), "time_entry")
+        }
+
+
+class TimestampViewSet(
+    ConditionalGetMixin, TaggedValuesListMixin, viewsets.ModelViewSet
+):
     queryset = (
         Timestamp.objects.all()
         .prefetch_related("tag_links__tag")
@@ -101,9 +425,245 @@ class TimestampViewSet(viewsets.ModelViewSet):
     )
     serializer_class = TimestampSerializer
     permissions_classes = [permissions.IsAuthenticated]
+    filter_backends = [IsAssignedToFilterBackend]
+    pagination_class = KeysetPagination
+    keyset_ordering = "-created_at"
+    tag_link_field = "timestamp"
+
+
+def save_time_entry_batch(user_id, items: List[dict], existing: Dict) -> List:
+    """
+    Saves validated batch `items` of time entries for a user, where `existing`
+    holds the entries updated by id, and returns the saved entries in order.
+
+    Tags are resolved, entries written and links created with a few bulk
+    queries whatever the size of the batch, then the rollups and reference
+    counts of every affected tag are refreshed at once.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        tags = resolve_tags(
+            user_id, [name for item in items for name in item.get("tags", [])]
+        )
+
+        scope = RollupScope()
+        if existing:
+            # Where the updated entries were counted before
+            scope.add_time_entries(
+                TimeEntry.objects_with_deleted.filter(id__in=existing.keys())
+            )
+
+        entries: List[TimeEntry] = []
+        created: List[TimeEntry] = []
+        updated: List[TimeEntry] = []
+        for item in items:
+            fields = {
+                name: value
+                for name, value in item.items()
+                if name not in ("id", "tags")
+            }
+
+            if "id" in item:
+                entry = existing[item["id"]]
+                for name, value in fields.items():
+                    setattr(entry, name, value)
+                entry.updated_at = now
+                updated.append(entry)
+            else:
+                entry = TimeEntry(assigned_to_id=user_id, **fields)
+                created.append(entry)
+
+            entries.append(entry)
+            scope.add_span(entry.started_at, entry.ended_at)
+
+        if settings.REJECT_OVERLAPPING_TIME_ENTRIES:
+            lock_time_entries(user_id)
+            check_overlaps(
+                user_id,
+                [(entry.started_at, entry.ended_at) for entry in entries],
+                exclude_ids=[entry.id for entry in entries],
+            )
+
+        TimeEntry.objects.bulk_create(created)
+        TimeEntry.objects.bulk_update(
+            updated, ["started_at", "ended_at", "description", "updated_at"]
+        )
+
+        link_tags(
+            "time_entry",
+            {
+                entry.id: get_tag_ids(tags, item["tags"])
+                for entry, item in zip(entries, items)
+                if "tags" in item
+            },
+            scope,
+            replace=[entry.id for entry in updated],
+        )
+
+        scope.refresh()
+
+    return entries
+
+
+def get_running_time_entries(user_id):
+    """
+    The time entries of a user without an end, found with
+    time_entries_running_idx. The timer endpoints keep at most one, but
+    imported or edited entries can leave more.
+    """
+    return TimeEntry.objects.filter(assigned_to_id=user_id, ended_at__isnull=True)
+
+
+def lock_time_entries(user_id):
+    """
+    Locks the time entries of a user until the end of the transaction, so
+    concurrent starts and stops can't leave two timers running, nor concurrent
+    writes each add one side of an overlap.
+    """
+    list(User.objects.select_for_update().filter(pk=user_id).values_list("pk"))
+
+
+def start_timer(user_id, fields: dict) -> TimeEntry:
+    """
+    Starts a time entry for a user with validated TimerStartSerializer
+    `fields`, and ends the running ones when it starts.
+    """
+    with transaction.atomic():
+        lock_time_entries(user_id)
+
+        started_at = fields.get("started_at") or timezone.now()
+        running = list(get_running_time_entries(user_id))
+        items = [
+            # Never before its own start
+            {"id": entry.id, "ended_at": max(entry.started_at, started_at)}
+            for entry in running
+        ]
+        items.append({**fields, "started_at": started_at})
+
+        entries = save_time_entry_batch(
+            user_id, items, {entry.id: entry for entry in running}
+        )
+
+    return entries[-1]
+
+
+def stop_timer(user_id) -> Optional[TimeEntry]:
+    """
+    Ends the running time entries of a user now, and returns the last one
+    started, or None when no timer is running.
+    """
+    with transaction.atomic():
+        lock_time_entries(user_id)
+
+        running = list(get_running_time_entries(user_id).order_by("started_at"))
+        if not running:
+            return None
+
+        now = timezone.now()
+        items = [
+            {"id": entry.id, "ended_at": max(entry.started_at, now)}
+            for entry in running
+        ]
+        entries = save_time_entry_batch(
+            user_id, items, {entry.id: entry for entry in running}
+        )
+
+    return entries[-1]
+
+
+@api_view(["GET"])
+def sync(request: Request):
+    """
+    The user's tags, notes, time entries, timestamps and tag links changed
+    since the `cursor` of the previous sync, or all of them without one.
+    See timetracker.sync.
+    """
+    try:
+        changes = get_changes(request.user.id, request.query_params.get("cursor"))
+    except InvalidCursor as e:
+        return Response(
+            {"error": {"message": str(e)}}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(changes)
+
+
+def get_profile_timezone(user_id) -> str:
+    """
+    The timezone of a user's profile, or UTC when it is missing or unknown.
+    """
+    tz = Profile.objects.filter(user_id=user_id).values_list("timezone", flat=True)
+    tz = tz.first()
+    try:
+        ZoneInfo(tz)
+    except (TypeError, ValueError, ZoneInfoNotFoundError):
+        return "UTC"
+
+    return tz
+
+
+@api_view(["GET"])
+def timesheet(request: Request):
+    """
+    The user's time on each day from `start` to `end` (YYYY-MM-DD, both
+    inclusive), in total, per tag and per task, for at most MAX_TIMESHEET_DAYS
+    days. Days start at midnight in the timezone of the user's profile. Without
+    dates, it is the current week from Monday.
+    """
+    try:
+        start, end = parse_date_range(request)
+    except BadRequest as e:
+        return bad_request(str(e))
+
+    tz = get_profile_timezone(request.user.id)
+    if start is None and end is None:
+        today = timezone.now().astimezone(ZoneInfo(tz)).date()
+        start = today - timedelta(days=today.weekday())
+    if start is None:
+        start = end - timedelta(days=6)
+    if end is None:
+        end = start + timedelta(days=6)
+
+    day_count = (end - start).days + 1
+    if day_count > MAX_TIMESHEET_DAYS:
+        return bad_request(f"The range can't be longer than {MAX_TIMESHEET_DAYS} days")
+
+    days = {
+        start + timedelta(days=i): {"seconds": 0, "tags": [], "tasks": []}
+        for i in range(day_count)
+    }
+    for day, tag_id, task_id, grouping, duration in get_timesheet(
+        request.user.id, start, end, tz
+    ):
+        seconds = duration.total_seconds()
+        if grouping == 3:
+            days[day]["seconds"] = seconds
+        elif grouping == 1:
+            days[day]["tags"].append({"tag_id": tag_id, "seconds": seconds})
+        else:
+            days[day]["tasks"].append({"task_id": task_id, "seconds": seconds})
+
+    tag_ids = {item["tag_id"] for day in days.values() for item in day["tags"]}
+    tags = Tag.objects.filter(id__in=tag_ids - {None}).values(*get_tag_values_fields())
+    task_ids = {item["task_id"] for day in days.values() for item in day["tasks"]}
+    tasks = Task.objects.filter(id__in=task_ids - {None}).values("id", "name")
+
+    return Response(
+        {
+            "start": start,
+            "end": end,
+            "timezone": tz,
+            "seconds": sum(day["seconds"] for day in days.values()),
+            "days": [{"date": day, **totals} for day, totals in days.items()],
+            "tags": serialize_tag_values(list(tags)),
+            "tasks": list(tasks),
+        }
+    )
 
 
 @api_view(["GET"])
+@conditional_get
 def get_profile(request: Request):
     profile = Profile.objects.get(user_id=request.user.id)
     serializer = ProfileSerializer(profile)